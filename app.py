@@ -11,27 +11,93 @@ Year: 2026
 
 from flask import Flask, render_template, request, jsonify, session
 from chatbot import ConversationalAIBot
+from retention import get_retention_sweeper
+from context_store import get_context_cache
+from config import ENABLE_RETENTION, BOT_IDLE_SECONDS, CONTEXT_STORE_TTL
+from datetime import datetime
+import threading
+import time
 import uuid
 import os
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
-# Store bot instances per session
+# Store bot instances per session, with the time each was last used. A
+# session's context lives in the shared context store, so any worker (or a
+# restarted one) can serve it; the instances here are a per-worker cache.
 bot_instances = {}
+bot_last_used = {}
+bot_instances_lock = threading.Lock()
+_cleanup_registered = False
+
+
+def prune_idle_bots(now: float) -> int:
+    """
+    Drop bot instances that have not been used for BOT_IDLE_SECONDS.
+    
+    Their history and context stay in the history and context stores and
+    are reloaded if the session comes back.
+    
+    Args:
+        now: Current epoch time
+        
+    Returns:
+        Number of bot instances dropped
+    """
+    with bot_instances_lock:
+        idle = [sid for sid, used in bot_last_used.items() if now - used > BOT_IDLE_SECONDS]
+        for session_id in idle:
+            bot_instances.pop(session_id, None)
+            bot_last_used.pop(session_id, None)
+    return len(idle)
+
+
+def expire_contexts(now: float) -> int:
+    """
+    Remove stored contexts unused for CONTEXT_STORE_TTL seconds.
+    
+    Args:
+        now: Current epoch time
+        
+    Returns:
+        Number of contexts removed
+    """
+    return get_context_cache().store.expire(now - CONTEXT_STORE_TTL)
+
+
+def save_context(bot: ConversationalAIBot):
+    """Queue a bot's context for the shared context store."""
+    get_context_cache().save(bot.session_id, bot.context_manager)
 
 
 def get_bot():
     """Get or create bot instance for current session."""
+    global _cleanup_registered
     if 'session_id' not in session:
         session['session_id'] = str(uuid.uuid4())
     
     session_id = session['session_id']
     
-    if session_id not in bot_instances:
-        bot_instances[session_id] = ConversationalAIBot(session_id)
+    bot = bot_instances.get(session_id)
+    if bot is None:
+        # Built outside the lock: it loads this session's history
+        bot = ConversationalAIBot(session_id)
+    with bot_instances_lock:
+        bot = bot_instances.setdefault(session_id, bot)
+        bot_last_used[session_id] = time.time()
+    
+    # Picks up turns another worker handled since this one last saw the session
+    bot.context_manager = get_context_cache().load(session_id)
     
-    return bot_instances[session_id]
+    if ENABLE_RETENTION and not _cleanup_registered:
+        # Registered on first use, after any worker fork
+        sweeper = get_retention_sweeper()
+        sweeper.add_task('bot_instances', prune_idle_bots)
+        sweeper.add_task('context_store', expire_contexts)
+        _cleanup_registered = True
+    
+    return bot
 
 
 @app.route('/')
@@ -55,6 +121,7 @@ def chat():
         
         bot = get_bot()
         response = bot.chat(user_message)
+        save_context(bot)
         
         # Get additional metadata
         sentiment = bot.get_sentiment_analysis(user_message)
@@ -65,6 +132,7 @@ def chat():
             'response': response,
             'sentiment': sentiment.get('sentiment'),
             'sentiment_score': sentiment.get('score'),
+            'sentiment_trend': bot.get_sentiment_trend(),
             'context': context
         })
     
@@ -77,15 +145,56 @@ def chat():
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    """Get conversation history."""
+    """
+    Get one page of conversation history.
+    
+    Query parameters: limit, start/end (ISO timestamps) and the before/after
+    cursors returned as 'prev'/'next' by earlier pages.
+    """
     try:
         bot = get_bot()
         limit = request.args.get('limit', 10, type=int)
-        history = bot.get_conversation_history(limit=limit)
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.fromisoformat(start).isoformat() if start else None
+        end = datetime.fromisoformat(end).isoformat() if end else None
+        page = bot.get_history_page(
+            start, end, request.args.get('after'), request.args.get('before'), limit
+        )
+        
+        return jsonify({
+            'success': True,
+            'history': page['entries'],
+            'next': page['next'],
+            'prev': page['prev']
+        })
+    
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/history/search', methods=['GET'])
+def search_history():
+    """Search the conversation history of the current session."""
+    try:
+        bot = get_bot()
+        query = request.args.get('q', '')
+        limit = request.args.get('limit', 20, type=int)
+        results = bot.search_history(query, limit=limit)
         
         return jsonify({
             'success': True,
-            'history': history
+            'query': query,
+            'results': results
         })
     
     except Exception as e:
@@ -106,7 +215,11 @@ def get_analytics():
         return jsonify({
             'success': True,
             'analytics': analytics,
-            'summary': summary
+            'summary': summary,
+            'nlu_cache': bot.get_nlu_cache_stats(),
+            'history_storage': bot.get_history_stats(),
+            'retention': get_retention_sweeper().get_stats() if ENABLE_RETENTION else {},
+            'context_store': get_context_cache().get_stats()
         })
     
     except Exception as e:
@@ -122,6 +235,7 @@ def clear_session():
     try:
         bot = get_bot()
         bot.clear_session()
+        save_context(bot)
         
         return jsonify({
             'success': True,
@@ -9,7 +9,7 @@ Phone: +91 93305 39277
 Year: 2026
 """
 
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Union
 import re
 from datetime import datetime
 import uuid
@@ -17,14 +17,21 @@ import uuid
 from context_manager import ContextManager
 from intent_recognizer import IntentRecognizer
 from entity_extractor import EntityExtractor
+from spacy_extractor import get_spacy_extractor
 from conversation_history import ConversationHistory
+from history_index import HistoryIndex, turn_key
 from sentiment_analyzer import SentimentAnalyzer
 from language_support import LanguageSupport
 from api_integrations import APIIntegrations
 from conversation_analytics import ConversationAnalytics
 from response_templates import ResponseTemplates
+from nlu_cache import get_nlu_cache
+from language_pipeline import LanguagePipeline, get_pipeline_registry
+from message_preprocessor import AnalyzedMessage, analyze_message
+from regex_guard import clip_input
 from config import (
-    BOT_NAME, DEFAULT_RESPONSE, INTENT_CONFIDENCE_THRESHOLD,
+    BOT_NAME, DEFAULT_RESPONSE, INTENT_CONFIDENCE_THRESHOLD, ENABLE_NLU_CACHE, ENTITY_BACKEND,
+    ENABLE_LANGUAGE_PIPELINES, HISTORY_INDEX_MAX_RESULTS, HISTORY_MAX_PAGE_SIZE,
     DEVELOPER_NAME, DEVELOPER_WEBSITE, DEVELOPER_EMAIL, DEVELOPER_PHONE, YEAR
 )
 
@@ -44,7 +51,10 @@ class ConversationalAIBot:
         self.session_id = session_id or str(uuid.uuid4())
         self.context_manager = ContextManager(self.session_id)
         self.intent_recognizer = IntentRecognizer()
-        self.entity_extractor = EntityExtractor()
+        if ENTITY_BACKEND == "spacy":
+            self.entity_extractor = get_spacy_extractor()
+        else:
+            self.entity_extractor = EntityExtractor()
         self.conversation_history = ConversationHistory(self.session_id)
         
         # Advanced features
@@ -53,6 +63,8 @@ class ConversationalAIBot:
         self.api_integrations = APIIntegrations()
         self.analytics = ConversationAnalytics()
         self.response_templates = ResponseTemplates()
+        self.nlu_cache = get_nlu_cache() if ENABLE_NLU_CACHE else None
+        self.language_pipelines = get_pipeline_registry() if ENABLE_LANGUAGE_PIPELINES else None
         
         # Initialize analytics
         self.analytics.start_session(self.session_id)
@@ -85,22 +97,24 @@ class ConversationalAIBot:
             self.context_manager.clear_context()
             self.conversation_history.clear_history()
         
-        # Detect language
-        detected_language = self.language_support.detect_language(user_message)
-        self.language_support.set_language(detected_language)
+        # Preprocess once; every NLU stage reuses this analyzed message.
+        # Analysis is limited to the input budget so huge pastes stay cheap.
+        message = AnalyzedMessage(clip_input(user_message))
         
-        # Analyze sentiment
-        sentiment_analysis = self.sentiment_analyzer.analyze(user_message)
+        # Context-free analysis (language, sentiment, intent, entities)
+        analysis = self._analyze_message(message)
+        detected_language = analysis['language']
+        sentiment_analysis = analysis['sentiment']
         sentiment = sentiment_analysis['sentiment']
+        intent = analysis['intent']
+        confidence = analysis['confidence']
+        entities = analysis['entities']
         
-        # Recognize intent
-        intent, confidence = self.intent_recognizer.recognize(user_message)
-        
-        # Extract entities
-        entities = self.entity_extractor.extract(user_message)
+        self.language_support.set_language(detected_language)
+        self.context_manager.update_sentiment(sentiment_analysis['score'], sentiment)
         
         # Generate response based on intent and context
-        response = self._generate_response(user_message, intent, confidence, entities, sentiment_analysis)
+        response = self._generate_response(message, intent, confidence, entities, sentiment_analysis)
         
         # Update context
         self.context_manager.update_context(user_message, response, intent, entities)
@@ -115,13 +129,101 @@ class ConversationalAIBot:
         
         return response
     
-    def _generate_response(self, user_message: str, intent: str, 
+    def _analyze_message(self, user_message: Union[str, AnalyzedMessage]) -> Dict:
+        """
+        Run the context-free NLU steps for a message.
+        
+        Results only depend on the message text and the NLU components, so
+        they are shared across sessions through the process-wide NLU cache.
+        
+        Args:
+            user_message: User's input message (raw or preprocessed)
+            
+        Returns:
+            Dictionary with language, sentiment, intent, confidence and entities
+        """
+        message = analyze_message(user_message)
+        
+        key = None
+        if self.nlu_cache is not None:
+            key = (self._nlu_signature(), message.text.strip())
+            cached = self.nlu_cache.get(key)
+            if cached is not None:
+                return self._copy_analysis(cached)
+        
+        # Route the message to the NLU components for its language
+        language = self.language_support.detect_language(message)
+        pipeline = self._get_pipeline(language)
+        sentiment_analyzer = pipeline.sentiment_analyzer if pipeline else self.sentiment_analyzer
+        intent_recognizer = pipeline.intent_recognizer if pipeline else self.intent_recognizer
+        entity_extractor = pipeline.entity_extractor if pipeline else self.entity_extractor
+        
+        sentiment_analysis = sentiment_analyzer.analyze(message)
+        intent, confidence = intent_recognizer.recognize(message)
+        analysis = {
+            'language': language,
+            'sentiment': sentiment_analysis,
+            'intent': intent,
+            'confidence': confidence,
+            'entities': entity_extractor.extract(message)
+        }
+        
+        if key is not None:
+            self.nlu_cache.put(key, self._copy_analysis(analysis))
+        return analysis
+    
+    def _nlu_signature(self) -> tuple:
+        """Identify the NLU configuration that cached analyses depend on."""
+        return (
+            self.language_support.cache_token,
+            self.sentiment_analyzer.cache_token,
+            self.intent_recognizer.cache_token,
+            self.entity_extractor.cache_token,
+            self.language_pipelines.cache_token if self.language_pipelines is not None else None,
+        )
+    
+    def _get_pipeline(self, language: str) -> Optional[LanguagePipeline]:
+        """
+        Get the compiled NLU pipeline for a language.
+        
+        Args:
+            language: Language code
+            
+        Returns:
+            The language pipeline, or None when the bot's own (English)
+            components should be used
+        """
+        if self.language_pipelines is None:
+            return None
+        return self.language_pipelines.get(language)
+    
+    @property
+    def active_templates(self) -> ResponseTemplates:
+        """Response templates for the language of the current conversation."""
+        pipeline = self._get_pipeline(self.language_support.current_language)
+        return pipeline.response_templates if pipeline else self.response_templates
+    
+    @staticmethod
+    def _copy_analysis(analysis: Dict) -> Dict:
+        """Copy an analysis so cached entries are never shared mutably."""
+        sentiment = dict(analysis['sentiment'])
+        sentiment['positive_words'] = list(sentiment.get('positive_words', []))
+        sentiment['negative_words'] = list(sentiment.get('negative_words', []))
+        return {
+            'language': analysis['language'],
+            'sentiment': sentiment,
+            'intent': analysis['intent'],
+            'confidence': analysis['confidence'],
+            'entities': {k: list(v) for k, v in analysis['entities'].items()}
+        }
+    
+    def _generate_response(self, message: AnalyzedMessage, intent: str, 
                           confidence: float, entities: Dict, sentiment_analysis: Dict = None) -> str:
         """
         Generate response based on intent, context, and entities.
         
         Args:
-            user_message: User's message
+            message: Preprocessed user message
             intent: Detected intent
             confidence: Intent confidence score
             entities: Extracted entities
@@ -129,7 +231,8 @@ class ConversationalAIBot:
         Returns:
             Generated response
         """
-        user_message_lower = user_message.lower()
+        user_message = message.text
+        user_message_lower = message.normalized
         
         # Handle low confidence intents
         if confidence < INTENT_CONFIDENCE_THRESHOLD:
@@ -170,7 +273,7 @@ class ConversationalAIBot:
             return self._handle_name_query()
         
         elif intent == 'question':
-            return self._handle_question(user_message, entities)
+            return self._handle_question(user_message_lower, entities)
         
         elif intent == 'help':
             return self._handle_help()
@@ -195,40 +298,39 @@ class ConversationalAIBot:
         user_name = self.context_manager.get_user_name()
         
         if user_name:
-            return self.response_templates.get_response('greeting_with_name', name=user_name)
+            return self.active_templates.get_response('greeting_with_name', name=user_name)
         else:
-            return self.response_templates.get_response('greeting')
+            return self.active_templates.get_response('greeting')
     
     def _handle_goodbye(self) -> str:
         """Handle goodbye intent."""
         user_name = self.context_manager.get_user_name()
         
         if user_name:
-            return self.response_templates.get_response('goodbye_with_name', name=user_name)
+            return self.active_templates.get_response('goodbye_with_name', name=user_name)
         else:
-            return self.response_templates.get_response('goodbye')
+            return self.active_templates.get_response('goodbye')
     
     def _handle_name_introduction(self, entities: Dict) -> str:
         """Handle name introduction intent."""
         if 'PERSON' in entities and entities['PERSON']:
             name = entities['PERSON'][0]
-            return self.response_templates.get_response('name_introduction', name=name)
+            return self.active_templates.get_response('name_introduction', name=name)
         else:
-            return self.response_templates.get_response('name_not_found')
+            return self.active_templates.get_response('name_not_found')
     
     def _handle_name_query(self) -> str:
         """Handle name query intent."""
         user_name = self.context_manager.get_user_name()
         
         if user_name:
-            return self.response_templates.get_response('name_query', name=user_name)
+            return self.active_templates.get_response('name_query', name=user_name)
         else:
-            return self.response_templates.get_response('name_not_found')
+            return self.active_templates.get_response('name_not_found')
     
-    def _handle_question(self, user_message: str, entities: Dict) -> str:
-        """Handle question intent."""
-        user_message_lower = user_message.lower()
-        
+    def _handle_question(self, user_message_lower: str, entities: Dict) -> str:
+        """Handle question intent (expects the normalized message text)."""
+
         # Check for specific question types
         if 'what can you do' in user_message_lower or 'what do you do' in user_message_lower:
             return self._handle_help()
@@ -244,7 +346,7 @@ class ConversationalAIBot:
     
     def _handle_help(self) -> str:
         """Handle help intent."""
-        return self.response_templates.get_response('help')
+        return self.active_templates.get_response('help')
     
     def _handle_weather(self, entities: Dict) -> str:
         """Handle weather intent."""
@@ -256,38 +358,43 @@ class ConversationalAIBot:
             weather_data = self.api_integrations.get_weather(location)
             if weather_data.get('success'):
                 return f"Weather for {location}: {weather_data.get('temperature')}, {weather_data.get('condition')}"
-            return self.response_templates.get_response('weather', location=location)
+            return self.active_templates.get_response('weather', location=location)
         else:
             return "I'd be happy to help with weather information! Could you tell me which location you're interested in?"
     
     def _handle_time(self) -> str:
         """Handle time query intent."""
         current_time = datetime.now().strftime("%I:%M %p")
-        return self.response_templates.get_response('time', time=current_time)
+        return self.active_templates.get_response('time', time=current_time)
     
     def _handle_date(self) -> str:
         """Handle date query intent."""
         current_date = datetime.now().strftime("%B %d, %Y")
-        return self.response_templates.get_response('date', date=current_date)
+        return self.active_templates.get_response('date', date=current_date)
     
     def _handle_compliment(self) -> str:
         """Handle compliment intent."""
-        return self.response_templates.get_response('compliment')
+        return self.active_templates.get_response('compliment')
     
     def _handle_unknown_intent(self, user_message: str, sentiment_analysis: Dict = None) -> str:
         """Handle unknown or low-confidence intents."""
         # Try to use context to provide a better response
         recent_history = self.context_manager.get_recent_history(1)
         
+        # Escalate when the session's mood has been trending negative
+        if self.context_manager.is_frustrated():
+            return ("I'm sorry this hasn't been going well. Let's try another way: tell me in a few words "
+                    "what you need, or type 'help' to see what I can do.")
+        
         # Adjust response based on sentiment
         if sentiment_analysis and sentiment_analysis.get('sentiment') == 'negative':
             return "I sense you might be frustrated. I'm here to help! Could you rephrase your question or tell me what you need?"
         
         if recent_history:
             # Reference previous conversation
-            return self.response_templates.get_response('unknown')
+            return self.active_templates.get_response('unknown')
         else:
-            return self.response_templates.get_response('unknown')
+            return self.active_templates.get_response('unknown')
     
     def _extract_calculation(self, text: str) -> Optional[str]:
         """Extract mathematical expression from text."""
@@ -307,6 +414,15 @@ class ConversationalAIBot:
         """
         return self.context_manager.get_context_summary()
     
+    def get_sentiment_trend(self) -> Dict:
+        """
+        Get the rolling sentiment state of the current session.
+        
+        Returns:
+            Dictionary with average, min, max, negative streak and escalate flag
+        """
+        return self.context_manager.get_sentiment_state()
+    
     def get_conversation_history(self, limit: Optional[int] = None):
         """
         Get conversation history.
@@ -319,6 +435,64 @@ class ConversationalAIBot:
         """
         return self.conversation_history.get_history(limit)
     
+    def get_history_page(self, start: Optional[str] = None, end: Optional[str] = None,
+                         after: Optional[str] = None, before: Optional[str] = None,
+                         limit: Optional[int] = None) -> Dict:
+        """
+        Get one page of conversation history.
+        
+        Args:
+            start: Only entries at or after this ISO timestamp
+            end: Only entries before this ISO timestamp
+            after: Cursor from a previous page's 'next'
+            before: Cursor from a previous page's 'prev'
+            limit: Page size
+            
+        Returns:
+            Dictionary with 'entries' and the 'next' and 'prev' cursors
+        """
+        return self.conversation_history.query_history(start, end, after, before, limit)
+    
+    def search_history(self, query: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Search the stored turns of this session.
+        
+        Uses the shared index when the history store has one; otherwise
+        (e.g. the sharded backend, written by several worker processes)
+        the session's stored turns are indexed for this search only.
+        
+        Args:
+            query: Query string (words, "phrases", -exclusions, OR and
+                entity terms such as email:jo@example.com)
+            limit: Maximum number of results
+            
+        Returns:
+            Matching turns, best first, with their search score
+        """
+        if not query.strip():
+            return []
+        
+        limit = limit or HISTORY_INDEX_MAX_RESULTS
+        index = self.conversation_history.index
+        if index is None:
+            index = HistoryIndex(background=False)
+            index.backfill([(self.session_id, self.conversation_history.iter_history())])
+        results = index.search(query, limit, session_id=self.session_id)
+        entries = []
+        for result in results:
+            # Fetch only the turns stored at the hit's timestamp
+            timestamp = result['timestamp']
+            if not timestamp:
+                continue
+            page = self.conversation_history.query_history(
+                start=timestamp, end=timestamp + '\x00', limit=HISTORY_MAX_PAGE_SIZE
+            )
+            for entry in page['entries']:
+                if entry.get('timestamp') == timestamp and turn_key(entry) == result['turn']:
+                    entries.append(dict(entry, score=result['score']))
+                    break
+        return entries
+    
     def clear_session(self):
         """Clear current session context and history."""
         self.context_manager.clear_context()
@@ -344,6 +518,36 @@ class ConversationalAIBot:
         """
         return self.analytics.get_summary()
     
+    def get_nlu_cache_stats(self) -> Dict:
+        """
+        Get statistics of the shared NLU cache.
+        
+        Returns:
+            Dictionary with hits, misses, evictions and size
+        """
+        if self.nlu_cache is None:
+            return {'enabled': False}
+        stats = self.nlu_cache.get_stats()
+        stats['enabled'] = True
+        return stats
+    
+    def get_history_stats(self) -> Dict:
+        """
+        Get statistics of the conversation history storage.
+        
+        Returns:
+            Dictionary with per-tier sizes and hit counts (empty when
+            history is disabled); 'archive' has 'active' False when the
+            store has no archive tier
+        """
+        store = self.conversation_history.store
+        stats = store.get_stats() if store is not None else {}
+        if store is not None and not hasattr(store, 'archive'):
+            stats['archive'] = {'active': False}
+        if self.conversation_history.index is not None:
+            stats['index'] = self.conversation_history.index.get_stats()
+        return stats
+    
     def get_sentiment_analysis(self, text: str) -> Dict:
         """
         Analyze sentiment of text.
@@ -354,7 +558,9 @@ class ConversationalAIBot:
         Returns:
             Sentiment analysis results
         """
-        return self.sentiment_analyzer.analyze(text)
+        pipeline = self._get_pipeline(self.language_support.detect_language(text))
+        analyzer = pipeline.sentiment_analyzer if pipeline else self.sentiment_analyzer
+        return analyzer.analyze(text)
     
     def set_language(self, language_code: str) -> bool:
         """
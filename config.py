@@ -15,20 +15,90 @@ DEFAULT_RESPONSE = "I'm sorry, I didn't understand that. Could you please rephra
 # Context Management
 MAX_CONTEXT_HISTORY = 10  # Maximum number of previous messages to keep in context
 CONTEXT_TIMEOUT = 3600  # Context timeout in seconds (1 hour)
+SENTIMENT_EMA_ALPHA = 0.3  # Weight of the newest turn in the session's sentiment average
+SENTIMENT_ESCALATION_THRESHOLD = -0.3  # Average score at or below which a session is escalated
+SENTIMENT_NEGATIVE_STREAK = 3  # Consecutive negative turns that escalate a session
+SENTIMENT_AVERAGE_MIN_STREAK = 2  # Consecutive negative turns the average also needs before it escalates
+
+# External Context Store (shares web session context across workers and restarts)
+CONTEXT_STORE_BACKEND = "sqlite"  # "memory", "sqlite", "file" or "kv" (local stand-in for a networked cache)
+CONTEXT_STORE_DB = "context_store.db"  # Database file for the sqlite backend
+CONTEXT_STORE_DIR = "context_store"  # Directory for the file backend
+CONTEXT_STORE_TTL = 7 * 24 * 3600  # Stored contexts unused this long are removed by the retention sweeper
+CONTEXT_CACHE_SIZE = 1024  # Contexts kept in memory per worker (least recently used are dropped)
+CONTEXT_WRITE_BEHIND = True  # Save contexts on a background thread instead of in the request
+CONTEXT_WRITE_RETRIES = 3  # Merge-and-retry attempts when another worker saved the same session first
+CONTEXT_COMPRESS_MIN_BYTES = 256  # Serialized contexts at least this large are zlib-compressed
 
 # Intent Recognition
 INTENT_CONFIDENCE_THRESHOLD = 0.6  # Minimum confidence score for intent recognition
+INTENT_BACKEND = "rules"  # "rules" (keyword/pattern engine) or "sklearn" (trained classifier)
+INTENT_MODEL_PATH = "models/intent_classifier"  # Artifact directory for the sklearn backend
+
+# NLU Cache (shared across sessions in a process)
+ENABLE_NLU_CACHE = True
+NLU_CACHE_SIZE = 4096  # Maximum number of cached message analyses
+
+# Input Guard (bounds regex matching time on very long messages)
+MAX_NLU_INPUT_CHARS = 2000  # Characters of a message analyzed by the NLU stages
+REGEX_CHUNK_SIZE = 1024  # Long texts are scanned in chunks of this many characters
+REGEX_CHUNK_OVERLAP = 256  # Longest match that may cross a chunk boundary
+
+# Sentiment Analysis
+SENTIMENT_LEXICON_PATH = None  # Compiled weighted lexicon (see sentiment_lexicon.py), e.g. "data/sentiment.slx"
 
 # Entity Extraction
 SUPPORTED_ENTITIES = ['PERSON', 'DATE', 'TIME', 'LOCATION', 'ORGANIZATION', 'MONEY', 'PERCENT']
+GAZETTEER_PATH = None  # Compiled gazetteer file (see gazetteer.py), e.g. "data/gazetteer.gzt"
+ENTITY_BACKEND = "regex"  # "regex" (pattern scanner) or "spacy" (local spaCy model)
+SPACY_MODEL = "en_core_web_sm"  # spaCy model name or path for the spacy backend
+SPACY_BATCH_SIZE = 64  # Texts per nlp.pipe batch
+SPACY_N_PROCESS = 1  # Worker processes for batch extraction
+SPACY_MICROBATCH_WAIT_MS = 5  # How long online turns wait to be batched together
+SPACY_MICROBATCH_MAX_SIZE = 32  # Maximum online turns per micro-batch
 
 # Conversation History
 ENABLE_HISTORY = True
-HISTORY_FILE = "conversation_history.json"
-MAX_HISTORY_ENTRIES = 100
+HISTORY_FILE = "conversation_history.json"  # Single-file history (json backend; migrated by jsonl)
+MAX_HISTORY_ENTRIES = 100  # Entries per session kept by compaction and returned by default
+HISTORY_TAIL_SIZE = 20  # Newest turns per session kept in memory; older ones are read on demand
+HISTORY_PAGE_SIZE = 50  # Default page size of history queries
+HISTORY_MAX_PAGE_SIZE = 500  # Largest page a history query returns, whatever the caller asks for
+HISTORY_BACKEND = "sharded"  # "sharded" (file per session, multi-process), "sqlite" (multi-process), "jsonl" (append-only segment log, one process) or "json" (single file rewritten per turn)
+HISTORY_DIR = "conversation_history"  # Segment directory for the jsonl backend
+HISTORY_SHARD_DIR = "conversation_shards"  # Shard directory for the sharded backend
+HISTORY_SHARD_MAX_BYTES = 256 * 1024  # Shard size that triggers trimming to MAX_HISTORY_ENTRIES
+HISTORY_DB = "conversation_history.db"  # Database file for the sqlite backend
+HISTORY_SQLITE_BATCH_SIZE = 64  # Buffered appends that trigger an immediate batch insert
+ENABLE_HISTORY_ARCHIVE = False  # Move idle sessions into compressed archive files (jsonl backend only; inactive with the multi-process backends)
+HISTORY_ARCHIVE_DIR = "conversation_archive"  # Directory for archived sessions
+HISTORY_ARCHIVE_IDLE_SECONDS = 7 * 24 * 3600  # Idle time in seconds before a session is archived (1 week)
+HISTORY_ARCHIVE_COMPRESSION = "gzip"  # "gzip" or "lzma"
+HISTORY_ARCHIVE_INTERVAL = 3600  # Seconds between background archive runs
+ENABLE_RETENTION = True  # Expire old history in the background (limits below; 0 disables a limit)
+RETENTION_MAX_AGE_DAYS = 365  # Sessions idle longer than this expire
+RETENTION_MAX_SESSIONS = 0  # Most sessions kept; the least recently active expire first
+RETENTION_MAX_BYTES = 0  # Most stored history bytes kept; the least recently active sessions expire first
+RETENTION_ACTION = "delete"  # "delete", or "archive" to move expired sessions to the archive tier
+RETENTION_INTERVAL = 3600  # Seconds between retention sweeps
+RETENTION_BATCH_SIZE = 100  # Sessions handled per sweep batch
+RETENTION_BATCH_PAUSE = 0.05  # Seconds to pause between sweep batches
+BOT_IDLE_SECONDS = 24 * 3600  # Web sessions unused this long are dropped from memory by the sweeper
+ENABLE_HISTORY_INDEX = True  # Keep an in-memory full-text index of stored turns (per process, so jsonl backend only; other backends search a session by scanning it)
+HISTORY_INDEX_BACKFILL = True  # Index turns already in the store on a background thread at startup
+HISTORY_INDEX_MAX_RESULTS = 50  # Default number of search results
+HISTORY_FSYNC = "interval"  # "always" (every record), "interval" (every HISTORY_FSYNC_INTERVAL_MS) or "os"
+HISTORY_FSYNC_INTERVAL_MS = 100  # Maximum time between fsyncs for the interval policy
+HISTORY_SEGMENT_MAX_BYTES = 4 * 1024 * 1024  # The active segment is sealed once it grows past this
+HISTORY_COMPACT_SEGMENTS = 4  # Sealed segments that trigger background compaction (0 disables)
 
 # NLP Settings
 LANGUAGE = "en"
+LANGUAGE_MIN_CONFIDENCE = 0.6  # Below this, ambiguous Latin-script text is treated as English
+LANGUAGE_SHORT_TEXT_TRIGRAMS = 7  # Texts with fewer trigrams (one word of up to 5 letters) are short
+LANGUAGE_SHORT_MIN_CONFIDENCE = 0.9  # Confidence short texts need to be treated as non-English
+ENABLE_LANGUAGE_PIPELINES = True  # Route non-English turns to per-language NLU resources
+LANGUAGE_PIPELINE_CACHE_SIZE = 4  # Compiled language pipelines kept per process
 USE_LEMMATIZATION = True
 REMOVE_STOPWORDS = True
 
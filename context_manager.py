@@ -10,15 +10,159 @@ Year: 2026
 """
 
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
-from config import MAX_CONTEXT_HISTORY, CONTEXT_TIMEOUT
+from datetime import datetime
+import json
+import sys
+import time
+import zlib
+from config import (
+    MAX_CONTEXT_HISTORY, CONTEXT_TIMEOUT, SENTIMENT_EMA_ALPHA,
+    SENTIMENT_ESCALATION_THRESHOLD, SENTIMENT_NEGATIVE_STREAK, SENTIMENT_AVERAGE_MIN_STREAK,
+    CONTEXT_COMPRESS_MIN_BYTES
+)
+
+MAX_PREVIOUS_INTENTS = 5
+
+# First byte of serialized context: how the rest is encoded
+FORMAT_JSON = 1
+FORMAT_ZLIB = 2
+
+# Turn times are monotonic clock readings; this offset turns them into
+# wall-clock time only when a turn is displayed
+_WALL_CLOCK_OFFSET = time.time() - time.monotonic()
+
+
+def _initial_sentiment_state() -> Dict[str, Any]:
+    """Rolling sentiment state of a session with no turns yet."""
+    return {
+        'turns': 0,
+        'average': 0.0,
+        'min': None,
+        'max': None,
+        'negative_streak': 0,
+        'last': None,
+    }
+
+
+def _as_datetime(moment: float) -> datetime:
+    """Wall-clock time of a monotonic clock reading."""
+    return datetime.fromtimestamp(moment + _WALL_CLOCK_OFFSET)
+
+
+def _to_epoch(moment: float) -> float:
+    """Epoch seconds (millisecond precision) of a monotonic clock reading."""
+    return round(moment + _WALL_CLOCK_OFFSET, 3)
+
+
+def _from_epoch(epoch: float) -> float:
+    """Monotonic clock reading of epoch seconds taken in any process."""
+    return epoch - _WALL_CLOCK_OFFSET
+
+
+class RingBuffer:
+    """
+    Fixed-capacity sequence backed by a preallocated list.
+    
+    Appending to a full buffer overwrites the oldest item in place.
+    Indexing and iteration go from oldest to newest.
+    """
+    
+    __slots__ = ('_items', '_start', '_size')
+    
+    def __init__(self, capacity: int):
+        """
+        Create an empty buffer.
+        
+        Args:
+            capacity: Maximum number of items kept
+        """
+        self._items: List[Any] = [None] * max(0, capacity)
+        self._start = 0
+        self._size = 0
+    
+    @property
+    def capacity(self) -> int:
+        """Maximum number of items kept."""
+        return len(self._items)
+    
+    def append(self, item: Any):
+        """Add an item, dropping the oldest one when the buffer is full."""
+        items = self._items
+        capacity = len(items)
+        if self._size < capacity:
+            items[(self._start + self._size) % capacity] = item
+            self._size += 1
+        elif capacity:
+            items[self._start] = item
+            self._start = (self._start + 1) % capacity
+    
+    def clear(self):
+        """Remove every item."""
+        for i in range(len(self._items)):
+            self._items[i] = None
+        self._start = 0
+        self._size = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ring buffer index out of range")
+        return self._items[(self._start + index) % len(self._items)]
+    
+    def __iter__(self):
+        for i in range(self._size):
+            yield self._items[(self._start + i) % len(self._items)]
+
+
+class TurnRecord:
+    """
+    One conversation turn kept in the context window.
+    """
+    
+    __slots__ = ('user_message', 'bot_response', 'time', 'intent', 'entities')
+    
+    def __init__(self, user_message: str, bot_response: str, moment: float,
+                 intent: Optional[str], entities: Optional[Dict]):
+        self.user_message = user_message
+        self.bot_response = bot_response
+        self.time = moment
+        self.intent = intent
+        self.entities = entities
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the turn as a history entry.
+        
+        Returns:
+            Dictionary with user_message, bot_response, timestamp (ISO
+            format), intent and entities
+        """
+        return {
+            'user_message': self.user_message,
+            'bot_response': self.bot_response,
+            'timestamp': _as_datetime(self.time).isoformat(),
+            'intent': self.intent,
+            'entities': self.entities
+        }
 
 
 class ContextManager:
     """
     Manages conversation context for maintaining state across multiple turns.
+    
+    Recent turns and intents are kept in preallocated ring buffers, so a
+    turn that overflows the window overwrites the oldest one in place.
+    Intent and entity type names are interned, so every session shares
+    one copy of each. Each turn reads the monotonic clock once.
     """
     
+    __slots__ = ('session_id', 'user_name', 'entities', 'previous_intents', 'conversation_history',
+                 'session_start', 'last_activity', 'sentiment', 'generation', 'max_history', 'timeout')
+    
     def __init__(self, session_id: str = "default"):
         """
         Initialize context manager.
@@ -27,16 +171,18 @@ class ContextManager:
             session_id: Unique identifier for the conversation session
         """
         self.session_id = session_id
-        self.context: Dict[str, Any] = {
-            'user_name': None,
-            'entities': {},
-            'previous_intents': [],
-            'conversation_history': [],
-            'session_start': datetime.now(),
-            'last_activity': datetime.now(),
-        }
         self.max_history = MAX_CONTEXT_HISTORY
         self.timeout = CONTEXT_TIMEOUT
+        self.user_name: Optional[str] = None
+        self.entities: Dict[str, Any] = {}
+        self.previous_intents = RingBuffer(MAX_PREVIOUS_INTENTS)
+        self.conversation_history = RingBuffer(self.max_history)
+        self.session_start = time.monotonic()
+        self.last_activity = self.session_start
+        self.sentiment = _initial_sentiment_state()
+        # Number of times the context was cleared; copies from before a
+        # clear never merge into the cleared context
+        self.generation = 0
     
     def update_context(self, user_message: str, bot_response: str, 
                       intent: Optional[str] = None, entities: Optional[Dict] = None):
@@ -49,48 +195,98 @@ class ContextManager:
             intent: Detected intent
             entities: Extracted entities
         """
-        # Update last activity time
-        self.context['last_activity'] = datetime.now()
-        
-        # Add to conversation history
-        self.context['conversation_history'].append({
-            'user_message': user_message,
-            'bot_response': bot_response,
-            'timestamp': datetime.now().isoformat(),
-            'intent': intent,
-            'entities': entities
-        })
+        now = time.monotonic()
+        self.last_activity = now
+        if intent:
+            intent = sys.intern(intent)
         
-        # Limit history size
-        if len(self.context['conversation_history']) > self.max_history:
-            self.context['conversation_history'] = \
-                self.context['conversation_history'][-self.max_history:]
+        # Overwrites the oldest turn once the window is full
+        self.conversation_history.append(TurnRecord(user_message, bot_response, now, intent, entities))
         
-        # Update entities
         if entities:
-            self.context['entities'].update(entities)
+            stored = self.entities
+            for entity_type, values in entities.items():
+                stored[sys.intern(entity_type)] = values
+            
+            # Extract and store user name if mentioned
+            names = entities.get('PERSON')
+            if names:
+                self.user_name = names[0]
         
-        # Track previous intents
         if intent:
-            self.context['previous_intents'].append(intent)
-            if len(self.context['previous_intents']) > 5:
-                self.context['previous_intents'] = \
-                    self.context['previous_intents'][-5:]
-        
-        # Extract and store user name if mentioned
-        if entities and 'PERSON' in entities:
-            names = entities['PERSON']
-            if names:
-                self.context['user_name'] = names[0]
+            self.previous_intents.append(intent)
+    
+    def update_sentiment(self, score: float, sentiment: str):
+        """
+        Fold one turn's sentiment into the session's rolling state in O(1).
+        
+        Keeps an exponential moving average of the score, the minimum and
+        maximum score, and the number of consecutive negative turns.
+        
+        Args:
+            score: Sentiment score of the turn (-1.0 to 1.0)
+            sentiment: Sentiment label of the turn
+        """
+        state = self.sentiment
+        if state['turns']:
+            state['average'] = SENTIMENT_EMA_ALPHA * score + (1 - SENTIMENT_EMA_ALPHA) * state['average']
+            state['min'] = min(state['min'], score)
+            state['max'] = max(state['max'], score)
+        else:
+            state['average'] = score
+            state['min'] = score
+            state['max'] = score
+        state['turns'] += 1
+        state['negative_streak'] = state['negative_streak'] + 1 if sentiment == 'negative' else 0
+        state['last'] = sentiment
+    
+    def get_sentiment_state(self) -> Dict[str, Any]:
+        """
+        Get the session's rolling sentiment state.
+        
+        Returns:
+            Dictionary with turns, average, min, max, negative_streak,
+            last (label of the latest turn) and escalate
+        """
+        state = dict(self.sentiment)
+        state['average'] = round(state['average'], 3)
+        state['escalate'] = self.is_frustrated()
+        return state
+    
+    def is_frustrated(self) -> bool:
+        """
+        Check whether the session's mood is trending negative.
+        
+        Returns:
+            True after SENTIMENT_NEGATIVE_STREAK negative turns in a row, or
+            when the average score falls to SENTIMENT_ESCALATION_THRESHOLD
+            after at least SENTIMENT_AVERAGE_MIN_STREAK negative turns in a
+            row (a single negative turn is not a trend)
+        """
+        state = self.sentiment
+        if state['negative_streak'] >= SENTIMENT_NEGATIVE_STREAK:
+            return True
+        return (state['negative_streak'] >= SENTIMENT_AVERAGE_MIN_STREAK
+                and state['average'] <= SENTIMENT_ESCALATION_THRESHOLD)
     
     def get_context(self) -> Dict[str, Any]:
         """
         Get current context.
         
         Returns:
-            Current context dictionary
+            Dictionary with user_name, entities, previous_intents,
+            conversation_history (entries oldest first), session_start,
+            last_activity and sentiment
         """
-        return self.context.copy()
+        return {
+            'user_name': self.user_name,
+            'entities': self.entities.copy(),
+            'previous_intents': list(self.previous_intents),
+            'conversation_history': [turn.to_dict() for turn in self.conversation_history],
+            'session_start': _as_datetime(self.session_start),
+            'last_activity': _as_datetime(self.last_activity),
+            'sentiment': dict(self.sentiment),
+        }
     
     def get_user_name(self) -> Optional[str]:
         """
@@ -99,7 +295,7 @@ class ContextManager:
         Returns:
             User name if available, None otherwise
         """
-        return self.context.get('user_name')
+        return self.user_name
     
     def get_entities(self) -> Dict[str, Any]:
         """
@@ -108,7 +304,7 @@ class ContextManager:
         Returns:
             Dictionary of stored entities
         """
-        return self.context.get('entities', {}).copy()
+        return self.entities.copy()
     
     def get_recent_history(self, count: int = 3) -> List[Dict]:
         """
@@ -120,8 +316,11 @@ class ContextManager:
         Returns:
             List of recent conversation entries
         """
-        history = self.context.get('conversation_history', [])
-        return history[-count:] if history else []
+        if count <= 0:
+            return []
+        history = self.conversation_history
+        first = max(0, len(history) - count)
+        return [history[i].to_dict() for i in range(first, len(history))]
     
     def get_previous_intent(self) -> Optional[str]:
         """
@@ -130,19 +329,131 @@ class ContextManager:
         Returns:
             Most recent intent if available, None otherwise
         """
-        intents = self.context.get('previous_intents', [])
-        return intents[-1] if intents else None
+        return self.previous_intents[-1] if self.previous_intents else None
+    
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the context for an external context store.
+        
+        The state is written as a compact JSON array without field names,
+        and zlib-compressed once it reaches CONTEXT_COMPRESS_MIN_BYTES.
+        Times are stored as epoch seconds, so any process can load them.
+        
+        Returns:
+            One format byte followed by the encoded state
+        """
+        sentiment = self.sentiment
+        state = [
+            self.user_name,
+            self.entities,
+            list(self.previous_intents),
+            [[turn.user_message, turn.bot_response, _to_epoch(turn.time), turn.intent, turn.entities]
+             for turn in self.conversation_history],
+            _to_epoch(self.session_start),
+            _to_epoch(self.last_activity),
+            [sentiment['turns'], sentiment['average'], sentiment['min'], sentiment['max'],
+             sentiment['negative_streak'], sentiment['last']],
+            self.generation,
+        ]
+        body = json.dumps(state, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        if len(body) >= CONTEXT_COMPRESS_MIN_BYTES:
+            return bytes([FORMAT_ZLIB]) + zlib.compress(body)
+        return bytes([FORMAT_JSON]) + body
+    
+    @classmethod
+    def from_bytes(cls, session_id: str, data: bytes) -> 'ContextManager':
+        """
+        Rebuild a context serialized with to_bytes.
+        
+        Args:
+            session_id: Session the context belongs to
+            data: Serialized context
+            
+        Returns:
+            New ContextManager with the stored state
+        """
+        if not data or data[0] not in (FORMAT_JSON, FORMAT_ZLIB):
+            raise ValueError("Unknown context serialization format")
+        body = zlib.decompress(data[1:]) if data[0] == FORMAT_ZLIB else data[1:]
+        state = json.loads(body)
+        user_name, entities, intents, turns, session_start, last_activity, sentiment = state[:7]
+        
+        manager = cls(session_id)
+        manager.user_name = user_name
+        manager.entities = {sys.intern(entity_type): values for entity_type, values in entities.items()}
+        for intent in intents:
+            manager.previous_intents.append(sys.intern(intent))
+        for user_message, bot_response, moment, intent, turn_entities in turns:
+            manager.conversation_history.append(TurnRecord(
+                user_message, bot_response, _from_epoch(moment),
+                sys.intern(intent) if intent else intent, turn_entities
+            ))
+        manager.session_start = _from_epoch(session_start)
+        manager.last_activity = _from_epoch(last_activity)
+        manager.sentiment = dict(zip(
+            ('turns', 'average', 'min', 'max', 'negative_streak', 'last'), sentiment
+        ))
+        manager.generation = state[7] if len(state) > 7 else 0
+        return manager
+    
+    def merge(self, other: 'ContextManager'):
+        """
+        Fold in another copy of this session's context.
+        
+        Used when two workers updated the same session concurrently. If
+        one copy was cleared more often, it replaces the other outright, so
+        a clear is never undone by turns from before it. Otherwise the
+        turns of both copies are kept (ordered by time, up to the window
+        size), and the name, entities and sentiment of the more recently
+        active copy win.
+        
+        Args:
+            other: Another ContextManager of the same session
+        """
+        if other.generation != self.generation:
+            if other.generation > self.generation:
+                for name in ('user_name', 'entities', 'previous_intents', 'conversation_history',
+                             'session_start', 'last_activity', 'sentiment', 'generation'):
+                    setattr(self, name, getattr(other, name))
+            return
+        
+        seen = set()
+        turns = []
+        for turn in list(self.conversation_history) + list(other.conversation_history):
+            key = (round(turn.time, 3), turn.user_message)
+            if key not in seen:
+                seen.add(key)
+                turns.append(turn)
+        turns.sort(key=lambda turn: turn.time)
+        
+        older, newer = (self, other) if other.last_activity >= self.last_activity else (other, self)
+        entities = dict(older.entities)
+        entities.update(newer.entities)
+        user_name = newer.user_name or older.user_name
+        sentiment = dict(newer.sentiment)
+        
+        self.conversation_history.clear()
+        self.previous_intents.clear()
+        for turn in turns:
+            self.conversation_history.append(turn)
+            if turn.intent:
+                self.previous_intents.append(turn.intent)
+        self.entities = entities
+        self.user_name = user_name
+        self.sentiment = sentiment
+        self.session_start = min(self.session_start, other.session_start)
+        self.last_activity = max(self.last_activity, other.last_activity)
     
     def clear_context(self):
         """Clear all context data."""
-        self.context = {
-            'user_name': None,
-            'entities': {},
-            'previous_intents': [],
-            'conversation_history': [],
-            'session_start': datetime.now(),
-            'last_activity': datetime.now(),
-        }
+        self.user_name = None
+        self.entities = {}
+        self.previous_intents.clear()
+        self.conversation_history.clear()
+        self.session_start = time.monotonic()
+        self.last_activity = self.session_start
+        self.sentiment = _initial_sentiment_state()
+        self.generation += 1
     
     def is_context_expired(self) -> bool:
         """
@@ -151,15 +462,7 @@ class ContextManager:
         Returns:
             True if context has expired, False otherwise
         """
-        last_activity = self.context.get('last_activity')
-        if not last_activity:
-            return False
-        
-        if isinstance(last_activity, str):
-            last_activity = datetime.fromisoformat(last_activity)
-        
-        elapsed = (datetime.now() - last_activity).total_seconds()
-        return elapsed > self.timeout
+        return time.monotonic() - self.last_activity > self.timeout
     
     def get_context_summary(self) -> str:
         """
@@ -170,14 +473,20 @@ class ContextManager:
         """
         summary_parts = []
         
-        if self.context.get('user_name'):
-            summary_parts.append(f"User name: {self.context['user_name']}")
+        if self.user_name:
+            summary_parts.append(f"User name: {self.user_name}")
+        
+        if self.entities:
+            summary_parts.append(f"Entities: {len(self.entities)} stored")
         
-        if self.context.get('entities'):
-            summary_parts.append(f"Entities: {len(self.context['entities'])} stored")
+        summary_parts.append(f"Conversation turns: {len(self.conversation_history)}")
         
-        history_count = len(self.context.get('conversation_history', []))
-        summary_parts.append(f"Conversation turns: {history_count}")
+        sentiment = self.sentiment
+        if sentiment['turns']:
+            summary_parts.append(
+                f"Mood: {sentiment['average']:+.2f} average, "
+                f"{sentiment['negative_streak']} negative in a row"
+            )
         
         return ", ".join(summary_parts) if summary_parts else "No context available"
 
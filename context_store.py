@@ -0,0 +1,748 @@
+"""
+Context Store Module
+External storage for conversation context, so any worker can serve any session.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Any, Dict, Optional, Set, Tuple
+from collections import OrderedDict
+from urllib.parse import quote
+import atexit
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+from context_manager import ContextManager
+from file_utils import file_lock, write_file_atomic
+from config import (
+    CONTEXT_STORE_BACKEND, CONTEXT_STORE_DB, CONTEXT_STORE_DIR, CONTEXT_STORE_TTL,
+    CONTEXT_CACHE_SIZE, CONTEXT_WRITE_BEHIND, CONTEXT_WRITE_RETRIES
+)
+
+# Stored contexts of the file and key-value backends start with their version
+VERSION_HEADER = struct.Struct('>Q')
+
+# Stored data of a deleted context
+TOMBSTONE = b''
+
+
+def first_version() -> int:
+    """
+    Version of a newly created context record.
+
+    Taken from the clock in milliseconds, so a record created after an
+    earlier one of the session expired starts above every version the
+    earlier one reached.
+    """
+    return max(1, int(time.time() * 1000))
+
+
+class ConflictError(Exception):
+    """Raised when a context was saved by someone else since it was read."""
+
+
+class ContextStore:
+    """
+    Interface shared by the context storage backends.
+
+    Every stored context carries a version that grows by one with each
+    save (see first_version for the start). A save names the version it
+    was based on (0 for a new session) and fails with ConflictError if the
+    stored version has moved on, so concurrent writers never overwrite
+    each other unnoticed. Versions never repeat: deleting a context stores
+    a tombstone (empty data) with the next version, so a copy cached
+    before the delete never passes for the current one.
+    """
+
+    def get(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        """
+        Return (version, serialized context) of a session, or None if not stored.
+
+        The data is TOMBSTONE (empty) if the context was deleted.
+        """
+        raise NotImplementedError
+
+    def version(self, session_id: str) -> int:
+        """Return the stored version of a session (0 if not stored)."""
+        record = self.get(session_id)
+        return record[0] if record else 0
+
+    def put(self, session_id: str, data: bytes, expected_version: int) -> int:
+        """
+        Save a serialized context if its stored version is unchanged.
+
+        Args:
+            session_id: Session identifier
+            data: Serialized context
+            expected_version: Version the context was based on (0 if new)
+
+        Returns:
+            The new version
+
+        Raises:
+            ConflictError: If the stored version is not expected_version
+        """
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        """Replace a session's context with a tombstone under the next version."""
+        while True:
+            version = self.version(session_id)
+            if not version:
+                return
+            try:
+                self.put(session_id, TOMBSTONE, version)
+                return
+            except ConflictError:
+                continue
+
+    def expire(self, older_than: float) -> int:
+        """
+        Remove contexts last saved before an epoch time.
+
+        Returns:
+            Number of contexts removed
+        """
+        return 0
+
+    def close(self):
+        """Release resources."""
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics."""
+        return {}
+
+
+class MemoryContextStore(ContextStore):
+    """
+    Context store in a dictionary of this process.
+
+    Contexts do not outlive the process and are not shared with other
+    workers; useful for a single process and for tests.
+    """
+
+    def __init__(self):
+        """Initialize an empty store."""
+        self._records: Dict[str, Tuple[int, bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        record = self._records.get(session_id)
+        return (record[0], record[1]) if record else None
+
+    def put(self, session_id: str, data: bytes, expected_version: int) -> int:
+        with self._lock:
+            record = self._records.get(session_id)
+            current = record[0] if record else 0
+            if current != expected_version:
+                raise ConflictError(f"Context {session_id} is at version {current}, not {expected_version}")
+            version = current + 1 if current else first_version()
+            self._records[session_id] = (version, data, time.time())
+            return version
+
+    def expire(self, older_than: float) -> int:
+        with self._lock:
+            expired = [sid for sid, record in self._records.items() if record[2] < older_than]
+            for session_id in expired:
+                del self._records[session_id]
+        return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'backend': 'memory', 'sessions': len(self._records)}
+
+
+class SQLiteContextStore(ContextStore):
+    """
+    Context store in a SQLite database shared by the worker processes of a host.
+
+    The database runs in WAL mode, so reads do not wait for writers. A
+    save is a single conditional UPDATE (or INSERT for a new session),
+    which SQLite applies atomically across processes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS contexts (
+            session_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_contexts_updated ON contexts (updated_at);
+    """
+
+    def __init__(self, path: str = CONTEXT_STORE_DB):
+        """
+        Initialize the store.
+
+        Args:
+            path: Database file
+        """
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        row = self._connection().execute(
+            "SELECT version, data FROM contexts WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def version(self, session_id: str) -> int:
+        row = self._connection().execute(
+            "SELECT version FROM contexts WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def put(self, session_id: str, data: bytes, expected_version: int) -> int:
+        conn = self._connection()
+        if expected_version == 0:
+            version = first_version()
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO contexts (session_id, version, data, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, version, data, time.time())
+            )
+        else:
+            version = expected_version + 1
+            cursor = conn.execute(
+                "UPDATE contexts SET version = ?, data = ?, updated_at = ? "
+                "WHERE session_id = ? AND version = ?",
+                (version, data, time.time(), session_id, expected_version)
+            )
+        if cursor.rowcount != 1:
+            raise ConflictError(f"Context {session_id} is no longer at version {expected_version}")
+        return version
+
+    def expire(self, older_than: float) -> int:
+        return self._connection().execute(
+            "DELETE FROM contexts WHERE updated_at < ?", (older_than,)
+        ).rowcount
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def get_stats(self) -> Dict[str, Any]:
+        count = self._connection().execute("SELECT COUNT(*) FROM contexts").fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, 'sessions': count}
+
+
+class FileContextStore(ContextStore):
+    """
+    Context store with one file per session, shared through a filesystem.
+
+    A file holds the 8-byte version followed by the serialized context,
+    at directory/<first two hex digits of the id's SHA-1>/<quoted id>.ctx.
+    Saves replace the file atomically while holding an advisory lock on
+    the subdirectory's LOCK file, so readers never see a partial context
+    and saves from several processes are serialized.
+    """
+
+    def __init__(self, directory: str = CONTEXT_STORE_DIR):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Root directory of the context files
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def context_path(self, session_id: str) -> str:
+        """File holding a session's context."""
+        digest = hashlib.sha1(session_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], quote(session_id, safe='') + '.ctx')
+
+    @staticmethod
+    def _read(path: str, header_only: bool = False) -> Optional[Tuple[int, bytes]]:
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read(VERSION_HEADER.size) if header_only else f.read()
+        except FileNotFoundError:
+            return None
+        return VERSION_HEADER.unpack_from(raw)[0], raw[VERSION_HEADER.size:]
+
+    def get(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        return self._read(self.context_path(session_id))
+
+    def version(self, session_id: str) -> int:
+        record = self._read(self.context_path(session_id), header_only=True)
+        return record[0] if record else 0
+
+    def put(self, session_id: str, data: bytes, expected_version: int) -> int:
+        path = self.context_path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock, file_lock(os.path.join(os.path.dirname(path), 'LOCK')):
+            record = self._read(path, header_only=True)
+            current = record[0] if record else 0
+            if current != expected_version:
+                raise ConflictError(f"Context {session_id} is at version {current}, not {expected_version}")
+            version = current + 1 if current else first_version()
+            write_file_atomic(path, VERSION_HEADER.pack(version) + data, sync=False)
+        return version
+
+    def expire(self, older_than: float) -> int:
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            with self._lock, file_lock(os.path.join(entry.path, 'LOCK')):
+                for context_file in os.scandir(entry.path):
+                    if context_file.name.endswith('.ctx') and context_file.stat().st_mtime < older_than:
+                        os.unlink(context_file.path)
+                        removed += 1
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        count = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_dir():
+                count += sum(1 for name in os.listdir(entry.path) if name.endswith('.ctx'))
+        return {'backend': 'file', 'directory': self.directory, 'sessions': count}
+
+
+class LocalKeyValueClient:
+    """
+    In-process key-value cache with the memcached client interface.
+
+    Stands in for a networked cache (memcached, or Redis through a thin
+    adapter): KeyValueContextStore only calls get, gets, add and cas, so
+    a client of a real cache with the same methods can replace it without
+    other changes. Keys expire `ttl` seconds after they are set.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._items: Dict[str, Tuple[bytes, int, float]] = {}
+        self._lock = threading.Lock()
+        self._next_token = 1
+
+    def _live(self, key: str) -> Optional[Tuple[bytes, int, float]]:
+        item = self._items.get(key)
+        if item is not None and item[2] and item[2] <= time.time():
+            del self._items[key]
+            return None
+        return item
+
+    def _store(self, key: str, value: bytes, ttl: float):
+        self._items[key] = (value, self._next_token, time.time() + ttl if ttl else 0.0)
+        self._next_token += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Value of a key, or None."""
+        with self._lock:
+            item = self._live(key)
+            return item[0] if item else None
+
+    def gets(self, key: str) -> Tuple[Optional[bytes], Optional[int]]:
+        """Value of a key and its CAS token, or (None, None)."""
+        with self._lock:
+            item = self._live(key)
+            return (item[0], item[1]) if item else (None, None)
+
+    def set(self, key: str, value: bytes, ttl: float = 0) -> bool:
+        """Store a value unconditionally."""
+        with self._lock:
+            self._store(key, value, ttl)
+            return True
+
+    def add(self, key: str, value: bytes, ttl: float = 0) -> bool:
+        """Store a value only if the key is absent."""
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def cas(self, key: str, value: bytes, token: int, ttl: float = 0) -> bool:
+        """Store a value only if the key still has the CAS token returned by gets."""
+        with self._lock:
+            item = self._live(key)
+            if item is None or item[1] != token:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, key: str) -> bool:
+        """Remove a key."""
+        with self._lock:
+            return self._items.pop(key, None) is not None
+
+    def purge(self) -> int:
+        """Drop expired keys (a networked cache does this itself)."""
+        with self._lock:
+            expired = [key for key in list(self._items) if self._live(key) is None]
+        return len(expired)
+
+
+class KeyValueContextStore(ContextStore):
+    """
+    Context store in a key-value cache.
+
+    A value holds the 8-byte context version followed by the serialized
+    context. New sessions are written with add and later saves with cas,
+    so the cache rejects a save based on an outdated read. Contexts expire
+    through the cache's own TTL.
+    """
+
+    def __init__(self, client: Optional[Any] = None, prefix: str = 'context:',
+                 ttl: float = CONTEXT_STORE_TTL):
+        """
+        Initialize the store.
+
+        Args:
+            client: Cache client with get, gets, add, cas and delete
+                (defaults to a LocalKeyValueClient)
+            prefix: Prepended to session ids to form keys
+            ttl: Seconds a context is kept after its last save (0 keeps it)
+        """
+        self.client = client if client is not None else LocalKeyValueClient()
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        value = self.client.get(self.prefix + session_id)
+        if value is None:
+            return None
+        return VERSION_HEADER.unpack_from(value)[0], value[VERSION_HEADER.size:]
+
+    def put(self, session_id: str, data: bytes, expected_version: int) -> int:
+        key = self.prefix + session_id
+        version = expected_version + 1 if expected_version else first_version()
+        value = VERSION_HEADER.pack(version) + data
+        if expected_version == 0:
+            stored = self.client.add(key, value, self.ttl)
+        else:
+            current, token = self.client.gets(key)
+            stored = (current is not None
+                      and VERSION_HEADER.unpack_from(current)[0] == expected_version
+                      and self.client.cas(key, value, token, self.ttl))
+        if not stored:
+            raise ConflictError(f"Context {session_id} is no longer at version {expected_version}")
+        return version
+
+    def expire(self, older_than: float) -> int:
+        purge = getattr(self.client, 'purge', None)
+        return purge() if purge is not None else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'backend': 'kv', 'client': type(self.client).__name__}
+
+
+class ContextCache:
+    """
+    Read-through, write-behind cache of ContextManagers over a context store.
+
+    load checks the stored version of a session (one small read) and only
+    fetches and deserializes the context when another worker saved a newer
+    one. save serializes the context and queues it; a background thread
+    writes it with the version it was based on. Queued saves of a session
+    are coalesced, and until its save is written a session is served from
+    memory. When another worker saved the same session first, the writer
+    merges both copies (ContextManager.merge) and retries, up to
+    `retries` times. A save based on a copy read before the session was
+    deleted is dropped, so a delete is never undone.
+    """
+
+    def __init__(self, store: ContextStore, max_sessions: int = CONTEXT_CACHE_SIZE,
+                 write_behind: bool = CONTEXT_WRITE_BEHIND, retries: int = CONTEXT_WRITE_RETRIES):
+        """
+        Initialize the cache.
+
+        Args:
+            store: Context store to read and write
+            max_sessions: Contexts kept in memory (least recently used dropped)
+            write_behind: Save on a background thread instead of in save()
+            retries: Merge-and-retry attempts after a version conflict
+        """
+        self.store = store
+        self.max_sessions = max_sessions
+        self.retries = retries
+
+        # session id -> [stored version (None after a merge: reload), manager]
+        self._entries: 'OrderedDict[str, list]' = OrderedDict()
+        self._pending: Dict[str, bytes] = {}
+        self._writing: Set[str] = set()
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self.hits = 0
+        self.loads = 0
+        self.writes = 0
+        self.conflicts = 0
+        self.merges = 0
+        self.dropped_writes = 0
+        self.failed_writes = 0
+
+        self._writer = None
+        if write_behind:
+            self._writer = threading.Thread(target=self._run_writer, name='context-writer', daemon=True)
+            self._writer.start()
+
+    def load(self, session_id: str) -> ContextManager:
+        """
+        Get a session's context, reading it from the store if it changed there.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            The session's ContextManager (a new one if nothing is stored)
+        """
+        with self._condition:
+            entry = self._entries.get(session_id)
+            if entry is not None and (session_id in self._pending or session_id in self._writing):
+                # Not yet written: the copy in memory is the newest one
+                self._entries.move_to_end(session_id)
+                self.hits += 1
+                return entry[1]
+
+        if entry is not None and entry[0] is not None and entry[0] == self.store.version(session_id):
+            with self._condition:
+                self.hits += 1
+            return entry[1]
+
+        record = self.store.get(session_id)
+        if record is None or record[1] == TOMBSTONE:
+            version, manager = (record[0] if record else 0), ContextManager(session_id)
+        else:
+            version, manager = record[0], ContextManager.from_bytes(session_id, record[1])
+
+        with self._condition:
+            current = self._entries.get(session_id)
+            if current is not None and (session_id in self._pending or session_id in self._writing):
+                return current[1]
+            self._entries[session_id] = [version, manager]
+            self._entries.move_to_end(session_id)
+            self.loads += 1
+            self._evict()
+        return manager
+
+    def _evict(self):
+        """Drop least recently used contexts that have no unwritten save."""
+        excess = len(self._entries) - self.max_sessions
+        if excess <= 0:
+            return
+        for session_id in list(self._entries):
+            if excess <= 0:
+                break
+            if session_id not in self._pending and session_id not in self._writing:
+                del self._entries[session_id]
+                excess -= 1
+
+    def save(self, session_id: str, manager: ContextManager):
+        """
+        Save a session's context after a turn.
+
+        Args:
+            session_id: Session identifier
+            manager: The session's ContextManager
+        """
+        data = manager.to_bytes()
+        with self._condition:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                # Never loaded here: the writer merges with any stored copy
+                self._entries[session_id] = [None, manager]
+            else:
+                entry[1] = manager
+            self._entries.move_to_end(session_id)
+            if self._writer is not None and not self._closed:
+                self._pending[session_id] = data
+                self._condition.notify_all()
+                return
+            self._writing.add(session_id)
+
+        try:
+            self._write(session_id, data)
+        finally:
+            with self._condition:
+                self._writing.discard(session_id)
+                self._evict()
+
+    def _write(self, session_id: str, data: bytes):
+        """Write one serialized context, merging with the stored one on conflict."""
+        with self._condition:
+            entry = self._entries.get(session_id)
+            base = entry[0] if entry is not None else None
+
+        merged = False
+        for _ in range(self.retries + 1):
+            if base is not None:
+                try:
+                    version = self.store.put(session_id, data, base)
+                except ConflictError:
+                    self.conflicts += 1
+                else:
+                    with self._condition:
+                        entry = self._entries.get(session_id)
+                        if entry is not None:
+                            # A merged copy was never loaded here: read it back next time
+                            entry[0] = None if merged else version
+                        self.writes += 1
+                        self.merges += merged
+                    return
+
+            record = self.store.get(session_id)
+            if record is None:
+                base = 0
+                continue
+            if record[1] == TOMBSTONE:
+                if base is not None:
+                    # Deleted after this copy was read
+                    with self._condition:
+                        entry = self._entries.get(session_id)
+                        if entry is not None:
+                            entry[0] = None
+                        self.dropped_writes += 1
+                    return
+                base = record[0]
+                continue
+            base = record[0]
+            stored = ContextManager.from_bytes(session_id, record[1])
+            stored.merge(ContextManager.from_bytes(session_id, data))
+            data = stored.to_bytes()
+            merged = True
+
+        self.failed_writes += 1
+        with self._condition:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry[0] = None
+        print(f"Error saving context {session_id}: still conflicting after {self.retries} retries")
+
+    def _run_writer(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                session_id = next(iter(self._pending))
+                data = self._pending.pop(session_id)
+                self._writing.add(session_id)
+            try:
+                self._write(session_id, data)
+            except Exception as e:
+                self.failed_writes += 1
+                print(f"Error saving context {session_id}: {e}")
+            finally:
+                with self._condition:
+                    self._writing.discard(session_id)
+                    self._evict()
+                    self._condition.notify_all()
+
+    def delete(self, session_id: str):
+        """Forget a session's context here and in the store."""
+        with self._condition:
+            while session_id in self._writing:
+                self._condition.wait()
+            self._pending.pop(session_id, None)
+            self._entries.pop(session_id, None)
+        self.store.delete(session_id)
+
+    def flush(self):
+        """Wait until every queued save is written."""
+        with self._condition:
+            while self._pending or self._writing:
+                self._condition.wait()
+
+    def close(self):
+        """Write queued saves, stop the writer and close the store."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+        self.store.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with the store's statistics, cached and pending
+            counts, hits, loads, writes, conflicts, merges, dropped and
+            failed writes
+        """
+        return {
+            'store': self.store.get_stats(),
+            'cached': len(self._entries),
+            'pending': len(self._pending),
+            'hits': self.hits,
+            'loads': self.loads,
+            'writes': self.writes,
+            'conflicts': self.conflicts,
+            'merges': self.merges,
+            'dropped_writes': self.dropped_writes,
+            'failed_writes': self.failed_writes
+        }
+
+
+def create_context_store(backend: str = CONTEXT_STORE_BACKEND) -> ContextStore:
+    """
+    Create a context store for a backend name.
+
+    Args:
+        backend: "memory", "sqlite", "file" or "kv"
+
+    Returns:
+        New ContextStore
+    """
+    if backend == 'memory':
+        return MemoryContextStore()
+    if backend == 'sqlite':
+        return SQLiteContextStore()
+    if backend == 'file':
+        return FileContextStore()
+    if backend == 'kv':
+        return KeyValueContextStore()
+    raise ValueError(f"Unknown context store backend: {backend}")
+
+
+_shared_cache: Optional[ContextCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_context_cache() -> ContextCache:
+    """
+    Get the process-wide context cache over CONTEXT_STORE_BACKEND.
+
+    The cache is closed at interpreter exit so queued saves are written.
+
+    Returns:
+        Shared ContextCache instance
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = ContextCache(create_context_store())
+                atexit.register(_shared_cache.close)
+    return _shared_cache
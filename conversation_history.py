@@ -9,31 +9,52 @@ Phone: +91 93305 39277
 Year: 2026
 """
 
-import json
-import os
 from datetime import datetime
-from typing import List, Dict, Optional
-from config import HISTORY_FILE, MAX_HISTORY_ENTRIES, ENABLE_HISTORY
+from typing import Any, Iterator, List, Dict, Optional
+
+from history_store import HistoryStore, SessionView, get_history_store, query_view
+from history_index import HistoryIndex, get_history_index
+from retention import get_retention_sweeper
+from config import (
+    MAX_HISTORY_ENTRIES, HISTORY_TAIL_SIZE, ENABLE_HISTORY, ENABLE_HISTORY_INDEX, ENABLE_RETENTION
+)
 
 
 class ConversationHistory:
     """
     Manages conversation history storage and retrieval.
+    
+    Only the newest HISTORY_TAIL_SIZE turns of the session are kept in
+    memory; older turns are read from the store when asked for.
     """
     
-    def __init__(self, session_id: str = "default"):
+    def __init__(self, session_id: str = "default", store: Optional[HistoryStore] = None,
+                 index: Optional[HistoryIndex] = None):
         """
         Initialize conversation history manager.
         
         Args:
             session_id: Unique identifier for the conversation session
+            store: Storage engine (defaults to the shared HISTORY_BACKEND store)
+            index: Full-text index (defaults to the shared index when
+                ENABLE_HISTORY_INDEX is set, no store is given and the
+                shared store is process-local; other processes' turns
+                would never reach this process's index)
         """
         self.session_id = session_id
-        self.history_file = HISTORY_FILE
-        self.history: List[Dict] = []
+        self.tail_size = HISTORY_TAIL_SIZE
+        self.history: List[Dict] = []  # In-memory tail, oldest first
         self.enabled = ENABLE_HISTORY
+        self.store = store
+        self.index = index
         
         if self.enabled:
+            if self.store is None:
+                self.store = get_history_store()
+                if self.index is None and ENABLE_HISTORY_INDEX and self.store.process_local:
+                    self.index = get_history_index(self.store)
+                if ENABLE_RETENTION:
+                    get_retention_sweeper()
             self.load_history()
     
     def add_message(self, user_message: str, bot_response: str, 
@@ -61,25 +82,42 @@ class ConversationHistory:
         
         self.history.append(entry)
         
-        # Limit history size
-        if len(self.history) > MAX_HISTORY_ENTRIES:
-            self.history = self.history[-MAX_HISTORY_ENTRIES:]
+        # Keep only the tail in memory
+        if len(self.history) > self.tail_size:
+            del self.history[:-self.tail_size]
+        
+        try:
+            self.store.append(self.session_id, entry)
+        except Exception as e:
+            print(f"Error saving history: {e}")
+            return
         
-        self.save_history()
+        if self.index is not None:
+            self.index.add(self.session_id, entry)
     
     def get_history(self, limit: Optional[int] = None) -> List[Dict]:
         """
         Get conversation history.
         
+        Requests that fit in the in-memory tail are served from it; larger
+        ones read the newest entries from the store.
+        
         Args:
-            limit: Maximum number of entries to return
+            limit: Maximum number of entries to return (defaults to
+                MAX_HISTORY_ENTRIES)
             
         Returns:
             List of conversation entries
         """
-        if limit:
+        limit = limit or MAX_HISTORY_ENTRIES
+        if limit <= len(self.history) or not self.enabled:
+            return self.history[-limit:]
+        
+        try:
+            return self.store.load_session(self.session_id, limit)
+        except Exception as e:
+            print(f"Error loading history: {e}")
             return self.history[-limit:]
-        return self.history.copy()
     
     def get_recent_messages(self, count: int = 5) -> List[Dict]:
         """
@@ -91,64 +129,80 @@ class ConversationHistory:
         Returns:
             List of recent conversation entries
         """
-        return self.history[-count:] if self.history else []
+        return self.get_history(count) if count > 0 else []
+    
+    def iter_history(self) -> Iterator[Dict]:
+        """
+        Stream the whole stored history of the session, oldest first.
+        
+        Entries are read from the store one at a time rather than loaded
+        into memory together.
+        
+        Returns:
+            Iterator of conversation entries
+        """
+        if not self.enabled:
+            return iter(list(self.history))
+        return self.store.iter_session(self.session_id)
+    
+    def query_history(self, start: Optional[str] = None, end: Optional[str] = None,
+                      after: Optional[str] = None, before: Optional[str] = None,
+                      limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Get one page of the session's history.
+        
+        Pages are located in the store by timestamp and cursor, so only
+        the returned entries are read.
+        
+        Args:
+            start: Only entries at or after this ISO timestamp
+            end: Only entries before this ISO timestamp
+            after: Cursor; only entries after it (pages towards newer entries)
+            before: Cursor; only entries before it (pages towards older entries)
+            limit: Page size (clamped to HISTORY_MAX_PAGE_SIZE)
+            
+        Returns:
+            Dictionary with 'entries' (oldest first) and the 'next' and
+            'prev' cursors (None at the ends of the range)
+            
+        Raises:
+            ValueError: If a cursor is malformed
+        """
+        if not self.enabled:
+            return query_view(SessionView(self.history), start, end, after, before, limit)
+        return self.store.query_session(self.session_id, start, end, after, before, limit)
     
     def clear_history(self):
         """Clear conversation history."""
         self.history = []
-        if os.path.exists(self.history_file):
-            os.remove(self.history_file)
+        if not self.enabled:
+            return
+        
+        try:
+            self.store.clear_session(self.session_id)
+        except Exception as e:
+            print(f"Error clearing history: {e}")
+        
+        if self.index is not None:
+            self.index.clear_session(self.session_id)
     
     def save_history(self):
-        """Save conversation history to file."""
+        """Make sure every added message has been handed to the store's file."""
         if not self.enabled:
             return
         
         try:
-            # Load existing history from file
-            all_history = []
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    all_history = json.load(f)
-            
-            # Update or add session history
-            session_found = False
-            for i, session in enumerate(all_history):
-                if session.get('session_id') == self.session_id:
-                    all_history[i] = {
-                        'session_id': self.session_id,
-                        'messages': self.history
-                    }
-                    session_found = True
-                    break
-            
-            if not session_found:
-                all_history.append({
-                    'session_id': self.session_id,
-                    'messages': self.history
-                })
-            
-            # Save to file
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(all_history, f, indent=2, ensure_ascii=False)
+            self.store.flush()
         except Exception as e:
             print(f"Error saving history: {e}")
     
     def load_history(self):
-        """Load conversation history from file."""
+        """Load the newest turns of this session from the store."""
         if not self.enabled:
             return
         
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    all_history = json.load(f)
-                    
-                # Find this session's history
-                for session in all_history:
-                    if session.get('session_id') == self.session_id:
-                        self.history = session.get('messages', [])
-                        break
+            self.history = self.store.load_session(self.session_id, self.tail_size)
         except Exception as e:
             print(f"Error loading history: {e}")
             self.history = []
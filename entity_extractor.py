@@ -10,187 +10,242 @@ Year: 2026
 """
 
 import re
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime
 from dateutil import parser as date_parser
 
+from message_preprocessor import AnalyzedMessage, analyze_message
+from regex_guard import chunked_finditer
+from config import GAZETTEER_PATH
+
+
+# Requirement flags used to skip whole entity families cheaply
+REQUIRES_AT = 1
+REQUIRES_DIGIT = 2
+REQUIRES_UPPER = 4
+
+_DIGIT = re.compile(r'[0-9]')
+_UPPER = re.compile(r'[A-Z]')
+
+# Entity patterns in scan priority order: when matches of two patterns start
+# at the same offset, the earlier pattern wins. 'group' is the capturing
+# group holding the value (0 for the whole match) and 'requires' names the
+# character class that must occur in the text for the pattern to be tried.
+# Repetitions are bounded (email parts, location words) so the work done at
+# each start offset is bounded and a scan stays linear in the text length.
+ENTITY_PATTERNS = [
+    {'type': 'EMAIL', 'group': 1, 'requires': REQUIRES_AT,
+     'pattern': r'\b([a-zA-Z0-9._%+-]{1,64}@(?:[a-zA-Z0-9-]{1,63}\.){1,8}[a-zA-Z]{2,24})\b'},
+    {'type': 'DATE', 'group': 1, 'requires': REQUIRES_DIGIT,
+     'pattern': r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b'},
+    {'type': 'TIME', 'group': 1, 'requires': REQUIRES_DIGIT,
+     'pattern': r'\b(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)?)\b'},
+    {'type': 'TIME', 'group': 1, 'requires': REQUIRES_DIGIT,
+     'pattern': r'\b(\d{1,2}\s*(?:o\'clock|am|pm|AM|PM))\b'},
+    {'type': 'MONEY', 'group': 1, 'requires': REQUIRES_DIGIT,
+     'pattern': r'\$(\d+(?:\.\d{2})?)'},
+    {'type': 'MONEY', 'group': 1, 'requires': REQUIRES_DIGIT,
+     'pattern': r'(?i:\b(\d+)\s*(?:dollars|rupees|euros|pounds|USD|INR|EUR|GBP)\b)'},
+    {'type': 'PHONE', 'group': 1, 'requires': REQUIRES_DIGIT,
+     'pattern': r'\b(\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9})\b'},
+    {'type': 'DATE', 'group': 1, 'requires': REQUIRES_DIGIT,
+     'pattern': r'(?i:\b(January|February|March|April|May|June|July|August|September|October|November|December)'
+                r'\s+\d{1,2}(?:st|nd|rd|th)?(?:,\s+\d{4})?\b)'},
+    {'type': 'DATE', 'group': 0, 'requires': 0, 'lowercase': True,
+     'pattern': r'(?i:today|tomorrow|yesterday|next week|last week|next month|last month|next year|last year)'},
+    {'type': 'PERSON', 'group': 1, 'requires': REQUIRES_UPPER,
+     'pattern': r'(?:my name is|i am|i\'m|call me|name\'s)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)'},
+    {'type': 'LOCATION', 'group': 2, 'requires': REQUIRES_UPPER,
+     'pattern': r'\b(in|at|from|to)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,4})\b'},
+    {'type': 'PERSON', 'group': 1, 'requires': REQUIRES_UPPER,
+     'pattern': r'\b([A-Z][a-z]+\s+[A-Z][a-z]+)\b'},
+]
+
 
 class EntityExtractor:
     """
     Extracts entities from natural language text.
-    """
     
-    def __init__(self):
-        """Initialize the entity extractor."""
-        # Common patterns for entity extraction
-        self.patterns = {
-            'PERSON': [
-                r'\b(?:my name is|i am|i\'m|call me|name\'s)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-                r'\b([A-Z][a-z]+\s+[A-Z][a-z]+)\b',  # First Last name pattern
-            ],
-            'DATE': [
-                r'\b(today|tomorrow|yesterday|next week|last week|next month|last month)\b',
-                r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b',  # Date formats
-                r'\b(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2}',
-            ],
-            'TIME': [
-                r'\b(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)?)\b',
-                r'\b(\d{1,2}\s*(?:o\'clock|am|pm|AM|PM))\b',
-            ],
-            'LOCATION': [
-                r'\b(in|at|from|to)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b',
-            ],
-            'MONEY': [
-                r'\$(\d+(?:\.\d{2})?)',
-                r'\b(\d+)\s*(?:dollars|rupees|euros|pounds)\b',
-            ],
-            'EMAIL': [
-                r'\b([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})\b',
-            ],
-            'PHONE': [
-                r'\b(\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9})\b',
-            ],
-        }
+    All entity patterns are merged into one precompiled scanner that makes a
+    single pass over the text; families whose required characters are
+    absent (no '@', no digit, no capital letter) are left out of the scan.
+    """
     
-    def extract(self, text: str) -> Dict[str, List[str]]:
+    def __init__(self, gazetteer_path: Optional[str] = None,
+                 extra_patterns: Optional[List[Dict]] = None):
         """
-        Extract entities from text.
+        Initialize the entity extractor.
         
         Args:
-            text: Input text to extract entities from
-            
-        Returns:
-            Dictionary mapping entity types to extracted values
+            gazetteer_path: Compiled gazetteer file for PERSON/LOCATION
+                lookups (defaults to GAZETTEER_PATH; None disables it)
+            extra_patterns: Additional pattern specs (same layout as
+                ENTITY_PATTERNS) that take priority over the built-in ones
         """
-        entities = {}
-        text_lower = text.lower()
-        
-        # Extract PERSON names
-        entities['PERSON'] = self._extract_person(text)
-        
-        # Extract DATES
-        entities['DATE'] = self._extract_dates(text)
-        
-        # Extract TIME
-        entities['TIME'] = self._extract_time(text)
-        
-        # Extract LOCATION
-        entities['LOCATION'] = self._extract_location(text)
-        
-        # Extract MONEY
-        entities['MONEY'] = self._extract_money(text)
-        
-        # Extract EMAIL
-        entities['EMAIL'] = self._extract_email(text)
-        
-        # Extract PHONE
-        entities['PHONE'] = self._extract_phone(text)
-        
-        # Remove empty entity lists
-        entities = {k: v for k, v in entities.items() if v}
-        
-        return entities
+        self.patterns = [dict(spec) for spec in (extra_patterns or [])]
+        self.patterns += [dict(spec) for spec in ENTITY_PATTERNS]
+        self.gazetteer_path = gazetteer_path or GAZETTEER_PATH
+        self._gazetteer = None
+        self._scanners: Dict[int, Optional[Tuple[re.Pattern, Dict]]] = {}
+        self._cache_token = None
     
-    def _extract_person(self, text: str) -> List[str]:
-        """Extract person names from text."""
-        names = []
-        
-        # Pattern: "my name is John" or "I am John"
-        patterns = [
-            r'(?:my name is|i am|i\'m|call me|name\'s)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)',
-            r'\b([A-Z][a-z]+\s+[A-Z][a-z]+)\b',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                if isinstance(match, tuple):
-                    name = ' '.join(match).strip()
-                else:
-                    name = match.strip()
-                if name and name not in names:
-                    names.append(name)
-        
-        return names
+    @property
+    def cache_token(self) -> int:
+        """Value identifying the extraction patterns and gazetteer."""
+        if self._cache_token is None:
+            self._cache_token = hash((repr(self.patterns), self.gazetteer_path))
+        return self._cache_token
     
-    def _extract_dates(self, text: str) -> List[str]:
-        """Extract dates from text."""
-        dates = []
-        text_lower = text.lower()
-        
-        # Relative dates
-        relative_dates = ['today', 'tomorrow', 'yesterday', 'next week', 'last week', 
-                         'next month', 'last month', 'next year', 'last year']
-        for rel_date in relative_dates:
-            if rel_date in text_lower:
-                dates.append(rel_date)
-        
-        # Date patterns
-        date_patterns = [
-            r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b',
-            r'\b(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2}(?:st|nd|rd|th)?(?:,\s+\d{4})?\b',
-        ]
-        
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            dates.extend(matches)
-        
-        return list(set(dates))
+    @property
+    def gazetteer(self):
+        """Shared memory-mapped gazetteer, opened on first use (or None)."""
+        if self._gazetteer is None and self.gazetteer_path:
+            from gazetteer import load_gazetteer
+            try:
+                self._gazetteer = load_gazetteer(self.gazetteer_path)
+            except (OSError, ValueError) as e:
+                print(f"Error loading gazetteer: {e}")
+                self.gazetteer_path = None
+                self._cache_token = None
+        return self._gazetteer
     
-    def _extract_time(self, text: str) -> List[str]:
-        """Extract time from text."""
-        times = []
-        
-        patterns = [
-            r'\b(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm)?)\b',
-            r'\b(\d{1,2}\s*(?:o\'clock|am|pm|AM|PM))\b',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            times.extend(matches)
-        
-        return list(set(times))
+    def refresh(self):
+        """Call after modifying patterns so the scanner is recompiled."""
+        self._scanners = {}
+        self._cache_token = None
     
-    def _extract_location(self, text: str) -> List[str]:
-        """Extract locations from text."""
-        locations = []
-        
-        # Simple location extraction (can be enhanced with NER)
-        pattern = r'\b(in|at|from|to)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b'
-        matches = re.findall(pattern, text)
-        
-        for match in matches:
-            location = match[1] if isinstance(match, tuple) else match
-            if location and location not in locations:
-                locations.append(location)
+    def _scanner(self, available: int) -> Optional[Tuple[re.Pattern, Dict]]:
+        """
+        Get the combined scanner for the patterns whose requirements are met.
         
-        return locations
+        Args:
+            available: Bit mask of REQUIRES_* flags present in the text
+            
+        Returns:
+            Tuple of (compiled alternation, {outer group: (spec, value group)})
+        """
+        if available not in self._scanners:
+            alternatives = []
+            groups = {}
+            group = 1
+            for spec in self.patterns:
+                requires = spec.get('requires', 0)
+                if requires & available != requires:
+                    continue
+                alternatives.append(f"({spec['pattern']})")
+                groups[group] = (spec, group + spec.get('group', 0))
+                group += 1 + re.compile(spec['pattern']).groups
+            
+            scanner = None
+            if alternatives:
+                scanner = (re.compile('|'.join(alternatives)), groups)
+            self._scanners[available] = scanner
+        return self._scanners[available]
     
-    def _extract_money(self, text: str) -> List[str]:
-        """Extract money amounts from text."""
-        amounts = []
+    def extract_spans(self, text: Union[str, AnalyzedMessage]) -> List[Dict]:
+        """
+        Extract entities together with their character offsets.
         
-        patterns = [
-            r'\$(\d+(?:\.\d{2})?)',
-            r'\b(\d+)\s*(?:dollars|rupees|euros|pounds|USD|INR|EUR|GBP)\b',
-        ]
+        Args:
+            text: Input text (or preprocessed message) to extract entities from
+            
+        Returns:
+            List of {'type', 'value', 'start', 'end'} dictionaries in text
+            order, where text[start:end] is the matched value
+        """
+        available = 0
+        message = None
+        if isinstance(text, AnalyzedMessage):
+            message = text
+            text = message.text
+            if message.has_at:
+                available |= REQUIRES_AT
+            if message.has_digit:
+                available |= REQUIRES_DIGIT
+            if message.has_upper:
+                available |= REQUIRES_UPPER
+        elif text:
+            if '@' in text:
+                available |= REQUIRES_AT
+            if _DIGIT.search(text):
+                available |= REQUIRES_DIGIT
+            if _UPPER.search(text):
+                available |= REQUIRES_UPPER
+        
+        if not text:
+            return []
+        
+        scanner = self._scanner(available)
+        if scanner is None:
+            return []
+        regex, groups = scanner
+        
+        spans = []
+        for match in chunked_finditer(regex, text):
+            # The outer group of an alternative closes last, so lastindex
+            # identifies which pattern produced the match
+            spec, value_group = groups[match.lastindex]
+            start, end = match.span(value_group)
+            if start < 0:
+                continue
+            
+            value = text[start:end]
+            stripped = value.strip()
+            if not stripped:
+                continue
+            if stripped != value:
+                start += len(value) - len(value.lstrip())
+                end = start + len(stripped)
+            if spec.get('lowercase'):
+                stripped = stripped.lower()
+            
+            spans.append({
+                'type': spec['type'],
+                'value': stripped,
+                'start': start,
+                'end': end
+            })
         
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            amounts.extend(matches)
+        if self.gazetteer is not None:
+            spans = self._merge_gazetteer_spans(analyze_message(message or text), spans)
         
-        return list(set(amounts))
+        return spans
     
-    def _extract_email(self, text: str) -> List[str]:
-        """Extract email addresses from text."""
-        pattern = r'\b([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})\b'
-        matches = re.findall(pattern, text)
-        return list(set(matches))
+    def _merge_gazetteer_spans(self, message: AnalyzedMessage, spans: List[Dict]) -> List[Dict]:
+        """Add gazetteer matches that do not overlap a pattern match of the same type."""
+        found = []
+        for first, end, label in self.gazetteer.longest_matches(message.tokens):
+            start = message.offsets[first][0]
+            stop = message.offsets[end - 1][1]
+            overlaps = any(
+                span['type'] == label and span['start'] < stop and start < span['end']
+                for span in spans
+            )
+            if not overlaps:
+                found.append({
+                    'type': label,
+                    'value': message.text[start:stop],
+                    'start': start,
+                    'end': stop
+                })
+        
+        if not found:
+            return spans
+        return sorted(spans + found, key=lambda span: span['start'])
     
-    def _extract_phone(self, text: str) -> List[str]:
-        """Extract phone numbers from text."""
-        pattern = r'\b(\+?\d{1,3}[-.\s]?\(?\d{1,4}\)?[-.\s]?\d{1,4}[-.\s]?\d{1,9})\b'
-        matches = re.findall(pattern, text)
-        return list(set(matches))
-
+    def extract(self, text: Union[str, AnalyzedMessage]) -> Dict[str, List[str]]:
+        """
+        Extract entities from text.
+        
+        Args:
+            text: Input text (or preprocessed message) to extract entities from
+            
+        Returns:
+            Dictionary mapping entity types to extracted values
+        """
+        entities: Dict[str, List[str]] = {}
+        for span in self.extract_spans(text):
+            values = entities.setdefault(span['type'], [])
+            if span['value'] not in values:
+                values.append(span['value'])
+        return entities
@@ -0,0 +1,58 @@
+"""
+File Utilities Module
+Advisory file locks and atomic file replacement shared by the storage modules.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from contextlib import contextmanager
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+
+def fsync_directory(path: str):
+    """Make renames and new files in a directory durable (no-op where unsupported)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive advisory lock on a lock file (created if missing)."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def write_file_atomic(path: str, data: bytes, sync: bool = True):
+    """Replace a file's contents in one step by writing a temporary file and renaming it."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    if sync:
+        fsync_directory(os.path.dirname(path) or '.')
@@ -0,0 +1,330 @@
+"""
+Gazetteer Module
+Compact memory-mapped token trie for large PERSON/LOCATION word lists.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+
+from message_preprocessor import tokenize
+
+
+MAGIC = b'GZT1'
+VERSION = 1
+
+# magic, version, label/token/node/edge/slot counts, then section offsets
+# for labels, token offsets, token bytes, hash slots, nodes and edges
+HEADER = struct.Struct('<4sIIIIII6Q')
+
+
+def _token_hash(data: bytes) -> int:
+    return zlib.crc32(data)
+
+
+def compile_gazetteer(entries: Iterable[Tuple[str, str]], path: str) -> Dict[str, int]:
+    """
+    Compile (phrase, label) entries into a gazetteer file.
+
+    Phrases are tokenized and normalized exactly like user messages, so a
+    phrase matches whatever casing the user types. When a phrase appears
+    under several labels the first one wins.
+
+    File layout (little-endian, every section 4-byte aligned):
+        header     HEADER struct
+        labels     JSON list of label names
+        token offs (tokens + 1) x u32 offsets into the token bytes
+        token data concatenated UTF-8 token strings
+        slots      open-addressing hash table, u32 token id + 1 (0 = empty)
+        nodes      3 x u32 per node: first edge, edge count, label id + 1
+        edges      2 x u32 per edge: token id, child node (sorted by token)
+
+    Args:
+        entries: Iterable of (phrase, label) pairs
+        path: Output file path
+
+    Returns:
+        Dictionary with entry, token and node counts
+    """
+    labels: List[str] = []
+    label_ids: Dict[str, int] = {}
+    token_ids: Dict[str, int] = {}
+    children: List[Dict[int, int]] = [{}]
+    node_labels: List[int] = [0]
+    entry_count = 0
+
+    for phrase, label in entries:
+        tokens, _ = tokenize(phrase)
+        if not tokens:
+            continue
+        if label not in label_ids:
+            label_ids[label] = len(labels)
+            labels.append(label)
+
+        node = 0
+        for token in tokens:
+            token_id = token_ids.setdefault(token, len(token_ids))
+            child = children[node].get(token_id)
+            if child is None:
+                child = len(children)
+                children[node][token_id] = child
+                children.append({})
+                node_labels.append(0)
+            node = child
+        if not node_labels[node]:
+            node_labels[node] = label_ids[label] + 1
+            entry_count += 1
+
+    token_bytes = [token.encode('utf-8') for token in token_ids]
+    slot_count = 8
+    while slot_count < 2 * len(token_bytes):
+        slot_count *= 2
+    slots = [0] * slot_count
+    mask = slot_count - 1
+    for token_id, data in enumerate(token_bytes):
+        slot = _token_hash(data) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = token_id + 1
+
+    offsets = [0]
+    for data in token_bytes:
+        offsets.append(offsets[-1] + len(data))
+
+    nodes = []
+    edges = []
+    for node, node_children in enumerate(children):
+        nodes.extend((len(edges) // 2, len(node_children), node_labels[node]))
+        for token_id in sorted(node_children):
+            edges.extend((token_id, node_children[token_id]))
+
+    def aligned(blob: bytes) -> bytes:
+        return blob + b'\0' * (-len(blob) % 4)
+
+    sections = [
+        aligned(json.dumps(labels).encode('utf-8')),
+        struct.pack(f'<{len(offsets)}I', *offsets),
+        aligned(b''.join(token_bytes)),
+        struct.pack(f'<{len(slots)}I', *slots),
+        struct.pack(f'<{len(nodes)}I', *nodes),
+        struct.pack(f'<{len(edges)}I', *edges),
+    ]
+    section_offsets = []
+    position = HEADER.size
+    for section in sections:
+        section_offsets.append(position)
+        position += len(section)
+
+    header = HEADER.pack(MAGIC, VERSION, len(labels), len(token_bytes), len(children),
+                         len(edges) // 2, slot_count, *section_offsets)
+
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        for section in sections:
+            f.write(section)
+    os.replace(temp_path, path)
+
+    return {'entries': entry_count, 'tokens': len(token_bytes), 'nodes': len(children)}
+
+
+class Gazetteer:
+    """
+    Read-only view of a compiled gazetteer file.
+
+    The file is memory-mapped and never copied into Python objects, so all
+    worker processes share one copy through the OS page cache.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a compiled gazetteer.
+
+        Args:
+            path: Path produced by compile_gazetteer
+        """
+        if sys.byteorder != 'little':
+            raise OSError("Gazetteer files can only be mapped on little-endian hosts")
+
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        (magic, version, label_count, token_count, node_count, edge_count,
+         slot_count, *offsets) = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a gazetteer file: {path}")
+        labels_at, token_offsets_at, tokens_at, slots_at, nodes_at, edges_at = offsets
+
+        self.labels: List[str] = json.loads(
+            bytes(view[labels_at:token_offsets_at]).rstrip(b'\0').decode('utf-8')
+        )
+        self.token_count = token_count
+        self.node_count = node_count
+        self._token_offsets = view[token_offsets_at:tokens_at].cast('I')
+        self._tokens = view[tokens_at:slots_at]
+        self._slots = view[slots_at:nodes_at].cast('I')
+        self._slot_mask = slot_count - 1
+        self._nodes = view[nodes_at:edges_at].cast('I')
+        self._edges = view[edges_at:edges_at + edge_count * 8].cast('I')
+
+    def token_id(self, token: str) -> int:
+        """
+        Look up a normalized token.
+
+        Args:
+            token: Normalized token
+
+        Returns:
+            Token id, or -1 if no entry uses the token
+        """
+        data = token.encode('utf-8')
+        offsets = self._token_offsets
+        slots = self._slots
+        slot = _token_hash(data) & self._slot_mask
+        while True:
+            entry = slots[slot]
+            if not entry:
+                return -1
+            token_id = entry - 1
+            if self._tokens[offsets[token_id]:offsets[token_id + 1]] == data:
+                return token_id
+            slot = (slot + 1) & self._slot_mask
+
+    def _child(self, node: int, token_id: int) -> int:
+        """Binary search the sorted edges of node for token_id."""
+        nodes = self._nodes
+        edges = self._edges
+        low = nodes[3 * node]
+        high = low + nodes[3 * node + 1]
+        while low < high:
+            middle = (low + high) // 2
+            edge_token = edges[2 * middle]
+            if edge_token < token_id:
+                low = middle + 1
+            elif edge_token > token_id:
+                high = middle
+            else:
+                return edges[2 * middle + 1]
+        return -1
+
+    def longest_matches(self, tokens: Sequence[str]) -> List[Tuple[int, int, str]]:
+        """
+        Find leftmost-longest, non-overlapping entries in a token stream.
+
+        Work is linear in the number of tokens times the length of the
+        longest entry.
+
+        Args:
+            tokens: Normalized tokens
+
+        Returns:
+            List of (first token, end token, label) triples
+        """
+        token_ids = [self.token_id(token) for token in tokens]
+        nodes = self._nodes
+        matches = []
+        position = 0
+        while position < len(token_ids):
+            node = 0
+            best_end = -1
+            best_label = 0
+            end = position
+            while end < len(token_ids) and token_ids[end] >= 0:
+                node = self._child(node, token_ids[end])
+                if node < 0:
+                    break
+                end += 1
+                if nodes[3 * node + 2]:
+                    best_end = end
+                    best_label = nodes[3 * node + 2]
+            if best_end > 0:
+                matches.append((position, best_end, self.labels[best_label - 1]))
+                position = best_end
+            else:
+                position += 1
+        return matches
+
+    def lookup(self, phrase: str) -> Optional[str]:
+        """
+        Get the label of an exact phrase.
+
+        Args:
+            phrase: Phrase to look up
+
+        Returns:
+            Label, or None if the phrase is not an entry
+        """
+        tokens, _ = tokenize(phrase)
+        node = 0
+        for token in tokens:
+            token_id = self.token_id(token)
+            node = self._child(node, token_id) if token_id >= 0 else -1
+            if node < 0:
+                return None
+        label = self._nodes[3 * node + 2] if tokens else 0
+        return self.labels[label - 1] if label else None
+
+
+_loaded: Dict[str, Gazetteer] = {}
+_loaded_lock = threading.Lock()
+
+
+def load_gazetteer(path: str) -> Gazetteer:
+    """
+    Get the process-wide Gazetteer for a file, mapping it on first use.
+
+    Args:
+        path: Path produced by compile_gazetteer
+
+    Returns:
+        Shared Gazetteer instance
+    """
+    key = os.path.abspath(path)
+    with _loaded_lock:
+        if key not in _loaded:
+            _loaded[key] = Gazetteer(key)
+        return _loaded[key]
+
+
+def _read_word_list(label: str, path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line, label
+
+
+def main():
+    """Compile word lists into a gazetteer file."""
+    parser = argparse.ArgumentParser(description="Compile gazetteer word lists")
+    parser.add_argument('output', help="Output gazetteer file")
+    parser.add_argument('lists', nargs='+', metavar='LABEL=FILE',
+                        help="Entity type and word list (one entry per line), e.g. LOCATION=cities.txt")
+    args = parser.parse_args()
+
+    def entries():
+        for spec in args.lists:
+            label, _, path = spec.partition('=')
+            yield from _read_word_list(label, path)
+
+    stats = compile_gazetteer(entries(), args.output)
+    print(f"Compiled {stats['entries']} entries "
+          f"({stats['tokens']} tokens, {stats['nodes']} nodes) into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,553 @@
+"""
+History Archive Module
+Moves idle sessions into compressed archive segments and rehydrates them on demand.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime
+import gzip
+import json
+import lzma
+import os
+import re
+import threading
+import time
+
+from history_store import HistoryStore, SessionView
+from history_segment import HistorySegment, encode_segment
+from config import (
+    HISTORY_ARCHIVE_DIR, HISTORY_ARCHIVE_IDLE_SECONDS, HISTORY_ARCHIVE_COMPRESSION,
+    HISTORY_ARCHIVE_INTERVAL
+)
+
+
+COMPRESSORS = {
+    'gzip': (gzip.compress, gzip.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+ARCHIVE_PATTERN = re.compile(r'^archive-(\d+)\.har$')
+
+
+def _last_active(entries: List[Dict]) -> Optional[float]:
+    """Epoch seconds of a session's newest entry (None if it has no usable timestamp)."""
+    if not entries:
+        return None
+    try:
+        return datetime.fromisoformat(entries[-1]['timestamp']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class HistoryArchive:
+    """
+    Cold tier: compressed archive segments of idle sessions.
+
+    Each archive run writes one archive-N.har file of independently
+    compressed blobs, one per session, each holding a binary history
+    segment (see history_segment.py), plus an archive-N.idx catalog of
+    blob offsets. Loading a session decompresses its blob only. Sessions
+    taken back into hot storage (or cleared) are listed in discarded.log
+    so their archived copies are ignored after a restart, and an archive
+    file is deleted once none of its sessions is live any more.
+    """
+
+    def __init__(self, directory: str = HISTORY_ARCHIVE_DIR,
+                 compression: str = HISTORY_ARCHIVE_COMPRESSION):
+        """
+        Open an archive directory (created on first write).
+
+        Args:
+            directory: Directory holding the archive files
+            compression: "gzip" or "lzma"
+        """
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown archive compression: {compression}")
+        self.directory = directory
+        self.compression = compression
+        self._lock = threading.Lock()
+
+        # session id -> (archive number, offset, length, entry count)
+        self._catalog: Dict[str, Tuple[int, int, int, int]] = {}
+        # archive number -> compression it was written with
+        self._compressions: Dict[int, str] = {}
+        # archive number -> sessions of the catalog stored in it
+        self._live: Dict[int, int] = {}
+        self._next_number = 1
+        self.files_deleted = 0
+        self.bytes_freed = 0
+        self._load_catalog()
+
+    def archive_path(self, number: int) -> str:
+        """Path of an archive file."""
+        return os.path.join(self.directory, f'archive-{number:06d}.har')
+
+    def _load_catalog(self):
+        if not os.path.isdir(self.directory):
+            return
+        numbers = sorted(
+            int(match.group(1)) for match in map(ARCHIVE_PATTERN.match, os.listdir(self.directory)) if match
+        )
+        for number in numbers:
+            try:
+                with open(self.archive_path(number)[:-4] + '.idx', 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading history archive index: {e}")
+                continue
+            for session_id, (offset, length, count) in index['sessions'].items():
+                self._catalog[session_id] = (number, offset, length, count)
+            self._compressions[number] = index.get('compression', 'gzip')
+            self._next_number = number + 1
+
+        # Drop copies that were rehydrated or cleared after being archived
+        try:
+            with open(os.path.join(self.directory, 'discarded.log'), 'r', encoding='utf-8') as f:
+                for line in f:
+                    session_id, _, number = line.rstrip('\n').rpartition('\t')
+                    found = self._catalog.get(session_id)
+                    if found is not None and number.isdigit() and found[0] <= int(number):
+                        del self._catalog[session_id]
+        except FileNotFoundError:
+            pass
+
+        for number in numbers:
+            self._live.setdefault(number, 0)
+        for number, _, _, _ in self._catalog.values():
+            self._live[number] += 1
+        for number in [number for number, live in self._live.items() if not live]:
+            self._delete_archive(number)
+
+    def _delete_archive(self, number: int):
+        """Delete an archive file none of whose sessions is live (caller holds _lock or is loading)."""
+        del self._live[number]
+        self._compressions.pop(number, None)
+        for path in (self.archive_path(number), self.archive_path(number)[:-4] + '.idx'):
+            try:
+                size = os.path.getsize(path)
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            self.bytes_freed += size
+        self.files_deleted += 1
+
+        # Discards recorded against older archives than the oldest left apply to nothing
+        oldest = min(self._live, default=None)
+        log_path = os.path.join(self.directory, 'discarded.log')
+        try:
+            with open(log_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        kept = [line for line in lines
+                if oldest is not None and int(line.rstrip('\n').rpartition('\t')[2] or 0) >= oldest]
+        if len(kept) < len(lines):
+            with open(log_path + '.tmp', 'w', encoding='utf-8') as f:
+                f.writelines(kept)
+            os.replace(log_path + '.tmp', log_path)
+
+    def _release(self, location: Optional[Tuple[int, int, int, int]]):
+        """Drop one live session from an archive file, deleting the file if it was the last (caller holds _lock)."""
+        if location is None:
+            return
+        number = location[0]
+        self._live[number] -= 1
+        if not self._live[number]:
+            self._delete_archive(number)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._catalog
+
+    def __len__(self) -> int:
+        return len(self._catalog)
+
+    def write(self, sessions: List[Tuple[str, List[Dict]]]) -> Dict[str, Tuple[int, int, int, int]]:
+        """
+        Write sessions into a new archive file.
+
+        The sessions only become visible through add_to_catalog, after the
+        caller has removed them from hot storage.
+
+        Args:
+            sessions: (session id, entries oldest first) pairs
+
+        Returns:
+            Location of each written session, for add_to_catalog
+        """
+        compress = COMPRESSORS[self.compression][0]
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            number = self._next_number
+
+        # Claim the number with an exclusive create, so an archive written
+        # by another writer of the directory is never replaced
+        while True:
+            path = self.archive_path(number)
+            try:
+                f = open(path + '.tmp', 'xb')
+            except FileExistsError:
+                number += 1
+                continue
+            if not os.path.exists(path):
+                break
+            f.close()
+            os.unlink(path + '.tmp')
+            number += 1
+        with self._lock:
+            self._next_number = max(self._next_number, number + 1)
+
+        index = {'compression': self.compression, 'sessions': {}}
+        offset = 0
+        with f:
+            for session_id, entries in sessions:
+                blob = compress(encode_segment([(session_id, entries)]))
+                f.write(blob)
+                index['sessions'][session_id] = [offset, len(blob), len(entries)]
+                offset += len(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        index_path = path[:-4] + '.idx'
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        os.replace(index_path + '.tmp', index_path)
+        with self._lock:
+            self._compressions[number] = self.compression
+            self._live.setdefault(number, 0)
+        return {
+            session_id: (number, offset, length, count)
+            for session_id, (offset, length, count) in index['sessions'].items()
+        }
+
+    def add_to_catalog(self, session_id: str, location: Tuple[int, int, int, int]):
+        """Make an archived session visible (location as returned by write)."""
+        with self._lock:
+            previous = self._catalog.get(session_id)
+            self._catalog[session_id] = location
+            self._live[location[0]] = self._live.get(location[0], 0) + 1
+            self._release(previous)
+
+    def release_unused(self, locations: Dict[str, Tuple[int, int, int, int]]):
+        """
+        Delete an archive file written by write() if none of its sessions was cataloged.
+
+        Args:
+            locations: Locations returned by write
+        """
+        with self._lock:
+            for number in {location[0] for location in locations.values()}:
+                if number in self._live and not self._live[number]:
+                    self._delete_archive(number)
+
+    def load(self, session_id: str) -> List[Dict]:
+        """
+        Decompress and decode an archived session.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            Entries oldest first (empty if not archived)
+        """
+        found = self._catalog.get(session_id)
+        if found is None:
+            return []
+        number, offset, length, _ = found
+        with open(self.archive_path(number), 'rb') as f:
+            f.seek(offset)
+            blob = f.read(length)
+        decompress = COMPRESSORS[self._compressions.get(number, self.compression)][1]
+        segment = HistorySegment(decompress(blob))
+        try:
+            return segment.load_session(session_id)
+        finally:
+            segment.close()
+
+    def discard(self, session_id: str):
+        """Forget an archived session (it was rehydrated or cleared), deleting its file once unused."""
+        with self._lock:
+            found = self._catalog.pop(session_id, None)
+            if found is None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, 'discarded.log'), 'a', encoding='utf-8') as f:
+                f.write(f"{session_id}\t{found[0]}\n")
+            self._release(found)
+
+    def location(self, session_id: str) -> Optional[Tuple[int, int, int, int]]:
+        """Catalog location (archive number, offset, length, entries) of a session, if archived."""
+        return self._catalog.get(session_id)
+
+    def session_ids(self) -> List[str]:
+        """Identifiers of the archived sessions."""
+        return list(self._catalog)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get archive statistics.
+
+        Returns:
+            Dictionary with file, byte, session and entry counts
+        """
+        files = 0
+        size = 0
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                files += bool(ARCHIVE_PATTERN.match(entry.name))
+                size += entry.stat().st_size
+        with self._lock:
+            entries = sum(found[3] for found in self._catalog.values())
+            sessions = len(self._catalog)
+        return {
+            'files': files,
+            'bytes': size,
+            'sessions': sessions,
+            'entries': entries,
+            'compression': self.compression,
+            'files_deleted': self.files_deleted,
+            'bytes_freed': self.bytes_freed
+        }
+
+
+class TieredHistoryStore(HistoryStore):
+    """
+    History store with a hot tier and a compressed archive tier.
+
+    Sessions whose newest entry is older than idle_seconds are moved into
+    the archive by archive_idle (run periodically by start_archiver).
+    Reading or appending to an archived session rehydrates it: its entries
+    are decompressed and written back into the hot store first, so callers
+    never see the difference.
+
+    The archive catalog and the lock that keeps appends out of a session
+    being archived belong to one process, so the hot store must be one
+    that only this process writes (see create_history_store).
+    """
+
+    def __init__(self, hot: HistoryStore, archive: Optional[HistoryArchive] = None,
+                 idle_seconds: float = HISTORY_ARCHIVE_IDLE_SECONDS):
+        """
+        Initialize the tiered store.
+
+        Args:
+            hot: Store holding active sessions
+            archive: Cold tier (defaults to HistoryArchive())
+            idle_seconds: Idle time after which a session is archived
+        """
+        self.hot = hot
+        self.archive = archive if archive is not None else HistoryArchive()
+        self.idle_seconds = idle_seconds
+
+        # Serializes appends with the hot-store removal step of archiving,
+        # so no turn is appended to a session while it is being moved
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._archiver: Optional[threading.Thread] = None
+
+        self.hot_hits = 0
+        self.archive_hits = 0
+        self.misses = 0
+        self.archive_runs = 0
+        self.sessions_archived = 0
+
+    @property
+    def process_local(self) -> bool:
+        """Whether only this process writes the hot store."""
+        return self.hot.process_local
+
+    def _rehydrate(self, session_id: str) -> bool:
+        """Move an archived session back into the hot store (caller holds _lock)."""
+        if session_id not in self.archive:
+            return False
+        if self.hot.load_session(session_id, 1):
+            # Archived sessions leave the hot store before they are
+            # cataloged, so a hot copy means the archived one is stale
+            self.archive.discard(session_id)
+            return False
+        try:
+            entries = self.archive.load(session_id)
+        except (OSError, ValueError, lzma.LZMAError) as e:
+            print(f"Error rehydrating history: {e}")
+            return False
+        for entry in entries:
+            self.hot.append(session_id, entry)
+        self.archive.discard(session_id)
+        self.archive_hits += 1
+        return True
+
+    def append(self, session_id: str, entry: Dict):
+        """Persist one message exchange, rehydrating an archived session first."""
+        with self._lock:
+            if session_id in self.archive:
+                self._rehydrate(session_id)
+            self.hot.append(session_id, entry)
+
+    def load_session(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Return the last entries of a session from whichever tier holds it."""
+        with self._lock:
+            if self._rehydrate(session_id):
+                return self.hot.load_session(session_id, limit)
+        entries = self.hot.load_session(session_id, limit)
+        if entries:
+            self.hot_hits += 1
+        else:
+            self.misses += 1
+        return entries
+
+    def iter_session(self, session_id: str) -> Iterator[Dict]:
+        """Stream every stored entry of a session, rehydrating it if archived."""
+        with self._lock:
+            self._rehydrate(session_id)
+        return self.hot.iter_session(session_id)
+
+    def session_view(self, session_id: str) -> SessionView:
+        """Random-access view of a session, rehydrating it if archived."""
+        with self._lock:
+            self._rehydrate(session_id)
+        return self.hot.session_view(session_id)
+
+    def query_session(self, session_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                      after: Optional[str] = None, before: Optional[str] = None,
+                      limit: Optional[int] = None) -> Dict[str, Any]:
+        """Return one page of a session, rehydrating it if archived (see HistoryStore.query_session)."""
+        with self._lock:
+            self._rehydrate(session_id)
+        return self.hot.query_session(session_id, start, end, after, before, limit)
+
+    def session_usage(self, session_id: str) -> Tuple[Optional[str], int]:
+        """
+        Describe a session without rehydrating it.
+
+        Archived sessions report their compressed size.
+        """
+        location = self.archive.location(session_id)
+        if location is None:
+            return self.hot.session_usage(session_id)
+        try:
+            entries = self.archive.load(session_id)
+        except (OSError, ValueError, lzma.LZMAError) as e:
+            print(f"Error reading archived history: {e}")
+            return None, location[2]
+        return (entries[-1].get('timestamp') if entries else None), location[2]
+
+    def archive_sessions(self, session_ids: List[str]) -> Dict[str, int]:
+        """
+        Move hot sessions into a new archive file.
+
+        Each session is removed from the hot store under the lock, only if
+        no turn was appended to it since it was read.
+
+        Args:
+            session_ids: Sessions to archive (archived or empty ones are skipped)
+
+        Returns:
+            Dictionary with archived session and entry counts
+        """
+        candidates = []
+        for session_id in session_ids:
+            entries = list(self.hot.iter_session(session_id))
+            if entries:
+                candidates.append((session_id, entries))
+
+        archived = 0
+        archived_entries = 0
+        if candidates:
+            locations = self.archive.write(candidates)
+            for session_id, entries in candidates:
+                with self._lock:
+                    if self.hot.load_session(session_id, 1) != entries[-1:]:
+                        continue
+                    self.hot.clear_session(session_id)
+                    self.archive.add_to_catalog(session_id, locations[session_id])
+                archived += 1
+                archived_entries += len(entries)
+            self.archive.release_unused(locations)
+
+        self.sessions_archived += archived
+        return {'sessions': archived, 'entries': archived_entries}
+
+    def session_ids(self) -> List[str]:
+        """Identifiers of the sessions in either tier."""
+        return list(dict.fromkeys(self.hot.session_ids() + self.archive.session_ids()))
+
+    def clear_session(self, session_id: str):
+        """Delete a session from both tiers."""
+        with self._lock:
+            self.hot.clear_session(session_id)
+            self.archive.discard(session_id)
+
+    def flush(self):
+        """Hand buffered records to the operating system."""
+        self.hot.flush()
+
+    def close(self):
+        """Stop the archiver and close the hot store."""
+        self._stop.set()
+        if self._archiver is not None:
+            self._archiver.join()
+        self.hot.close()
+
+    def archive_idle(self, now: Optional[float] = None, max_sessions: Optional[int] = None) -> Dict[str, int]:
+        """
+        Move sessions idle longer than idle_seconds into a new archive file.
+
+        Candidates are read and archived without holding the lock. Each is
+        then removed from the hot store under the lock, only if no turn was
+        appended to it meanwhile.
+
+        Args:
+            now: Current epoch time (defaults to time.time())
+            max_sessions: Maximum sessions archived in this run
+
+        Returns:
+            Dictionary with archived session and entry counts
+        """
+        now = time.time() if now is None else now
+        idle = []
+        for session_id in self.hot.session_ids():
+            last_active = _last_active(self.hot.load_session(session_id, 1))
+            if last_active is not None and now - last_active >= self.idle_seconds:
+                idle.append(session_id)
+                if max_sessions and len(idle) >= max_sessions:
+                    break
+
+        self.archive_runs += 1
+        return self.archive_sessions(idle)
+
+    def start_archiver(self, interval: float = HISTORY_ARCHIVE_INTERVAL):
+        """Run archive_idle every `interval` seconds on a daemon thread."""
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.archive_idle()
+                except Exception as e:
+                    print(f"Error archiving history: {e}")
+
+        if self._archiver is None:
+            self._archiver = threading.Thread(target=run, name='history-archiver', daemon=True)
+            self._archiver.start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get per-tier statistics.
+
+        Returns:
+            Dictionary with 'hot' and 'archive' tier statistics and hit counts
+        """
+        hot_stats = self.hot.get_stats()
+        loads = self.hot_hits + self.archive_hits + self.misses
+        return {
+            'hot': dict(hot_stats, hits=self.hot_hits),
+            'archive': dict(self.archive.get_stats(), active=True, hits=self.archive_hits,
+                            runs=self.archive_runs, sessions_archived=self.sessions_archived),
+            'misses': self.misses,
+            'archive_hit_rate': round(self.archive_hits / loads, 3) if loads else 0.0
+        }
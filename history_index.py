@@ -0,0 +1,733 @@
+"""
+Conversation History Index
+Incremental full-text inverted index over stored conversation turns.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+import argparse
+import heapq
+import math
+import queue
+import re
+import threading
+import time
+import zlib
+
+from message_preprocessor import tokenize
+from config import HISTORY_INDEX_BACKFILL, HISTORY_INDEX_MAX_RESULTS
+
+BLOCK_SIZE = 128  # Documents per postings block
+BM25_K1 = 1.2
+BM25_B = 0.75
+BACKFILL_GRACE_SECONDS = 60.0  # How long after a backfill live adds are still checked for duplicates
+
+# A query is a list of terms, "quoted phrases", -negations, field:value
+# entity terms and OR separators between alternatives
+QUERY_TOKEN = re.compile(r'(-?)"([^"]*)"|(\S+)')
+FIELD_TERM = re.compile(r'^([a-z_]+):(.+)$')
+
+
+def _write_varint(buffer: bytearray, value: int):
+    """Append an unsigned LEB128 varint to a buffer."""
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def entity_term(entity_type: str, value: Any) -> str:
+    """
+    Index term for an extracted entity value.
+
+    Args:
+        entity_type: Entity type (e.g. 'email')
+        value: Extracted value
+
+    Returns:
+        Term of the form 'type:value', lowercased
+    """
+    return f"{entity_type.lower()}:{str(value).strip().lower()}"
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _timestamp_micros(value: Any) -> Optional[int]:
+    """Microseconds since the epoch of a naive ISO timestamp (None if missing, invalid or zoned)."""
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is not None:
+        return None
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def _format_micros(micros: int) -> str:
+    """ISO timestamp of microseconds since the epoch."""
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def turn_key(entry: Dict) -> int:
+    """
+    Tell apart the turns of a session that share a timestamp.
+
+    A turn is identified by its session, its timestamp and this key.
+
+    Args:
+        entry: Conversation entry
+
+    Returns:
+        CRC-32 of the user message
+    """
+    return zlib.crc32((entry.get('user_message') or '').encode('utf-8'))
+
+
+class PostingList:
+    """
+    Compressed postings of one term.
+
+    Documents are appended in increasing id order. Each posting is stored
+    as varints: the document id delta, the term frequency and the position
+    deltas. Postings are grouped in blocks of BLOCK_SIZE documents; each
+    sealed block records its first and last document id, so lookups of a
+    single document decode only the block that can contain it.
+    """
+
+    __slots__ = ('blocks', 'block_first', 'block_last', 'open_block',
+                 'open_first', 'open_count', 'last_doc', 'df')
+
+    def __init__(self):
+        """Create an empty posting list."""
+        self.blocks: List[bytes] = []
+        self.block_first = array('Q')
+        self.block_last = array('Q')
+        self.open_block = bytearray()
+        self.open_first = 0
+        self.open_count = 0
+        self.last_doc = 0
+        self.df = 0
+
+    def add(self, doc: int, positions: List[int]):
+        """
+        Append the postings of a document.
+
+        Args:
+            doc: Document id, greater than any id added before
+            positions: Increasing term positions within the document
+        """
+        if self.open_count == 0:
+            self.open_first = doc
+            previous = doc
+        else:
+            previous = self.last_doc
+        buffer = self.open_block
+        _write_varint(buffer, doc - previous)
+        _write_varint(buffer, len(positions))
+        last = 0
+        for position in positions:
+            _write_varint(buffer, position - last)
+            last = position
+        self.last_doc = doc
+        self.open_count += 1
+        self.df += 1
+
+        if self.open_count == BLOCK_SIZE:
+            self.blocks.append(bytes(buffer))
+            self.block_first.append(self.open_first)
+            self.block_last.append(doc)
+            self.open_block = bytearray()
+            self.open_count = 0
+
+    @property
+    def block_count(self) -> int:
+        """Number of blocks including the open one."""
+        return len(self.blocks) + (1 if self.open_count else 0)
+
+    def decode_block(self, number: int) -> Dict[int, List[int]]:
+        """
+        Decode one block.
+
+        Args:
+            number: Block number (the open block is last)
+
+        Returns:
+            Mapping of document id to term positions
+        """
+        if number < len(self.blocks):
+            data = self.blocks[number]
+            doc = self.block_first[number]
+        else:
+            data = self.open_block
+            doc = self.open_first
+
+        postings: Dict[int, List[int]] = {}
+        index = 0
+        size = len(data)
+        while index < size:
+            values = []
+            # Document delta, frequency, then one delta per position
+            remaining = 2
+            while remaining:
+                value = 0
+                shift = 0
+                while True:
+                    byte = data[index]
+                    index += 1
+                    value |= (byte & 0x7F) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+                values.append(value)
+                if len(values) == 2:
+                    remaining += value
+                remaining -= 1
+            doc += values[0]
+            positions = values[2:]
+            for i in range(1, len(positions)):
+                positions[i] += positions[i - 1]
+            postings[doc] = positions
+        return postings
+
+    def find_block(self, doc: int) -> Optional[int]:
+        """
+        Find the block that would hold a document.
+
+        Args:
+            doc: Document id
+
+        Returns:
+            Block number, or None when no block covers the id
+        """
+        number = bisect_left(self.block_last, doc)
+        if number < len(self.blocks):
+            return number if self.block_first[number] <= doc else None
+        if self.open_count and self.open_first <= doc <= self.last_doc:
+            return number
+        return None
+
+    def iter_postings(self) -> Iterator[Tuple[int, List[int]]]:
+        """Stream every (document id, positions) pair in id order."""
+        for number in range(self.block_count):
+            yield from self.decode_block(number).items()
+
+    def nbytes(self) -> int:
+        """Approximate size of the compressed postings in bytes."""
+        return (sum(len(block) for block in self.blocks) + len(self.open_block)
+                + 16 * len(self.blocks))
+
+
+class _QueryCursor:
+    """Per-query cache of decoded blocks, so each block is decoded once."""
+
+    def __init__(self, index: 'HistoryIndex'):
+        self.index = index
+        self.blocks: Dict[Tuple[str, int], Dict[int, List[int]]] = {}
+
+    def positions(self, term: str, doc: int) -> Optional[List[int]]:
+        """Positions of a term in a document, or None if it does not occur."""
+        postings = self.index.postings.get(term)
+        if postings is None:
+            return None
+        number = postings.find_block(doc)
+        if number is None:
+            return None
+        key = (term, number)
+        block = self.blocks.get(key)
+        if block is None:
+            block = self.blocks[key] = postings.decode_block(number)
+        return block.get(doc)
+
+
+class HistoryIndex:
+    """
+    In-memory inverted index of conversation turns.
+
+    Every stored turn is one document. The user message is tokenized with
+    the same tokenizer as the NLU components, and each extracted entity
+    value is added as a 'type:value' term (e.g. 'email:jo@example.com'),
+    so both free text and entities can be searched. Bot responses are not
+    indexed: they come from the response templates and would only add
+    common words.
+
+    add() and clear_session() only queue work; a background thread applies
+    it, so indexing stays off the chat path. Cleared sessions keep their
+    postings but are skipped at query time.
+
+    The index lives in the memory of one process and only sees the turns
+    added there, so it is kept only for process-local stores (see
+    HistoryStore.process_local); with stores shared by worker processes,
+    sessions are indexed per search instead.
+    """
+
+    def __init__(self, background: bool = True):
+        """
+        Initialize the index.
+
+        Args:
+            background: Apply updates on a background thread (False applies
+                them immediately in the caller)
+        """
+        self.postings: Dict[str, PostingList] = {}
+        self.doc_slot = array('I')    # Session slot of each document
+        self.doc_length = array('I')  # Token count of each document
+        self.doc_time = array('q')    # Turn timestamp (microseconds since the epoch)
+        self.doc_turn = array('I')    # Turn key (see turn_key)
+        # Timestamps that do not round-trip through doc_time, kept verbatim
+        self.doc_timestamp: Dict[int, Optional[str]] = {}
+        self.total_length = 0
+
+        # A session gets a new slot each time it is cleared
+        self.slot_session: List[str] = []
+        self.slot_live = bytearray()
+        self.session_slot: Dict[str, int] = {}
+        self.live_docs = 0
+
+        # (slot, timestamp, turn key) of every document while a backfill runs
+        self._identities: Optional[set] = None
+        self._identities_until = 0.0
+        self._backfills = 0
+
+        self._lock = threading.Lock()
+        self._queue: 'queue.Queue[Optional[Tuple]]' = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self.background = background
+        if background:
+            self._worker = threading.Thread(target=self._run_indexer, daemon=True)
+            self._worker.start()
+
+        self.queries = 0
+
+    def add(self, session_id: str, entry: Dict):
+        """
+        Queue one stored turn for indexing.
+
+        Args:
+            session_id: Session identifier
+            entry: Conversation entry as stored by ConversationHistory
+        """
+        self._submit(('add', session_id, entry))
+
+    def clear_session(self, session_id: str):
+        """
+        Drop a session from search results.
+
+        Args:
+            session_id: Session identifier
+        """
+        self._submit(('clear', session_id, None))
+
+    def _submit(self, operation: Tuple):
+        """Queue an update, or apply it now when not running in the background."""
+        if self.background:
+            self._queue.put(operation)
+        else:
+            with self._lock:
+                self._apply(operation)
+
+    def _run_indexer(self):
+        """Apply queued updates in batches until close() is called."""
+        while True:
+            operation = self._queue.get()
+            batch = [operation]
+            while len(batch) < 256:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._lock:
+                    for operation in batch:
+                        if operation is not None:
+                            self._apply(operation)
+            except Exception as e:
+                print(f"Error updating history index: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if None in batch:
+                return
+
+    def _slot(self, session_id: str) -> int:
+        """Current slot of a session, creating one if needed (caller holds _lock)."""
+        slot = self.session_slot.get(session_id)
+        if slot is None:
+            slot = len(self.slot_session)
+            self.slot_session.append(session_id)
+            self.slot_live.append(1)
+            self.session_slot[session_id] = slot
+        return slot
+
+    def doc_timestamp_of(self, doc: int) -> Optional[str]:
+        """Stored timestamp of a document's turn."""
+        if doc in self.doc_timestamp:
+            return self.doc_timestamp[doc]
+        return _format_micros(self.doc_time[doc])
+
+    def _apply(self, operation: Tuple):
+        """Apply one queued update (caller holds _lock)."""
+        kind, session_id, entry = operation
+        if kind == 'clear':
+            slot = self.session_slot.pop(session_id, None)
+            if slot is not None:
+                self.slot_live[slot] = 0
+            return
+        if kind == 'backfill_start':
+            if not self._backfills:
+                self._identities = {
+                    (self.doc_slot[doc], self.doc_timestamp_of(doc), self.doc_turn[doc])
+                    for doc in range(len(self.doc_slot))
+                }
+            self._backfills += 1
+            return
+        if kind == 'backfill_end':
+            self._backfills -= 1
+            if not self._backfills:
+                # Live adds of turns the backfill read can still be in flight
+                self._identities_until = time.monotonic() + BACKFILL_GRACE_SECONDS
+            return
+
+        slot = self._slot(session_id)
+        timestamp = entry.get('timestamp')
+        turn = turn_key(entry)
+        if (self._identities is not None and not self._backfills
+                and time.monotonic() > self._identities_until):
+            self._identities = None
+        if self._identities is not None:
+            # The backfill and a live add can both deliver the same turn
+            identity = (slot, timestamp, turn)
+            if identity in self._identities:
+                return
+            self._identities.add(identity)
+
+        tokens, _ = tokenize(entry.get('user_message') or '')
+        terms: Dict[str, List[int]] = {}
+        for position, token in enumerate(tokens):
+            terms.setdefault(token, []).append(position)
+        position = len(tokens)
+        for entity_type, values in (entry.get('entities') or {}).items():
+            if isinstance(values, (str, int, float)):
+                values = [values]
+            for value in values or ():
+                terms.setdefault(entity_term(entity_type, value), []).append(position)
+                position += 1
+
+        doc = len(self.doc_slot)
+        micros = _timestamp_micros(timestamp)
+        self.doc_slot.append(slot)
+        self.doc_length.append(len(tokens))
+        self.doc_time.append(micros or 0)
+        self.doc_turn.append(turn)
+        if micros is None or _format_micros(micros) != timestamp:
+            self.doc_timestamp[doc] = timestamp
+        self.total_length += len(tokens)
+        for term, positions in terms.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = PostingList()
+            postings.add(doc, positions)
+
+    def flush(self):
+        """Wait until every queued update has been applied."""
+        if self.background:
+            self._queue.join()
+
+    def close(self):
+        """Apply queued updates and stop the background thread."""
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+
+    def backfill(self, sessions: Iterable[Tuple[str, Iterable[Dict]]]) -> int:
+        """
+        Queue already stored turns for indexing.
+
+        While a backfill runs, and for BACKFILL_GRACE_SECONDS after it,
+        turns are identified by session, timestamp and turn key, and a
+        turn that is already indexed is skipped. So a turn both read by
+        the backfill and added live while the bot is serving traffic is
+        indexed once, whichever arrives first. (Turns of a session with
+        the same timestamp and message count as one.)
+
+        Args:
+            sessions: (session id, entries) pairs
+
+        Returns:
+            Number of turns queued
+        """
+        count = 0
+        self._submit(('backfill_start', None, None))
+        try:
+            for session_id, entries in sessions:
+                for entry in entries:
+                    self._submit(('add', session_id, entry))
+                    count += 1
+        finally:
+            self._submit(('backfill_end', None, None))
+        return count
+
+    @staticmethod
+    def parse_query(query: str) -> List[Dict[str, List]]:
+        """
+        Parse a query into OR-ed clauses.
+
+        Whitespace-separated parts of a clause must all match: plain words,
+        "quoted phrases" (consecutive words), and entity terms such as
+        email:jo@example.com or order_number:12345. A leading '-' excludes
+        documents matching the part. 'OR' separates alternative clauses.
+
+        Args:
+            query: Query string
+
+        Returns:
+            Clauses as dicts with 'include' and 'exclude' lists of term
+            sequences (one term, or several for a phrase)
+        """
+        clauses = [{'include': [], 'exclude': []}]
+        for match in QUERY_TOKEN.finditer(query):
+            negate, phrase, word = match.groups()
+            if word == 'OR':
+                clauses.append({'include': [], 'exclude': []})
+                continue
+            if word is not None:
+                negate = '-' if word.startswith('-') and len(word) > 1 else ''
+                word = word[1:] if negate else word
+                field = FIELD_TERM.match(word.lower())
+                if field:
+                    terms = [entity_term(field.group(1), field.group(2))]
+                else:
+                    terms = tokenize(word)[0]
+            else:
+                terms = tokenize(phrase)[0]
+            if terms:
+                clauses[-1]['exclude' if negate else 'include'].append(terms)
+        return [clause for clause in clauses if clause['include']]
+
+    def _phrase_matches(self, cursor: _QueryCursor, terms: List[str], doc: int) -> bool:
+        """Whether the terms occur at consecutive positions in a document."""
+        first = cursor.positions(terms[0], doc)
+        if not first:
+            return False
+        later = []
+        for term in terms[1:]:
+            positions = cursor.positions(term, doc)
+            if not positions:
+                return False
+            later.append(set(positions))
+        return any(
+            all(start + offset + 1 in positions for offset, positions in enumerate(later))
+            for start in first
+        )
+
+    def _score_clause(self, cursor: _QueryCursor, clause: Dict[str, List]) -> Dict[int, float]:
+        """BM25 scores of the live documents matching one clause (caller holds _lock)."""
+        required = list(dict.fromkeys(term for terms in clause['include'] for term in terms))
+        if any(term not in self.postings for term in required):
+            return {}
+
+        # Walk the rarest term's postings and probe the others per document
+        required.sort(key=lambda term: self.postings[term].df)
+        rarest = required[0]
+        candidates: Dict[int, Dict[str, int]] = {}
+        for doc, positions in self.postings[rarest].iter_postings():
+            if not self.slot_live[self.doc_slot[doc]]:
+                continue
+            frequencies = {rarest: len(positions)}
+            for term in required[1:]:
+                found = cursor.positions(term, doc)
+                if found is None:
+                    break
+                frequencies[term] = len(found)
+            else:
+                candidates[doc] = frequencies
+
+        phrases = [terms for terms in clause['include'] if len(terms) > 1]
+        scores: Dict[int, float] = {}
+        documents = len(self.doc_slot)
+        average_length = self.total_length / documents if documents else 0.0
+        idf = {
+            term: math.log(1 + (documents - self.postings[term].df + 0.5)
+                           / (self.postings[term].df + 0.5))
+            for term in required
+        }
+        for doc, frequencies in candidates.items():
+            if any(not self._phrase_matches(cursor, terms, doc) for terms in phrases):
+                continue
+            if any(self._excluded(cursor, terms, doc) for terms in clause['exclude']):
+                continue
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_length[doc] / (average_length or 1))
+            scores[doc] = sum(
+                idf[term] * frequency * (BM25_K1 + 1) / (frequency + norm)
+                for term, frequency in frequencies.items()
+            )
+        return scores
+
+    def _excluded(self, cursor: _QueryCursor, terms: List[str], doc: int) -> bool:
+        """Whether an excluded word or phrase occurs in a document."""
+        if len(terms) == 1:
+            return cursor.positions(terms[0], doc) is not None
+        return self._phrase_matches(cursor, terms, doc)
+
+    def search(self, query: str, limit: int = HISTORY_INDEX_MAX_RESULTS,
+               session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Find the turns matching a query, best first.
+
+        Args:
+            query: Query string (see parse_query)
+            limit: Maximum number of results
+            session_id: Only return turns of this session
+
+        Returns:
+            Results with 'session_id', 'timestamp' (as stored), 'turn'
+            (see turn_key) and 'score'
+        """
+        clauses = self.parse_query(query)
+        with self._lock:
+            self.queries += 1
+            cursor = _QueryCursor(self)
+            scores: Dict[int, float] = {}
+            for clause in clauses:
+                for doc, score in self._score_clause(cursor, clause).items():
+                    scores[doc] = scores.get(doc, 0.0) + score
+
+            if session_id is not None:
+                slot = self.session_slot.get(session_id)
+                scores = {doc: score for doc, score in scores.items()
+                          if self.doc_slot[doc] == slot}
+
+            # Ties go to the newer turn
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+            return [
+                {
+                    'session_id': self.slot_session[self.doc_slot[doc]],
+                    'timestamp': self.doc_timestamp_of(doc),
+                    'turn': self.doc_turn[doc],
+                    'score': round(score, 4)
+                }
+                for doc, score in best
+            ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get index statistics.
+
+        Returns:
+            Dictionary with document, term and session counts, postings
+            size, pending updates and query count
+        """
+        with self._lock:
+            return {
+                'documents': len(self.doc_slot),
+                'terms': len(self.postings),
+                'sessions': len(self.session_slot),
+                'postings_bytes': sum(postings.nbytes() for postings in self.postings.values()),
+                'pending_updates': self._queue.qsize(),
+                'queries': self.queries
+            }
+
+
+def iter_stored_sessions(store) -> Iterator[Tuple[str, Iterable[Dict]]]:
+    """
+    Stream every stored session of a history store.
+
+    Archived sessions of a TieredHistoryStore are read from the archive
+    directly instead of being rehydrated into the hot store.
+
+    Args:
+        store: HistoryStore
+
+    Returns:
+        Iterator of (session id, entries) pairs
+    """
+    hot = getattr(store, 'hot', store)
+    archive = getattr(store, 'archive', None)
+    for session_id in hot.session_ids():
+        yield session_id, hot.iter_session(session_id)
+    if archive is not None:
+        for session_id in archive.session_ids():
+            try:
+                yield session_id, archive.load(session_id)
+            except (OSError, ValueError) as e:
+                print(f"Error indexing archived history: {e}")
+
+
+_shared_index: Optional[HistoryIndex] = None
+_shared_index_lock = threading.Lock()
+
+
+def get_history_index(store=None) -> HistoryIndex:
+    """
+    Get the process-wide history index.
+
+    When it is created with HISTORY_INDEX_BACKFILL, the turns already in
+    the store are indexed on a background thread.
+
+    Args:
+        store: History store to backfill from on creation
+
+    Returns:
+        Shared HistoryIndex instance
+    """
+    global _shared_index
+    if _shared_index is None:
+        with _shared_index_lock:
+            if _shared_index is None:
+                index = HistoryIndex()
+                if HISTORY_INDEX_BACKFILL and store is not None:
+                    def run():
+                        try:
+                            index.backfill(iter_stored_sessions(store))
+                        except Exception as e:
+                            print(f"Error indexing stored history: {e}")
+                    threading.Thread(target=run, daemon=True).start()
+                _shared_index = index
+    return _shared_index
+
+
+def main():
+    """
+    Search stored conversations from the command line.
+
+    The index is not persisted, so each run indexes the stored turns it
+    searches first: every session, or with --session only the given ones.
+    """
+    parser = argparse.ArgumentParser(
+        description="Search stored conversation history (each run indexes the searched sessions first)"
+    )
+    parser.add_argument('query', help='Query, e.g. \'refund "order status" email:jo@example.com\'')
+    parser.add_argument('--limit', type=int, default=HISTORY_INDEX_MAX_RESULTS, help="Maximum results")
+    parser.add_argument('--session', action='append',
+                        help="Only search this session (repeatable); avoids a pass over all history")
+    args = parser.parse_args()
+
+    from history_store import get_history_store
+    store = get_history_store()
+    if args.session:
+        sessions = [(session_id, store.iter_session(session_id)) for session_id in args.session]
+    else:
+        sessions = iter_stored_sessions(store)
+    index = HistoryIndex(background=False)
+    started = time.perf_counter()
+    turns = index.backfill(sessions)
+    print(f"Indexed {turns} turns in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    results = index.search(args.query, args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    for result in results:
+        print(f"{result['score']:8.3f}  {result['timestamp']}  {result['session_id']}")
+    print(f"{len(results)} results in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,527 @@
+"""
+History Segment Module
+Compact binary archive format for conversation history with memory-mapped reads.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from collections import Counter
+from datetime import datetime, timedelta
+import argparse
+import bisect
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+
+from history_store import JSONLHistoryStore, SQLiteHistoryStore, read_legacy_history
+
+
+MAGIC = b'HSG1'
+VERSION = 1
+
+# magic, version
+HEADER = struct.Struct('<4sI')
+
+# Record length prefix
+LENGTH = struct.Struct('<I')
+
+# Session table row: id offset, id length, first record, record count
+SESSION = struct.Struct('<IIII')
+
+# Section offsets for strings, string offsets, session ids, session table
+# and record offsets, then string/session/record counts and the magic again
+FOOTER = struct.Struct('<5Q3I4s')
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Timestamp tags
+_TS_NONE = 0
+_TS_MICROS = 1
+_TS_TEXT = 2
+
+
+def _as_text(value: Any) -> Optional[str]:
+    """Text stored for a field value; non-strings (e.g. numbers in legacy history) as JSON."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+class _Encoder:
+    """Encodes entries into record payloads against a string dictionary."""
+
+    def __init__(self, dictionary: List[str]):
+        self.ids = {text: index for index, text in enumerate(dictionary)}
+
+    def string(self, out: bytearray, text: Any):
+        # 0 = None, odd = dictionary id, even = raw string of length (v >> 1) - 1
+        text = _as_text(text)
+        if text is None:
+            out.append(0)
+            return
+        index = self.ids.get(text)
+        if index is not None:
+            _write_varint(out, index << 1 | 1)
+            return
+        data = text.encode('utf-8')
+        _write_varint(out, (len(data) + 1) << 1)
+        out += data
+
+    def timestamp(self, out: bytearray, value: Optional[str]):
+        if value is None:
+            out.append(_TS_NONE)
+            return
+        try:
+            moment = datetime.fromisoformat(value)
+            exact = moment.tzinfo is None and moment.isoformat() == value
+        except (TypeError, ValueError):
+            exact = False
+        if exact:
+            delta = moment - _EPOCH
+            micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+            out.append(_TS_MICROS)
+            _write_varint(out, micros << 1 if micros >= 0 else (-micros << 1) - 1)
+        else:
+            out.append(_TS_TEXT)
+            self.string(out, value)
+
+    def entry(self, entry: Dict) -> bytes:
+        out = bytearray()
+        self.timestamp(out, entry.get('timestamp'))
+        self.string(out, entry.get('user_message'))
+        self.string(out, entry.get('bot_response'))
+        self.string(out, entry.get('intent'))
+
+        entities = entry.get('entities')
+        if entities is None:
+            out.append(0)
+        else:
+            _write_varint(out, len(entities) + 1)
+            for entity_type, values in entities.items():
+                self.string(out, entity_type)
+                _write_varint(out, len(values))
+                for value in values:
+                    self.string(out, value)
+        return bytes(out)
+
+
+def _build_dictionary(sessions: List[Tuple[str, List[Dict]]]) -> List[str]:
+    """
+    Pick the strings stored once in the dictionary, most frequent first.
+
+    Intents and entity types always are; messages, responses and entity
+    values are when they occur more than once.
+    """
+    always = set()
+    counts = Counter()
+    for _, entries in sessions:
+        for entry in entries:
+            intent = _as_text(entry.get('intent'))
+            if intent is not None:
+                always.add(intent)
+                counts[intent] += 1
+            for field in ('user_message', 'bot_response'):
+                if entry.get(field) is not None:
+                    counts[_as_text(entry[field])] += 1
+            for entity_type, values in (entry.get('entities') or {}).items():
+                entity_type = _as_text(entity_type)
+                always.add(entity_type)
+                counts[entity_type] += 1
+                counts.update(_as_text(value) for value in values if value is not None)
+    chosen = [text for text, count in counts.items() if count > 1 or text in always]
+    chosen.sort(key=lambda text: -counts[text])
+    return chosen
+
+
+def _write_segment_to(f: BinaryIO, sessions: Iterable[Tuple[str, Iterable[Dict]]]) -> Dict[str, int]:
+    """Write a segment into an open binary file (see write_segment)."""
+    sessions = sorted(
+        ((session_id, list(entries)) for session_id, entries in sessions),
+        key=lambda item: item[0].encode('utf-8')
+    )
+    dictionary = _build_dictionary(sessions)
+    encoder = _Encoder(dictionary)
+
+    record_offsets: List[int] = []
+    session_rows: List[Tuple[int, int, int, int]] = []
+    session_ids = bytearray()
+
+    f.write(HEADER.pack(MAGIC, VERSION))
+    offset = HEADER.size
+    for session_id, entries in sessions:
+        data = session_id.encode('utf-8')
+        session_rows.append((len(session_ids), len(data), len(record_offsets), len(entries)))
+        session_ids += data
+        for entry in entries:
+            payload = encoder.entry(entry)
+            record_offsets.append(offset)
+            f.write(LENGTH.pack(len(payload)))
+            f.write(payload)
+            offset += LENGTH.size + len(payload)
+
+    strings_offset = offset
+    string_offsets = [0]
+    for text in dictionary:
+        data = text.encode('utf-8')
+        f.write(data)
+        string_offsets.append(string_offsets[-1] + len(data))
+    offset += string_offsets[-1]
+
+    string_offsets_offset = offset
+    f.write(struct.pack(f'<{len(string_offsets)}I', *string_offsets))
+    offset += 4 * len(string_offsets)
+
+    session_ids_offset = offset
+    f.write(session_ids)
+    offset += len(session_ids)
+
+    sessions_offset = offset
+    for row in session_rows:
+        f.write(SESSION.pack(*row))
+    offset += SESSION.size * len(session_rows)
+
+    record_offsets_offset = offset
+    f.write(struct.pack(f'<{len(record_offsets)}Q', *record_offsets))
+    offset += 8 * len(record_offsets)
+
+    f.write(FOOTER.pack(
+        strings_offset, string_offsets_offset, session_ids_offset, sessions_offset,
+        record_offsets_offset, len(dictionary), len(session_rows), len(record_offsets), MAGIC
+    ))
+    offset += FOOTER.size
+
+    return {
+        'records': len(record_offsets),
+        'sessions': len(session_rows),
+        'strings': len(dictionary),
+        'bytes': offset
+    }
+
+
+def write_segment(sessions: Iterable[Tuple[str, Iterable[Dict]]], path: str) -> Dict[str, int]:
+    """
+    Write sessions into a binary history segment.
+
+    File layout (little-endian):
+        header       HEADER struct
+        records      per record: u32 payload length, payload
+        strings      concatenated UTF-8 dictionary strings
+        string offs  (strings + 1) x u32 offsets into the string data
+        session ids  concatenated UTF-8 session ids
+        sessions     SESSION struct per session, sorted by id
+        record offs  records x u64 file offsets of the length prefixes
+        footer       FOOTER struct
+
+    Each session's records are contiguous and in order. A payload holds
+    the timestamp (microseconds since 1970 when the ISO string round-trips,
+    else the text), user message, bot response, intent and entities.
+    Strings are varints: 0 is None, odd values are dictionary ids and even
+    values prefix raw UTF-8 of length (v >> 1) - 1. Values that are not
+    strings (e.g. numeric entity values in legacy history) are stored as
+    their JSON text and read back as strings.
+
+    Args:
+        sessions: Iterable of (session id, entries oldest first)
+        path: Output file path
+
+    Returns:
+        Dictionary with record, session, string and byte counts
+    """
+    with open(path + '.tmp', 'wb') as f:
+        stats = _write_segment_to(f, sessions)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+    return stats
+
+
+def encode_segment(sessions: Iterable[Tuple[str, Iterable[Dict]]]) -> bytes:
+    """
+    Encode sessions into binary history segment bytes (see write_segment).
+
+    Args:
+        sessions: Iterable of (session id, entries oldest first)
+
+    Returns:
+        Segment bytes, readable with HistorySegment
+    """
+    buffer = io.BytesIO()
+    _write_segment_to(buffer, sessions)
+    return buffer.getvalue()
+
+
+class HistorySegment:
+    """
+    Read-only memory-mapped binary history segment.
+
+    Opening a segment only reads its header and footer. Fetching a record
+    decodes that record alone, and dictionary strings are decoded when a
+    record refers to them.
+    """
+
+    def __init__(self, source: Union[str, bytes]):
+        """
+        Memory-map a segment written by write_segment.
+
+        Args:
+            source: Segment file path, or segment bytes from encode_segment
+        """
+        if sys.byteorder != 'little':
+            raise OSError("History segments can only be mapped on little-endian hosts")
+        if isinstance(source, (bytes, bytearray)):
+            self.path = None
+            self._mapped = None
+            data = memoryview(source)
+        else:
+            self.path = source
+            with open(source, 'rb') as f:
+                self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            data = memoryview(self._mapped)
+
+        magic, version = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or len(data) < HEADER.size + FOOTER.size:
+            raise ValueError(f"Not a history segment: {self.path or 'buffer'}")
+        (strings_offset, string_offsets_offset, session_ids_offset, sessions_offset,
+         record_offsets_offset, string_count, session_count, record_count,
+         footer_magic) = FOOTER.unpack_from(data, len(data) - FOOTER.size)
+        if footer_magic != MAGIC:
+            raise ValueError(f"Truncated history segment: {self.path or 'buffer'}")
+
+        self._data = data
+        self._strings = data[strings_offset:string_offsets_offset]
+        self._string_offsets = data[string_offsets_offset:session_ids_offset].cast('I')
+        self._session_ids = data[session_ids_offset:sessions_offset]
+        self._sessions = data[sessions_offset:record_offsets_offset].cast('I')
+        self._record_offsets = data[record_offsets_offset:record_offsets_offset + 8 * record_count].cast('Q')
+        self._string_cache: Dict[int, str] = {}
+        self.string_count = string_count
+        self.session_count = session_count
+
+    def __len__(self) -> int:
+        return len(self._record_offsets)
+
+    def close(self):
+        """Release the mapping."""
+        for view in (self._strings, self._string_offsets, self._session_ids,
+                     self._sessions, self._record_offsets, self._data):
+            view.release()
+        if self._mapped is not None:
+            self._mapped.close()
+
+    # Sessions
+
+    def _session_id(self, index: int) -> bytes:
+        offset = self._sessions[4 * index]
+        return bytes(self._session_ids[offset:offset + self._sessions[4 * index + 1]])
+
+    def session_ids(self) -> List[str]:
+        """Identifiers of the sessions in the segment (sorted)."""
+        return [self._session_id(i).decode('utf-8') for i in range(self.session_count)]
+
+    def session_range(self, session_id: str) -> Optional[Tuple[int, int]]:
+        """
+        Find a session's records by binary search over the session table.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            (first record index, record count), or None if absent
+        """
+        key = session_id.encode('utf-8')
+        index = bisect.bisect_left(range(self.session_count), key, key=self._session_id)
+        if index < self.session_count and self._session_id(index) == key:
+            return self._sessions[4 * index + 2], self._sessions[4 * index + 3]
+        return None
+
+    def _owner(self, record_index: int) -> str:
+        """Session id of a record (sessions hold contiguous record ranges)."""
+        index = bisect.bisect_right(
+            range(self.session_count), record_index, key=lambda i: self._sessions[4 * i + 2]
+        ) - 1
+        return self._session_id(index).decode('utf-8')
+
+    # Records
+
+    def _string(self, index: int) -> str:
+        text = self._string_cache.get(index)
+        if text is None:
+            start = self._string_offsets[index]
+            text = str(self._strings[start:self._string_offsets[index + 1]], 'utf-8')
+            self._string_cache[index] = text
+        return text
+
+    def _read_string(self, data, pos: int) -> Tuple[Optional[str], int]:
+        value, pos = _read_varint(data, pos)
+        if value == 0:
+            return None, pos
+        if value & 1:
+            return self._string(value >> 1), pos
+        end = pos + (value >> 1) - 1
+        return str(data[pos:end], 'utf-8'), end
+
+    def _decode(self, index: int, session_id: str) -> Dict[str, Any]:
+        offset = self._record_offsets[index]
+        length = LENGTH.unpack_from(self._data, offset)[0]
+        data = self._data[offset + LENGTH.size:offset + LENGTH.size + length]
+
+        tag = data[0]
+        pos = 1
+        if tag == _TS_MICROS:
+            value, pos = _read_varint(data, pos)
+            micros = value >> 1 if not value & 1 else -((value + 1) >> 1)
+            timestamp = (_EPOCH + timedelta(microseconds=micros)).isoformat()
+        elif tag == _TS_TEXT:
+            timestamp, pos = self._read_string(data, pos)
+        else:
+            timestamp = None
+
+        user_message, pos = self._read_string(data, pos)
+        bot_response, pos = self._read_string(data, pos)
+        intent, pos = self._read_string(data, pos)
+
+        count, pos = _read_varint(data, pos)
+        entities = None
+        if count:
+            entities = {}
+            for _ in range(count - 1):
+                entity_type, pos = self._read_string(data, pos)
+                value_count, pos = _read_varint(data, pos)
+                values = []
+                for _ in range(value_count):
+                    value, pos = self._read_string(data, pos)
+                    values.append(value)
+                entities[entity_type] = values
+
+        return {
+            'timestamp': timestamp,
+            'session_id': session_id,
+            'user_message': user_message,
+            'bot_response': bot_response,
+            'intent': intent,
+            'entities': entities
+        }
+
+    def record(self, index: int) -> Dict[str, Any]:
+        """
+        Decode one record.
+
+        Args:
+            index: Record index (0 <= index < len(segment))
+
+        Returns:
+            History entry
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._decode(index, self._owner(index))
+
+    def iter_session(self, session_id: str, start: int = 0,
+                     stop: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Decode a range of a session's records, oldest first.
+
+        Args:
+            session_id: Session identifier
+            start: First turn within the session
+            stop: Turn after the last one (defaults to the session's end)
+
+        Returns:
+            Iterator of entries
+        """
+        found = self.session_range(session_id)
+        if found is None:
+            return iter(())
+        first, count = found
+        start, stop, _ = slice(start, stop).indices(count)
+        return (self._decode(first + i, session_id) for i in range(start, stop))
+
+    def load_session(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the last `limit` (default all) entries of a session."""
+        return list(self.iter_session(session_id, -limit if limit else 0))
+
+
+def read_history_sessions(source: str) -> Iterator[Tuple[str, List[Dict]]]:
+    """
+    Read every session of a history source for conversion.
+
+    Args:
+        source: JSONL store directory, SQLite database (.db) or single JSON file
+
+    Returns:
+        Iterator of (session id, entries oldest first)
+    """
+    if os.path.isdir(source):
+        store = JSONLHistoryStore(source, legacy_file=None)
+    elif source.endswith('.db'):
+        store = SQLiteHistoryStore(source, legacy_file=None)
+    else:
+        for session in read_legacy_history(source):
+            yield session.get('session_id'), session.get('messages', [])
+        return
+
+    try:
+        for session_id in store.session_ids():
+            yield session_id, list(store.iter_session(session_id))
+    finally:
+        store.close()
+
+
+def main():
+    """Convert history to a binary segment, or print a session from one."""
+    parser = argparse.ArgumentParser(description="Binary conversation history segments")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert = subparsers.add_parser('convert', help="Convert stored history into a segment")
+    convert.add_argument('source', help="JSONL store directory, SQLite .db or JSON history file")
+    convert.add_argument('output', help="Output segment file")
+    show = subparsers.add_parser('show', help="Print the entries of a session")
+    show.add_argument('segment', help="Segment file")
+    show.add_argument('session_id', help="Session identifier")
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        stats = write_segment(read_history_sessions(args.source), args.output)
+        source_size = (
+            sum(entry.stat().st_size for entry in os.scandir(args.source))
+            if os.path.isdir(args.source) else os.path.getsize(args.source)
+        )
+        print(f"Wrote {stats['records']} records from {stats['sessions']} sessions "
+              f"({stats['strings']} dictionary strings) into {args.output}: "
+              f"{stats['bytes']} bytes, {source_size} bytes before")
+    else:
+        segment = HistorySegment(args.segment)
+        for entry in segment.iter_session(args.session_id):
+            print(f"[{entry['timestamp']}] You: {entry['user_message']}")
+            print(f"    Bot: {entry['bot_response']}")
+        segment.close()
+
+
+if __name__ == "__main__":
+    main()
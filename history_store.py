@@ -0,0 +1,1833 @@
+"""
+History Store Module
+Storage engines for conversation history: append-only JSONL log, SQLite and legacy JSON file.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from urllib.parse import quote, unquote
+import argparse
+import atexit
+import base64
+from datetime import datetime
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+from file_utils import file_lock, fsync_directory, write_file_atomic
+from config import (
+    HISTORY_BACKEND, HISTORY_FILE, HISTORY_DIR, HISTORY_DB, MAX_HISTORY_ENTRIES,
+    HISTORY_FSYNC, HISTORY_FSYNC_INTERVAL_MS, HISTORY_SEGMENT_MAX_BYTES,
+    HISTORY_COMPACT_SEGMENTS, HISTORY_SQLITE_BATCH_SIZE, ENABLE_HISTORY_ARCHIVE,
+    HISTORY_SHARD_DIR, HISTORY_SHARD_MAX_BYTES, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE
+)
+
+
+FSYNC_POLICIES = ('always', 'interval', 'os')
+
+SEGMENT_PATTERN = re.compile(r'^segment-(\d+)\.jsonl$')
+
+# Offset index entries pack the segment number above the byte offset
+OFFSET_BITS = 40
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+# First record of a compacted segment: everything read before it is folded in
+CHECKPOINT_RECORD = b'{"op":"checkpoint"}\n'
+
+
+def _encode_record(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _truncate_torn_tail(path: str, chunk_size: int = 65536):
+    """Cut a log file back to its last complete line (a crash can leave a torn one)."""
+    try:
+        with open(path, 'r+b') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - chunk_size)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b'\n')
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                f.truncate(position)
+                f.flush()
+                os.fsync(f.fileno())
+    except FileNotFoundError:
+        return
+
+
+def read_legacy_history(path: str) -> List[Dict]:
+    """
+    Read a history file in the original single-JSON-document format.
+
+    Args:
+        path: Path of the JSON file (a list of {'session_id', 'messages'})
+
+    Returns:
+        List of session dictionaries (empty if the file does not exist)
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def encode_cursor(timestamp: str, key: int) -> str:
+    """
+    Build an opaque page cursor pointing at one entry.
+
+    Args:
+        timestamp: Timestamp of the entry
+        key: Backend-specific tie-breaker among entries with that timestamp
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = json.dumps([timestamp, key], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Read a cursor built by encode_cursor.
+
+    Args:
+        cursor: Cursor string
+
+    Returns:
+        (timestamp, key) tuple
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, key = json.loads(raw)
+        if isinstance(timestamp, str) and isinstance(key, int):
+            return timestamp, key
+    except (ValueError, TypeError):
+        pass
+    raise ValueError(f"Invalid history cursor: {cursor!r}")
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Clamp a requested page size to 1..HISTORY_MAX_PAGE_SIZE (None means HISTORY_PAGE_SIZE)."""
+    if not limit:
+        return HISTORY_PAGE_SIZE
+    return max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+
+
+class SessionView:
+    """
+    Random access to the stored entries of one session, oldest first.
+
+    Indexing a view returns the entry's timestamp, so bisect can search it
+    directly. Backends that locate records without reading the session
+    return views that decode only the entries that are looked at.
+    """
+
+    def __init__(self, entries: Optional[List[Dict]] = None):
+        """
+        Create a view over entries already in memory.
+
+        Args:
+            entries: Entries oldest first
+        """
+        self._entries = entries if entries is not None else []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, index: int) -> str:
+        return self.entry(index).get('timestamp') or ''
+
+    def entry(self, index: int) -> Dict:
+        """Entry at a position of the session."""
+        return self._entries[index]
+
+    def cursor(self, index: int) -> str:
+        """Cursor of the entry at a position: its timestamp and rank among equal timestamps."""
+        timestamp = self[index]
+        return encode_cursor(timestamp, index - bisect_left(self, timestamp))
+
+    def position(self, cursor: str, after: bool) -> int:
+        """
+        Boundary position for a cursor.
+
+        Args:
+            cursor: Cursor from this view's backend
+            after: True for the position just after the entry, False for
+                the entry's own position
+
+        Returns:
+            Position in the view
+        """
+        timestamp, rank = decode_cursor(cursor)
+        first = bisect_left(self, timestamp)
+        return min(first + rank + (1 if after else 0), bisect_right(self, timestamp, first))
+
+    def close(self):
+        """Release files held by the view."""
+
+
+def query_view(view: SessionView, start: Optional[str] = None, end: Optional[str] = None,
+               after: Optional[str] = None, before: Optional[str] = None,
+               limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Cut one page out of a session view (see HistoryStore.query_session).
+
+    Boundaries are found by binary search over timestamps; only the
+    entries of the page, and the few probed by the search, are decoded.
+    """
+    limit = page_size(limit)
+    range_low = bisect_left(view, start) if start else 0
+    range_high = bisect_left(view, end, range_low) if end else len(view)
+    low = max(range_low, view.position(after, True)) if after else range_low
+    high = min(range_high, view.position(before, False)) if before else range_high
+
+    if after or start:
+        first, last = low, min(low + limit, high)
+    else:
+        first, last = max(low, high - limit), high
+    if first >= last:
+        return {'entries': [], 'next': None, 'prev': None}
+
+    entries = [view.entry(i) for i in range(first, last)]
+    return {
+        'entries': [entry for entry in entries if entry],
+        'next': view.cursor(last - 1) if last < range_high else None,
+        'prev': view.cursor(first) if first > range_low else None
+    }
+
+
+class HistoryStore:
+    """
+    Interface shared by the conversation history storage engines.
+    """
+
+    # True when only the process that opened the store writes to it, so
+    # per-process state kept beside it (the search index) sees every turn
+    process_local = False
+
+    def append(self, session_id: str, entry: Dict):
+        """Persist one message exchange of a session."""
+        raise NotImplementedError
+
+    def load_session(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Return the last `limit` (default MAX_HISTORY_ENTRIES) entries of a session."""
+        raise NotImplementedError
+
+    def iter_session(self, session_id: str) -> Iterator[Dict]:
+        """Stream every stored entry of a session, oldest first."""
+        raise NotImplementedError
+
+    def session_ids(self) -> List[str]:
+        """Identifiers of the sessions with stored history."""
+        raise NotImplementedError
+
+    def session_view(self, session_id: str) -> SessionView:
+        """Random-access view of a session's entries (close it after use)."""
+        return SessionView(list(self.iter_session(session_id)))
+
+    def session_usage(self, session_id: str) -> Tuple[Optional[str], int]:
+        """
+        Describe a session for retention decisions.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            (timestamp of the newest entry or None, approximate stored bytes)
+        """
+        newest = None
+        size = 0
+        for entry in self.iter_session(session_id):
+            newest = entry.get('timestamp') or newest
+            size += len(_encode_record(entry))
+        return newest, size
+
+    def query_session(self, session_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                      after: Optional[str] = None, before: Optional[str] = None,
+                      limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Return one page of a session's entries.
+
+        With `after` or `start` the page holds the oldest entries of the
+        range (paging forward); otherwise it holds the newest ones (paging
+        backward with `before`).
+
+        Args:
+            session_id: Session identifier
+            start: Only entries at or after this ISO timestamp
+            end: Only entries before this ISO timestamp
+            after: Cursor; only entries after it
+            before: Cursor; only entries before it
+            limit: Page size (clamped to HISTORY_MAX_PAGE_SIZE)
+
+        Returns:
+            Dictionary with 'entries' (oldest first), 'next' (cursor to pass
+            as `after` for newer entries) and 'prev' (cursor to pass as
+            `before` for older entries); cursors are None at the range ends
+
+        Raises:
+            ValueError: If a cursor is malformed
+        """
+        view = self.session_view(session_id)
+        try:
+            return query_view(view, start, end, after, before, limit)
+        finally:
+            view.close()
+
+    def clear_session(self, session_id: str):
+        """Delete the stored history of a session."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Hand buffered records to the operating system."""
+
+    def close(self):
+        """Flush and release resources."""
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics."""
+        return {}
+
+
+class JSONFileHistoryStore(HistoryStore):
+    """
+    Original storage format: one JSON document holding every session.
+
+    Every append re-reads and rewrites the whole file, so it is only kept
+    for compatibility; the jsonl backend migrates it on first use. The
+    read-modify-write runs under an advisory lock on <file>.lock and the
+    new file replaces the old one by rename, so concurrent processes never
+    lose each other's sessions or read a half-written file.
+    """
+
+    def __init__(self, path: str = HISTORY_FILE, max_entries: int = MAX_HISTORY_ENTRIES):
+        """
+        Initialize the store.
+
+        Args:
+            path: JSON history file
+            max_entries: Entries kept per session
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _rewrite_session(self, session_id: str, messages: Optional[List[Dict]]):
+        """Replace (or with None, remove) one session and rewrite the file."""
+        all_history = [
+            session for session in read_legacy_history(self.path)
+            if session.get('session_id') != session_id
+        ]
+        if messages is not None:
+            all_history.append({'session_id': session_id, 'messages': messages})
+        data = json.dumps(all_history, indent=2, ensure_ascii=False).encode('utf-8')
+        write_file_atomic(self.path, data, sync=False)
+
+    def append(self, session_id: str, entry: Dict):
+        """Persist one message exchange of a session."""
+        with self._lock, file_lock(self.path + '.lock'):
+            messages = self.load_session(session_id)
+            messages.append(entry)
+            self._rewrite_session(session_id, messages[-self.max_entries:])
+
+    def load_session(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Return the last `limit` (default max_entries) entries of a session."""
+        for session in read_legacy_history(self.path):
+            if session.get('session_id') == session_id:
+                return session.get('messages', [])[-(limit or self.max_entries):]
+        return []
+
+    def iter_session(self, session_id: str) -> Iterator[Dict]:
+        """Stream every stored entry of a session, oldest first."""
+        return iter(self.load_session(session_id))
+
+    def session_ids(self) -> List[str]:
+        """Identifiers of the sessions with stored history."""
+        return [session.get('session_id') for session in read_legacy_history(self.path)]
+
+    def clear_session(self, session_id: str):
+        """Delete the stored history of a session."""
+        with self._lock, file_lock(self.path + '.lock'):
+            self._rewrite_session(session_id, None)
+
+
+class JSONLHistoryStore(HistoryStore):
+    """
+    Append-only log of JSON lines split into numbered segment files.
+
+    Each message exchange is one appended line, so a turn costs the same no
+    matter how much history exists. Appends are queued for a writer thread
+    that writes every queued record with one write call (group commit) and
+    syncs according to the fsync policy:
+
+        always   - appenders wait until their record is fsynced; records
+                   queued together share one fsync
+        interval - fsync at most every fsync_interval_ms; appenders never wait
+        os       - leave syncing to the operating system
+
+    The active segment is sealed once it grows past segment_max_bytes. When
+    compact_segments sealed segments exist, a background thread folds them
+    into one segment that keeps only the last max_entries entries of each
+    live session. A compacted segment starts with a checkpoint record that
+    tells readers to discard what they read before it, so a crash between
+    writing it and deleting the old segments never duplicates entries.
+
+    An in-memory offset index maps each session to the positions of its
+    records, so reading a session seeks straight to them. Sealed segments
+    get a sidecar .idx file holding their part of the index; opening the
+    store loads those and only scans the active segment.
+
+    The index and the active segment belong to one process: opening a
+    directory that another process has open raises RuntimeError. Prefork
+    deployments use the sharded or sqlite backend instead.
+    """
+
+    process_local = True
+
+    def __init__(self, directory: str = HISTORY_DIR, fsync_policy: str = HISTORY_FSYNC,
+                 fsync_interval_ms: int = HISTORY_FSYNC_INTERVAL_MS,
+                 segment_max_bytes: int = HISTORY_SEGMENT_MAX_BYTES,
+                 compact_segments: int = HISTORY_COMPACT_SEGMENTS,
+                 max_entries: int = MAX_HISTORY_ENTRIES,
+                 legacy_file: Optional[str] = HISTORY_FILE):
+        """
+        Open (or create) a segment directory.
+
+        Args:
+            directory: Directory holding the segment files
+            fsync_policy: One of FSYNC_POLICIES
+            fsync_interval_ms: Maximum time between fsyncs for 'interval'
+            segment_max_bytes: Size at which the active segment is sealed
+            compact_segments: Sealed segments that trigger compaction (0 disables)
+            max_entries: Entries kept per session by compaction and loads
+            legacy_file: Single-file JSON history imported when the directory
+                is new (renamed to <file>.migrated afterwards)
+        """
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.segment_max_bytes = segment_max_bytes
+        self.compact_segments = compact_segments
+        self.max_entries = max_entries
+
+        os.makedirs(directory, exist_ok=True)
+        self._directory_lock = self._lock_directory(directory)
+
+        # Guards the segment list and the offset index against compaction
+        # while readers use them
+        self._segments_lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+
+        # Offset index: session id -> packed (segment number, byte offset)
+        # of every live record, oldest first
+        self._offsets: Dict[str, array] = {}
+        # Segment holding the latest clear of each session
+        self._cleared_in: Dict[str, int] = {}
+        # The active segment's part of the index, saved as its sidecar
+        self._active_offsets: Dict[str, List[int]] = {}
+        self._active_cleared: set = set()
+
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[str, bool, bytes]] = []
+        self._queued_seq = 0
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._closed = False
+
+        self.records_written = 0
+        self.batches_written = 0
+        self.fsyncs = 0
+        self.compactions = 0
+
+        segments = self.segment_numbers()
+        if not segments and legacy_file and os.path.exists(legacy_file):
+            self._migrate_legacy(legacy_file)
+            segments = self.segment_numbers()
+        self._active_number = segments[-1] if segments else 1
+        # Records appended after a torn line would be lost with it on the next scan
+        _truncate_torn_tail(self.segment_path(self._active_number))
+        self._load_index(segments)
+        self._file = open(self.segment_path(self._active_number), 'ab')
+
+        self._writer = threading.Thread(target=self._run_writer, name='history-writer', daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def _lock_directory(directory: str) -> int:
+        """Take the directory's owner lock for this process."""
+        fd = os.open(os.path.join(directory, 'LOCK'), os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                raise RuntimeError(
+                    f"History directory {directory} is in use by another process; "
+                    "use the 'sharded' or 'sqlite' backend for multi-process deployments"
+                )
+        return fd
+
+    def segment_path(self, number: int) -> str:
+        """Path of the segment with the given number."""
+        return os.path.join(self.directory, f'segment-{number:06d}.jsonl')
+
+    def index_path(self, number: int) -> str:
+        """Path of the offset index sidecar of a sealed segment."""
+        return os.path.join(self.directory, f'segment-{number:06d}.idx')
+
+    def segment_numbers(self) -> List[int]:
+        """Numbers of the segment files on disk, oldest first."""
+        numbers = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def _migrate_legacy(self, legacy_file: str):
+        """Import a single-file JSON history into the first segment."""
+        try:
+            sessions = read_legacy_history(legacy_file)
+        except (OSError, ValueError) as e:
+            print(f"Error migrating history: {e}")
+            return
+
+        path = self.segment_path(1)
+        with open(path + '.tmp', 'wb') as f:
+            for session in sessions:
+                session_id = session.get('session_id')
+                for entry in session.get('messages', [])[-self.max_entries:]:
+                    f.write(_encode_record(dict(entry, session_id=session_id)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        os.replace(legacy_file, legacy_file + '.migrated')
+        fsync_directory(self.directory)
+
+    # Offset index
+
+    def _index_record(self, number: int, session_id: str, clear: bool, offset: int):
+        """Add one record to the offset index (caller holds _segments_lock)."""
+        if clear:
+            self._offsets.pop(session_id, None)
+            self._cleared_in[session_id] = number
+        else:
+            self._offsets.setdefault(session_id, array('Q')).append(number << OFFSET_BITS | offset)
+
+        if number == self._active_number:
+            if clear:
+                self._active_offsets[session_id] = []
+                self._active_cleared.add(session_id)
+            else:
+                self._active_offsets.setdefault(session_id, []).append(offset)
+
+    def _scan_segment(self, number: int) -> Optional[Dict[str, Any]]:
+        """Index a segment by reading it, returning its sidecar contents."""
+        sidecar = {'size': 0, 'checkpoint': False, 'sessions': {}, 'cleared': []}
+        offset = 0
+        for line in self._read_lines(self.segment_path(number)):
+            if line == CHECKPOINT_RECORD:
+                sidecar.update(checkpoint=True, sessions={}, cleared=[])
+            else:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = {}
+                session_id = record.get('session_id')
+                if session_id is not None:
+                    if record.get('op') == 'clear':
+                        sidecar['sessions'][session_id] = []
+                        sidecar['cleared'].append(session_id)
+                    else:
+                        sidecar['sessions'].setdefault(session_id, []).append(offset)
+            offset += len(line)
+        sidecar['size'] = offset
+        return sidecar
+
+    def _apply_sidecar(self, number: int, sidecar: Dict[str, Any]):
+        """Merge one segment's index into the offset index (caller holds _segments_lock)."""
+        if sidecar['checkpoint']:
+            self._offsets.clear()
+        for session_id in sidecar['cleared']:
+            self._offsets.pop(session_id, None)
+            self._cleared_in[session_id] = number
+        base = number << OFFSET_BITS
+        for session_id, offsets in sidecar['sessions'].items():
+            if offsets:
+                self._offsets.setdefault(session_id, array('Q')).extend(base | o for o in offsets)
+
+    def _write_sidecar(self, number: int, sidecar: Dict[str, Any], path: Optional[str] = None):
+        """Save a sealed segment's index next to it."""
+        path = path or self.index_path(number)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(sidecar, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+
+    def _load_index(self, segments: List[int]):
+        """Build the offset index from sidecars, scanning segments that lack one."""
+        with self._segments_lock:
+            for number in segments:
+                sidecar = None
+                if number != self._active_number:
+                    try:
+                        with open(self.index_path(number), 'r', encoding='utf-8') as f:
+                            sidecar = json.load(f)
+                        if sidecar.get('size') != os.path.getsize(self.segment_path(number)):
+                            sidecar = None
+                    except (OSError, ValueError):
+                        sidecar = None
+                if sidecar is None:
+                    sidecar = self._scan_segment(number)
+                    if number != self._active_number:
+                        try:
+                            self._write_sidecar(number, sidecar)
+                        except OSError as e:
+                            print(f"Error writing history index: {e}")
+                self._apply_sidecar(number, sidecar)
+
+                if number == self._active_number:
+                    self._active_offsets = {k: list(v) for k, v in sidecar['sessions'].items()}
+                    self._active_cleared = set(sidecar['cleared'])
+
+    # Writing
+
+    def _enqueue(self, session_id: str, clear: bool, record: Dict[str, Any]):
+        line = _encode_record(record)
+        with self._cond:
+            if self._closed:
+                raise ValueError("History store is closed")
+            self._pending.append((session_id, clear, line))
+            self._queued_seq += 1
+            seq = self._queued_seq
+            self._cond.notify_all()
+
+            if self.fsync_policy == 'always':
+                while self._synced_seq < seq and self._writer.is_alive():
+                    self._cond.wait()
+
+    def append(self, session_id: str, entry: Dict):
+        """
+        Queue one message exchange of a session for writing.
+
+        Args:
+            session_id: Session identifier
+            entry: History entry (timestamp, messages, intent, entities)
+        """
+        if entry.get('session_id') != session_id:
+            entry = dict(entry, session_id=session_id)
+        self._enqueue(session_id, False, entry)
+
+    def clear_session(self, session_id: str):
+        """Record that a session's history was cleared."""
+        self._enqueue(session_id, True, {'session_id': session_id, 'op': 'clear'})
+
+    def _write_batch(self, batch: List[Tuple[str, bool, bytes]]):
+        """Append a batch to the active segment and index it (writer thread only)."""
+        offset = self._file.tell()
+        self._file.write(b''.join(line for _, _, line in batch))
+        self._file.flush()
+
+        with self._segments_lock:
+            for session_id, clear, line in batch:
+                self._index_record(self._active_number, session_id, clear, offset)
+                offset += len(line)
+
+        self.records_written += len(batch)
+        self.batches_written += 1
+
+    def _run_writer(self):
+        """Writer thread: group-commit queued records and sync by policy."""
+        last_sync = time.monotonic()
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    if self._written_seq > self._synced_seq and self.fsync_policy == 'interval':
+                        remaining = last_sync + self.fsync_interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                batch, self._pending = self._pending, []
+                batch_seq = self._queued_seq
+                closing = self._closed
+
+            try:
+                if batch:
+                    self._write_batch(batch)
+
+                synced = self.fsync_policy == 'os'
+                if self.fsync_policy == 'always' or closing or (
+                        self.fsync_policy == 'interval'
+                        and time.monotonic() - last_sync >= self.fsync_interval):
+                    if self.fsync_policy != 'os':
+                        os.fsync(self._file.fileno())
+                        self.fsyncs += 1
+                    last_sync = time.monotonic()
+                    synced = True
+
+                if self._file.tell() >= self.segment_max_bytes:
+                    self._rotate()
+            except OSError as e:
+                print(f"Error writing history: {e}")
+                synced = True
+
+            with self._cond:
+                self._written_seq = batch_seq
+                if synced:
+                    self._synced_seq = batch_seq
+                self._cond.notify_all()
+                if closing and not self._pending:
+                    break
+
+        self._file.close()
+
+    def _rotate(self):
+        """Seal the active segment and start the next one (writer thread only)."""
+        size = self._file.tell()
+        self._file.close()
+        with self._segments_lock:
+            self._write_sidecar(self._active_number, {
+                'size': size,
+                'checkpoint': False,
+                'sessions': self._active_offsets,
+                'cleared': sorted(self._active_cleared)
+            })
+            self._active_number += 1
+            self._active_offsets = {}
+            self._active_cleared = set()
+            self._file = open(self.segment_path(self._active_number), 'ab')
+        if self.fsync_policy != 'os':
+            fsync_directory(self.directory)
+
+        sealed = len(self.segment_numbers()) - 1
+        if self.compact_segments and sealed >= self.compact_segments:
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(
+                    target=self.compact, name='history-compactor', daemon=True
+                )
+                self._compactor.start()
+
+    def flush(self):
+        """Wait until every queued record has been written to the active segment."""
+        with self._cond:
+            target = self._queued_seq
+            self._cond.notify_all()
+            while self._written_seq < target and self._writer.is_alive():
+                self._cond.wait()
+
+    def close(self):
+        """Write and sync queued records, then stop the writer thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        if self._compactor is not None:
+            self._compactor.join()
+        os.close(self._directory_lock)
+
+    # Reading
+
+    @staticmethod
+    def _read_lines(path: str) -> Iterator[bytes]:
+        """Yield the complete lines of a segment (a torn final line is skipped)."""
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    if line.endswith(b'\n'):
+                        yield line
+        except FileNotFoundError:
+            return
+
+    def _snapshot(self, session_id: str, limit: Optional[int]) -> Tuple[array, Dict[int, Any]]:
+        """
+        Copy a session's offsets and open the segments they point into.
+
+        Open files stay readable after compaction replaces or deletes them,
+        so the records can be read without holding any lock.
+        """
+        with self._segments_lock:
+            codes = self._offsets.get(session_id, array('Q'))
+            codes = codes[-limit:] if limit else codes[:]
+            files = {}
+            try:
+                # Codes increase (records are indexed in append order and
+                # compaction folds into the last sealed segment), so each
+                # segment's run of codes is skipped with a binary search
+                index = 0
+                while index < len(codes):
+                    number = codes[index] >> OFFSET_BITS
+                    files[number] = open(self.segment_path(number), 'rb')
+                    index = bisect_left(codes, (number + 1) << OFFSET_BITS, index)
+            except OSError:
+                for f in files.values():
+                    f.close()
+                raise
+        return codes, files
+
+    @staticmethod
+    def _read_records(codes: array, files: Dict[int, Any]) -> Iterator[Dict]:
+        """Decode the records at the given packed offsets, closing the files at the end."""
+        try:
+            for code in codes:
+                f = files[code >> OFFSET_BITS]
+                f.seek(code & OFFSET_MASK)
+                yield json.loads(f.readline())
+        finally:
+            for f in files.values():
+                f.close()
+
+    def session_view(self, session_id: str) -> SessionView:
+        """View of a session that reads records through the offset index as they are accessed."""
+        self.flush()
+        return _OffsetSessionView(*self._snapshot(session_id, None))
+
+    def load_session(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Return the last entries of a session.
+
+        Only the returned records are read, located through the offset index.
+
+        Args:
+            session_id: Session identifier
+            limit: Maximum entries (defaults to max_entries)
+
+        Returns:
+            Entries oldest first
+        """
+        self.flush()
+        return list(self._read_records(*self._snapshot(session_id, limit or self.max_entries)))
+
+    def iter_session(self, session_id: str) -> Iterator[Dict]:
+        """
+        Stream every stored entry of a session, oldest first.
+
+        The iterator covers the session as it was when this was called and
+        decodes one record at a time.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            Iterator of entries
+        """
+        self.flush()
+        return self._read_records(*self._snapshot(session_id, None))
+
+    def session_ids(self) -> List[str]:
+        """Identifiers of the sessions with stored history."""
+        self.flush()
+        with self._segments_lock:
+            return list(self._offsets)
+
+    # Compaction
+
+    def compact(self) -> int:
+        """
+        Fold all sealed segments into one.
+
+        Returns:
+            Number of segments folded (0 if there was nothing to do)
+        """
+        with self._compact_lock:
+            with self._segments_lock:
+                sealed = [n for n in self.segment_numbers() if n < self._active_number]
+            if len(sealed) < 2:
+                return 0
+
+            sessions: Dict[str, deque] = {}
+            for number in sealed:
+                for line in self._read_lines(self.segment_path(number)):
+                    if line == CHECKPOINT_RECORD:
+                        sessions.clear()
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    session_id = record.get('session_id')
+                    if record.get('op') == 'clear':
+                        sessions.pop(session_id, None)
+                    else:
+                        sessions.setdefault(session_id, deque(maxlen=self.max_entries)).append(line)
+
+            target = sealed[-1]
+            path = self.segment_path(target)
+            sidecar = {'size': 0, 'checkpoint': True, 'sessions': {}, 'cleared': []}
+            try:
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(CHECKPOINT_RECORD)
+                    offset = len(CHECKPOINT_RECORD)
+                    for session_id, lines in sessions.items():
+                        offsets = sidecar['sessions'][session_id] = []
+                        for line in lines:
+                            offsets.append(offset)
+                            offset += len(line)
+                        f.write(b''.join(lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+                sidecar['size'] = offset
+                self._write_sidecar(target, sidecar, self.index_path(target) + '.new')
+
+                with self._segments_lock:
+                    os.replace(path + '.tmp', path)
+                    os.replace(self.index_path(target) + '.new', self.index_path(target))
+                    for number in sealed[:-1]:
+                        os.remove(self.segment_path(number))
+                        if os.path.exists(self.index_path(number)):
+                            os.remove(self.index_path(number))
+                    self._reindex_compacted(target, sidecar)
+                fsync_directory(self.directory)
+            except OSError as e:
+                print(f"Error compacting history: {e}")
+                return 0
+
+            self.compactions += 1
+            return len(sealed)
+
+    def _reindex_compacted(self, target: int, sidecar: Dict[str, Any]):
+        """Point the offset index at a compacted segment (caller holds _segments_lock)."""
+        base = target << OFFSET_BITS
+        compacted = sidecar['sessions']
+        for session_id in set(self._offsets) | set(compacted):
+            newer = [c for c in self._offsets.get(session_id, ()) if c >> OFFSET_BITS > target]
+            codes = array('Q')
+            if self._cleared_in.get(session_id, 0) <= target:
+                codes.extend(base | o for o in compacted.get(session_id, ()))
+            codes.extend(newer)
+            if codes:
+                self._offsets[session_id] = codes
+            else:
+                self._offsets.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get log statistics.
+
+        Returns:
+            Dictionary with segment, session and byte counts and write counters
+        """
+        self.flush()
+        with self._segments_lock:
+            numbers = self.segment_numbers()
+            size = sum(os.path.getsize(self.segment_path(n)) for n in numbers)
+            sessions = len(self._offsets)
+        return {
+            'segments': len(numbers),
+            'sessions': sessions,
+            'bytes': size,
+            'records_written': self.records_written,
+            'batches_written': self.batches_written,
+            'fsyncs': self.fsyncs,
+            'compactions': self.compactions
+        }
+
+
+class _OffsetSessionView(SessionView):
+    """Session view over packed segment offsets (see JSONLHistoryStore._snapshot)."""
+
+    def __init__(self, codes: array, files: Dict[int, Any]):
+        super().__init__()
+        self._codes = codes
+        self._files = files
+        self._decoded: Dict[int, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def entry(self, index: int) -> Dict:
+        entry = self._decoded.get(index)
+        if entry is None:
+            code = self._codes[index]
+            f = self._files[code >> OFFSET_BITS]
+            f.seek(code & OFFSET_MASK)
+            entry = self._decoded[index] = json.loads(f.readline())
+        return entry
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """
+    SQLite database with one row per message exchange.
+
+    The database runs in WAL mode, so any number of reader processes (for
+    example gunicorn workers) proceed while one writer commits. Session
+    reads are indexed queries on (session_id, timestamp). Appends are
+    buffered and inserted with executemany, one transaction per batch: a
+    batch is written once batch_size rows are pending, every
+    flush_interval_ms, and before any read. The same transaction deletes
+    the rows beyond the newest max_entries of each session it wrote to,
+    like compaction does for the file backends. The fsync policy maps onto
+    SQLite's synchronous setting:
+
+        always   - every append is committed immediately (synchronous=FULL)
+        interval - batched commits (synchronous=NORMAL)
+        os       - batched commits without syncing (synchronous=OFF)
+
+    SQL statements are constant strings, so sqlite3's statement cache
+    prepares each of them once per connection. Connections are per thread.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            user_message TEXT,
+            bot_response TEXT,
+            intent TEXT,
+            entities TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_session ON history (session_id, timestamp);
+        CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied_at REAL);
+    """
+
+    INSERT_SQL = (
+        "INSERT INTO history (session_id, timestamp, user_message, bot_response, intent, entities) "
+        "VALUES (?, ?, ?, ?, ?, ?)"
+    )
+    SELECT_TAIL_SQL = (
+        "SELECT session_id, timestamp, user_message, bot_response, intent, entities FROM history "
+        "WHERE session_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?"
+    )
+    SELECT_ALL_SQL = (
+        "SELECT session_id, timestamp, user_message, bot_response, intent, entities FROM history "
+        "WHERE session_id = ? ORDER BY timestamp, id"
+    )
+    # Keyset pages: the (timestamp, id) row values of the cursors bound the
+    # range, so each page is one index range scan
+    PAGE_FORWARD_SQL = (
+        "SELECT id, session_id, timestamp, user_message, bot_response, intent, entities FROM history "
+        "WHERE session_id = ? AND timestamp >= ? AND timestamp < ? "
+        "AND (timestamp, id) > (?, ?) AND (timestamp, id) < (?, ?) ORDER BY timestamp, id LIMIT ?"
+    )
+    PAGE_BACKWARD_SQL = (
+        "SELECT id, session_id, timestamp, user_message, bot_response, intent, entities FROM history "
+        "WHERE session_id = ? AND timestamp >= ? AND timestamp < ? "
+        "AND (timestamp, id) > (?, ?) AND (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT ?"
+    )
+    USAGE_SQL = (
+        "SELECT MAX(timestamp), SUM(length(timestamp) + IFNULL(length(user_message), 0) "
+        "+ IFNULL(length(bot_response), 0) + IFNULL(length(intent), 0) + IFNULL(length(entities), 0)) "
+        "FROM history WHERE session_id = ?"
+    )
+    DELETE_SESSION_SQL = "DELETE FROM history WHERE session_id = ?"
+    TRIM_SESSION_SQL = (
+        "DELETE FROM history WHERE id IN (SELECT id FROM history WHERE session_id = ? "
+        "ORDER BY timestamp DESC, id DESC LIMIT -1 OFFSET ?)"
+    )
+
+    # Sorts after any timestamp
+    MAX_TIMESTAMP = '\U0010ffff'
+
+    SYNCHRONOUS = {'always': 'FULL', 'interval': 'NORMAL', 'os': 'OFF'}
+
+    def __init__(self, path: str = HISTORY_DB, fsync_policy: str = HISTORY_FSYNC,
+                 flush_interval_ms: int = HISTORY_FSYNC_INTERVAL_MS,
+                 batch_size: int = HISTORY_SQLITE_BATCH_SIZE,
+                 max_entries: int = MAX_HISTORY_ENTRIES,
+                 legacy_file: Optional[str] = HISTORY_FILE):
+        """
+        Open (or create) the database.
+
+        Args:
+            path: SQLite database file
+            fsync_policy: One of FSYNC_POLICIES
+            flush_interval_ms: Maximum time a buffered append waits for its batch
+            batch_size: Pending appends that trigger an immediate batch insert
+            max_entries: Entries kept per session, and the default number
+                returned by load_session
+            legacy_file: Single-file JSON history imported once when present
+        """
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: List[Tuple] = []
+        self._closed = threading.Event()
+
+        self.rows_written = 0
+        self.batches_written = 0
+
+        self._connection().executescript(self.SCHEMA)
+        if legacy_file and os.path.exists(legacy_file):
+            self.import_legacy(legacy_file)
+
+        self._flusher = None
+        if fsync_policy != 'always':
+            self._flusher = threading.Thread(target=self._run_flusher, name='history-flusher', daemon=True)
+            self._flusher.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.SYNCHRONOUS[self.fsync_policy]}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _row(session_id: str, entry: Dict) -> Tuple:
+        entities = entry.get('entities')
+        return (
+            session_id, entry.get('timestamp') or datetime.now().isoformat(),
+            entry.get('user_message'), entry.get('bot_response'), entry.get('intent'),
+            json.dumps(entities, ensure_ascii=False) if entities is not None else None
+        )
+
+    @staticmethod
+    def _entry(row: Tuple) -> Dict:
+        session_id, timestamp, user_message, bot_response, intent, entities = row
+        return {
+            'timestamp': timestamp,
+            'session_id': session_id,
+            'user_message': user_message,
+            'bot_response': bot_response,
+            'intent': intent,
+            'entities': json.loads(entities) if entities is not None else None
+        }
+
+    def _insert_rows(self, conn: sqlite3.Connection, rows: List[Tuple]):
+        """Insert rows and trim their sessions to max_entries (caller holds a transaction)."""
+        conn.executemany(self.INSERT_SQL, rows)
+        for session_id in dict.fromkeys(row[0] for row in rows):
+            conn.execute(self.TRIM_SESSION_SQL, (session_id, self.max_entries))
+
+    def _insert(self, rows: List[Tuple]):
+        """Insert rows in one transaction (caller holds _write_lock)."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._insert_rows(conn, rows)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        self.rows_written += len(rows)
+        self.batches_written += 1
+
+    def append(self, session_id: str, entry: Dict):
+        """
+        Buffer one message exchange of a session for the next batch insert.
+
+        Args:
+            session_id: Session identifier
+            entry: History entry (timestamp, messages, intent, entities)
+        """
+        with self._lock:
+            if self._closed.is_set():
+                raise ValueError("History store is closed")
+            self._pending.append(self._row(session_id, entry))
+            full = self.fsync_policy == 'always' or len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Insert every buffered append."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if rows:
+                self._insert(rows)
+
+    def _run_flusher(self):
+        """Flusher thread: insert buffered appends every flush_interval."""
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Error writing history: {e}")
+
+    def load_session(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Return the last entries of a session (one indexed query).
+
+        Args:
+            session_id: Session identifier
+            limit: Maximum entries (defaults to max_entries)
+
+        Returns:
+            Entries oldest first
+        """
+        self.flush()
+        rows = self._connection().execute(
+            self.SELECT_TAIL_SQL, (session_id, limit or self.max_entries)
+        ).fetchall()
+        return [self._entry(row) for row in reversed(rows)]
+
+    def iter_session(self, session_id: str) -> Iterator[Dict]:
+        """
+        Stream every stored entry of a session, oldest first.
+
+        Rows are fetched from the index in batches of batch_size.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            Iterator of entries
+        """
+        self.flush()
+        cursor = self._connection().execute(self.SELECT_ALL_SQL, (session_id,))
+        return self._iter_cursor(cursor)
+
+    def query_session(self, session_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                      after: Optional[str] = None, before: Optional[str] = None,
+                      limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Return one page of a session's entries (see HistoryStore.query_session).
+
+        Cursors hold the row id as tie-breaker, and pages are keyset range
+        scans of the (session_id, timestamp) index.
+        """
+        limit = page_size(limit)
+        lower = decode_cursor(after) if after else ('', 0)
+        upper = decode_cursor(before) if before else (self.MAX_TIMESTAMP, 0)
+        bounds = (session_id, start or '', end or self.MAX_TIMESTAMP)
+
+        self.flush()
+        connection = self._connection()
+        forward = bool(after or start)
+        sql = self.PAGE_FORWARD_SQL if forward else self.PAGE_BACKWARD_SQL
+        rows = connection.execute(sql, bounds + lower + upper + (limit,)).fetchall()
+        if not forward:
+            rows.reverse()
+        if not rows:
+            return {'entries': [], 'next': None, 'prev': None}
+
+        first = (rows[0][2], rows[0][0])
+        last = (rows[-1][2], rows[-1][0])
+        has_prev = connection.execute(self.PAGE_BACKWARD_SQL, bounds + ('', 0) + first + (1,)).fetchone()
+        has_next = connection.execute(
+            self.PAGE_FORWARD_SQL, bounds + last + (self.MAX_TIMESTAMP, 0) + (1,)
+        ).fetchone()
+        return {
+            'entries': [self._entry(row[1:]) for row in rows],
+            'next': encode_cursor(*last) if has_next else None,
+            'prev': encode_cursor(*first) if has_prev else None
+        }
+
+    def session_usage(self, session_id: str) -> Tuple[Optional[str], int]:
+        """Newest timestamp and approximate stored bytes of a session, from one indexed query."""
+        self.flush()
+        newest, size = self._connection().execute(self.USAGE_SQL, (session_id,)).fetchone()
+        return newest, size or 0
+
+    def session_ids(self) -> List[str]:
+        """Identifiers of the sessions with stored history."""
+        self.flush()
+        rows = self._connection().execute("SELECT DISTINCT session_id FROM history").fetchall()
+        return [row[0] for row in rows]
+
+    def _iter_cursor(self, cursor: sqlite3.Cursor) -> Iterator[Dict]:
+        try:
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield self._entry(row)
+        finally:
+            cursor.close()
+
+    def clear_session(self, session_id: str):
+        """Delete the stored history of a session."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if rows:
+                    self._insert_rows(conn, rows)
+                conn.execute(self.DELETE_SESSION_SQL, (session_id,))
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+
+    def import_legacy(self, legacy_file: str) -> int:
+        """
+        Import a single-file JSON history once, then rename it to <file>.migrated.
+
+        The import runs in one write transaction and is recorded in the
+        migrations table, so concurrent worker processes import it only once.
+
+        Args:
+            legacy_file: Path of the JSON history file
+
+        Returns:
+            Number of imported entries
+        """
+        name = 'legacy:' + os.path.abspath(legacy_file)
+        imported = 0
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                done = conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone()
+                if not done and os.path.exists(legacy_file):
+                    rows = [
+                        self._row(session.get('session_id'), entry)
+                        for session in read_legacy_history(legacy_file)
+                        for entry in session.get('messages', [])[-self.max_entries:]
+                    ]
+                    conn.executemany(self.INSERT_SQL, rows)
+                    conn.execute("INSERT INTO migrations VALUES (?, ?)", (name, time.time()))
+                    imported = len(rows)
+                conn.execute("COMMIT")
+            except (sqlite3.Error, OSError, ValueError) as e:
+                conn.execute("ROLLBACK")
+                print(f"Error migrating history: {e}")
+                return 0
+
+        if imported and os.path.exists(legacy_file):
+            os.replace(legacy_file, legacy_file + '.migrated')
+        return imported
+
+    def close(self):
+        """Insert buffered appends and close every connection."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get database statistics.
+
+        Returns:
+            Dictionary with row and session counts, file size and write counters
+        """
+        self.flush()
+        rows, sessions = self._connection().execute(
+            "SELECT COUNT(*), COUNT(DISTINCT session_id) FROM history"
+        ).fetchone()
+        return {
+            'rows': rows,
+            'sessions': sessions,
+            'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            'rows_written': self.rows_written,
+            'batches_written': self.batches_written
+        }
+
+
+class ShardedHistoryStore(HistoryStore):
+    """
+    One append-only JSON-lines file per session, safe for several processes.
+
+    Shards live in directory/<xx>/<session>.jsonl, where <xx> is a hash
+    prefix that keeps directories small. Appending takes an exclusive
+    advisory lock on that session's shard only, so worker processes
+    serving different sessions never wait for each other and there is no
+    global lock around every message. Readers take no lock: records are
+    whole lines and a torn final line is skipped.
+
+    Once a shard grows past shard_max_bytes it is trimmed to the last
+    max_entries entries: the trimmed copy is written to a temporary file
+    and renamed over the shard while the lock is held. Clearing a session
+    unlinks its shard. A writer that was waiting on the lock of a replaced
+    or removed file notices the inode change and reopens the path, so no
+    append lands in a file that is no longer visible.
+
+    Records are written with the os write call: 'always' fsyncs each
+    append, 'interval' fsyncs the shards written since the last run every
+    fsync_interval_ms, and 'os' leaves syncing to the operating system.
+    """
+
+    def __init__(self, directory: str = HISTORY_SHARD_DIR, fsync_policy: str = HISTORY_FSYNC,
+                 fsync_interval_ms: int = HISTORY_FSYNC_INTERVAL_MS,
+                 shard_max_bytes: int = HISTORY_SHARD_MAX_BYTES,
+                 max_entries: int = MAX_HISTORY_ENTRIES,
+                 legacy_file: Optional[str] = HISTORY_FILE):
+        """
+        Open (or create) a shard directory.
+
+        Args:
+            directory: Directory holding the shard files
+            fsync_policy: One of FSYNC_POLICIES
+            fsync_interval_ms: Maximum time between fsyncs for 'interval'
+            shard_max_bytes: Shard size that triggers trimming
+            max_entries: Entries kept per session by trimming and loads
+            legacy_file: Single-file JSON history imported when present
+                (renamed to <file>.migrated afterwards)
+        """
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.shard_max_bytes = shard_max_bytes
+        self.max_entries = max_entries
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._dirty: set = set()
+        self._dirty_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._syncer: Optional[threading.Thread] = None
+
+        self.appends = 0
+        self.trims = 0
+        self.lock_retries = 0
+        self.fsyncs = 0
+
+        if legacy_file:
+            # Several workers may start at once: one imports, the rest wait
+            with file_lock(os.path.join(directory, 'LOCK')):
+                if os.path.exists(legacy_file):
+                    self._migrate_legacy(legacy_file)
+
+        if fsync_policy == 'interval':
+            self._syncer = threading.Thread(target=self._run_syncer, name='history-syncer', daemon=True)
+            self._syncer.start()
+
+    def shard_path(self, session_id: str) -> str:
+        """Path of the shard file of a session."""
+        digest = hashlib.sha1(session_id.encode('utf-8')).hexdigest()
+        name = quote(session_id, safe='')
+        if not name or name.startswith('.') or len(name) > 200:
+            # Unusable as a file name: the id is read back from the records
+            name = '~' + digest
+        return os.path.join(self.directory, digest[:2], name + '.jsonl')
+
+    def _migrate_legacy(self, legacy_file: str):
+        """Import a single-file JSON history, one shard per session."""
+        try:
+            sessions = read_legacy_history(legacy_file)
+        except (OSError, ValueError) as e:
+            print(f"Error migrating history: {e}")
+            return
+        for session in sessions:
+            session_id = session.get('session_id')
+            path = self.shard_path(session_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = b''.join(
+                _encode_record(dict(message, session_id=session_id))
+                for message in session.get('messages', [])[-self.max_entries:]
+            )
+            write_file_atomic(path, data)
+        os.replace(legacy_file, legacy_file + '.migrated')
+
+    def _open_locked(self, path: str, create: bool) -> Optional[int]:
+        """
+        Open a shard and lock it, retrying if it is replaced or removed meanwhile.
+
+        Returns:
+            Locked file descriptor, or None if the shard does not exist and
+            create is False
+        """
+        flags = os.O_RDWR | os.O_APPEND | (os.O_CREAT if create else 0)
+        while True:
+            try:
+                fd = os.open(path, flags, 0o644)
+            except FileNotFoundError:
+                if not create:
+                    return None
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                continue
+            if fcntl is None:
+                return fd
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                opened = os.fstat(fd)
+                current = os.stat(path)
+                if (opened.st_ino, opened.st_dev) == (current.st_ino, current.st_dev):
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+            self.lock_retries += 1
+
+    def append(self, session_id: str, entry: Dict):
+        """
+        Append one message exchange to the session's shard.
+
+        Args:
+            session_id: Session identifier
+            entry: History entry (timestamp, messages, intent, entities)
+        """
+        if entry.get('session_id') != session_id:
+            entry = dict(entry, session_id=session_id)
+        line = _encode_record(entry)
+        path = self.shard_path(session_id)
+
+        fd = self._open_locked(path, create=True)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b'\n':
+                # A crash tore the last record: keep this one on its own line
+                line = b'\n' + line
+            view = memoryview(line)
+            while view:
+                view = view[os.write(fd, view):]
+            if self.fsync_policy == 'always':
+                os.fsync(fd)
+                self.fsyncs += 1
+                if not size:
+                    fsync_directory(os.path.dirname(path))
+            if size + len(line) > self.shard_max_bytes:
+                self._trim(path)
+        finally:
+            os.close(fd)
+
+        self.appends += 1
+        if self.fsync_policy == 'interval':
+            with self._dirty_lock:
+                self._dirty.add(path)
+
+    def _trim(self, path: str):
+        """Rewrite a shard with its last max_entries records (caller holds its lock)."""
+        lines = list(self._read_lines(path))
+        data = b''.join(lines[-self.max_entries:])
+        write_file_atomic(path, data, sync=self.fsync_policy != 'os')
+        self.trims += 1
+
+    def _run_syncer(self):
+        """Fsync the shards written since the last run, every fsync_interval."""
+        while not self._stop.wait(self.fsync_interval):
+            self._sync_dirty()
+
+    def _sync_dirty(self):
+        with self._dirty_lock:
+            paths, self._dirty = self._dirty, set()
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+                self.fsyncs += 1
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _read_lines(path: str) -> Iterator[bytes]:
+        """Yield the complete lines of a shard (a torn final line is skipped)."""
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    if line.endswith(b'\n'):
+                        yield line
+        except FileNotFoundError:
+            return
+
+    @staticmethod
+    def _decode(lines: Iterable[bytes]) -> Iterator[Dict]:
+        """Decode shard lines, skipping any damaged by a crash."""
+        for line in lines:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+    @staticmethod
+    def _tail_lines(path: str, count: int) -> List[bytes]:
+        """Read the last `count` complete lines of a shard, starting from its end."""
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return []
+        with f:
+            position = f.seek(0, os.SEEK_END)
+            data = b''
+            while position > 0 and data.count(b'\n') <= count:
+                step = min(65536, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+        lines = data.split(b'\n')
+        lines.pop()  # Empty, or a torn final line
+        if position > 0:
+            lines = lines[1:]  # Starts mid-record
+        return [line + b'\n' for line in lines[-count:]]
+
+    def session_view(self, session_id: str) -> SessionView:
+        """View of a session that decodes lines of its shard as they are accessed."""
+        try:
+            with open(self.shard_path(session_id), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+        return _ShardSessionView(data)
+
+    def session_usage(self, session_id: str) -> Tuple[Optional[str], int]:
+        """Newest timestamp (from the shard's last line) and size of a session's shard."""
+        path = self.shard_path(session_id)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return None, 0
+        newest = next(self._decode(self._tail_lines(path, 1)), {})
+        return newest.get('timestamp'), size
+
+    def load_session(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Return the last `limit` (default max_entries) entries of a session."""
+        lines = self._tail_lines(self.shard_path(session_id), limit or self.max_entries)
+        return list(self._decode(lines))
+
+    def iter_session(self, session_id: str) -> Iterator[Dict]:
+        """Stream every stored entry of a session, oldest first."""
+        return self._decode(self._read_lines(self.shard_path(session_id)))
+
+    def _shard_files(self) -> Iterator[str]:
+        """Paths of every shard file."""
+        try:
+            prefixes = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return
+        for prefix in prefixes:
+            folder = os.path.join(self.directory, prefix)
+            if len(prefix) != 2 or not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                if name.endswith('.jsonl'):
+                    yield os.path.join(folder, name)
+
+    def session_ids(self) -> List[str]:
+        """Identifiers of the sessions with stored history."""
+        session_ids = []
+        for path in self._shard_files():
+            name = os.path.basename(path)[:-len('.jsonl')]
+            if name.startswith('~'):
+                first = next(self._decode(self._read_lines(path)), None)
+                if first is None or 'session_id' not in first:
+                    continue
+                session_ids.append(first['session_id'])
+            else:
+                session_ids.append(unquote(name))
+        return session_ids
+
+    def clear_session(self, session_id: str):
+        """Delete a session's shard."""
+        path = self.shard_path(session_id)
+        fd = self._open_locked(path, create=False)
+        if fd is None:
+            return
+        try:
+            os.unlink(path)
+        finally:
+            os.close(fd)
+
+    def flush(self):
+        """Fsync shards written since the last interval sync."""
+        if self.fsync_policy == 'interval':
+            self._sync_dirty()
+
+    def close(self):
+        """Stop the interval syncer and sync what it had pending."""
+        self._stop.set()
+        if self._syncer is not None:
+            self._syncer.join()
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get storage statistics.
+
+        Returns:
+            Dictionary with session count and size, and this process's
+            append, trim, lock retry and fsync counters
+        """
+        sessions = 0
+        size = 0
+        for path in self._shard_files():
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                continue
+            sessions += 1
+        return {
+            'sessions': sessions,
+            'bytes': size,
+            'appends': self.appends,
+            'trims': self.trims,
+            'lock_retries': self.lock_retries,
+            'fsyncs': self.fsyncs
+        }
+
+
+class _ShardSessionView(SessionView):
+    """
+    Session view over the bytes of one shard.
+
+    Shards are bounded by trimming, so the file is read in one call; lines
+    are only decoded when the search or the page touches them.
+    """
+
+    def __init__(self, data: bytes):
+        super().__init__()
+        self._data = data
+        self._starts = array('L', [0])
+        position = data.find(b'\n')
+        while position != -1:
+            self._starts.append(position + 1)
+            position = data.find(b'\n', position + 1)
+        self._decoded: Dict[int, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._starts) - 1
+
+    def entry(self, index: int) -> Dict:
+        entry = self._decoded.get(index)
+        if entry is None:
+            line = self._data[self._starts[index]:self._starts[index + 1]]
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = {}  # Damaged by a crash
+            self._decoded[index] = entry
+        return entry
+
+
+def create_history_store(backend: str = HISTORY_BACKEND) -> HistoryStore:
+    """
+    Create a history store for a backend name.
+
+    With ENABLE_HISTORY_ARCHIVE the jsonl store is wrapped in a
+    TieredHistoryStore (see history_archive.py) that archives idle sessions
+    in the background. The other backends can be shared by several worker
+    processes, whose archive catalogs and archiving locks would be private
+    to each process, so they are not wrapped and archiving is reported
+    as inactive.
+
+    The jsonl backend belongs to one process. If another process (e.g.
+    another prefork worker) already owns its directory, this raises
+    rather than switching backends, which would split each session's
+    history between two stores depending on the worker that served it.
+
+    Args:
+        backend: "jsonl", "sharded", "sqlite" or "json"
+
+    Returns:
+        New HistoryStore
+
+    Raises:
+        RuntimeError: If the jsonl directory is in use by another process
+    """
+    if ENABLE_HISTORY_ARCHIVE and backend in ('sharded', 'sqlite', 'json'):
+        print(f"Error: history archiving needs the jsonl backend; it is inactive with {backend}")
+    if backend == 'sqlite':
+        return SQLiteHistoryStore()
+    if backend == 'json':
+        return JSONFileHistoryStore()
+    if backend == 'sharded':
+        return ShardedHistoryStore()
+    if backend != 'jsonl':
+        raise ValueError(f"Unknown history backend: {backend}")
+
+    store = JSONLHistoryStore()
+    if ENABLE_HISTORY_ARCHIVE:
+        # Imported here: the archive module builds on this one
+        from history_archive import TieredHistoryStore
+        store = TieredHistoryStore(store)
+        store.start_archiver()
+    return store
+
+
+_shared_store: Optional[HistoryStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """
+    Get the process-wide history store for HISTORY_BACKEND.
+
+    The store is closed at interpreter exit so queued records are written.
+
+    Returns:
+        Shared HistoryStore instance
+    """
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = create_history_store()
+                atexit.register(_shared_store.close)
+    return _shared_store
+
+
+def main():
+    """Migrate a single-file JSON history into a history backend."""
+    parser = argparse.ArgumentParser(description="Conversation history storage tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate = subparsers.add_parser('migrate', help="Import a JSON history file")
+    migrate.add_argument('--source', default=HISTORY_FILE, help="JSON history file")
+    migrate.add_argument('--backend', default=HISTORY_BACKEND, choices=('jsonl', 'sharded', 'sqlite'))
+    args = parser.parse_args()
+
+    if args.backend == 'sqlite':
+        store = SQLiteHistoryStore(legacy_file=None)
+        count, unit = store.import_legacy(args.source), 'entries'
+        store.close()
+    elif args.backend == 'sharded':
+        store = ShardedHistoryStore(legacy_file=args.source)
+        store.close()
+        count, unit = len(store.session_ids()), 'sessions'
+    else:
+        store = JSONLHistoryStore(legacy_file=args.source)
+        store.close()
+        count, unit = len(store.segment_numbers()), 'segments'
+    print(f"Migrated {args.source} into the {args.backend} history store ({count} {unit})")
+
+
+if __name__ == "__main__":
+    main()
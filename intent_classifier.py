@@ -0,0 +1,373 @@
+"""
+Intent Classifier Module
+Trainable TF-IDF + logistic regression intent model with a persisted artifact.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Dict, List, Tuple, Optional, Iterable
+from collections import Counter
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+from file_utils import file_lock, write_file_atomic
+
+
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+ARTIFACT_VERSION = 1
+CURRENT_FILE = 'CURRENT'  # Names the published version directory of an artifact
+KEEP_VERSIONS = 2  # Published versions kept, so readers of the previous one can finish
+LOAD_ATTEMPTS = 3
+
+
+def analyze_utterance(text: str, ngram_range: Tuple[int, int] = (1, 2)) -> List[str]:
+    """
+    Turn an utterance into word n-gram features.
+
+    Used both to train the scikit-learn vectorizer and at inference time,
+    so the persisted vocabulary always lines up with runtime features.
+
+    Args:
+        text: Input text
+        ngram_range: Minimum and maximum n-gram length
+
+    Returns:
+        List of n-gram terms
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    min_n, max_n = ngram_range
+    terms = []
+    for n in range(min_n, max_n + 1):
+        for i in range(len(tokens) - n + 1):
+            terms.append(' '.join(tokens[i:i + n]))
+    return terms
+
+
+def seed_examples(intent_patterns: Dict[str, Dict]) -> Tuple[List[str], List[str]]:
+    """
+    Build labeled training utterances from an intent pattern table.
+
+    Args:
+        intent_patterns: Mapping of intent name to keywords and patterns
+
+    Returns:
+        Tuple of (utterances, labels)
+    """
+    texts = []
+    labels = []
+    for intent_name, intent_data in intent_patterns.items():
+        if intent_name == 'unknown':
+            continue
+        for keyword in intent_data.get('keywords', []):
+            texts.append(keyword)
+            labels.append(intent_name)
+    return texts, labels
+
+
+def artifact_dir(path: str) -> Optional[str]:
+    """
+    Directory holding the currently published files of an artifact.
+
+    Args:
+        path: Artifact directory
+
+    Returns:
+        Published version directory, the artifact directory itself for
+        artifacts written before versioning, or None if nothing is published
+    """
+    try:
+        with open(os.path.join(path, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        pass
+    if os.path.exists(os.path.join(path, 'vocabulary.json')):
+        return path
+    return None
+
+
+def _version_number(name: str) -> int:
+    """Number of a version directory name ('v12' -> 12; -1 for other names)."""
+    if name.startswith('v') and name[1:].isdigit():
+        return int(name[1:])
+    return -1
+
+
+class IntentClassifier:
+    """
+    Linear intent classifier over TF-IDF features.
+
+    Training needs scikit-learn; inference only needs NumPy and reads the
+    weight matrix from a memory-mapped artifact, so the model is shared
+    through the page cache by every worker process.
+    """
+
+    def __init__(self):
+        """Initialize an empty (untrained) classifier."""
+        self.classes: List[str] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.ngram_range: Tuple[int, int] = (1, 2)
+        self.idf: Optional[np.ndarray] = None
+        self.weights: Optional[np.ndarray] = None  # terms x classes
+        self.intercept: Optional[np.ndarray] = None
+
+    @property
+    def is_trained(self) -> bool:
+        """Whether the classifier has weights loaded."""
+        return self.weights is not None
+
+    def train(self, texts: List[str], labels: List[str], regularization: float = 10.0):
+        """
+        Fit the TF-IDF vectorizer and logistic regression model.
+
+        Args:
+            texts: Training utterances
+            labels: Intent label for each utterance
+            regularization: Inverse regularization strength (C)
+        """
+        try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.linear_model import LogisticRegression
+        except ImportError as e:
+            raise ImportError("Training the intent classifier requires scikit-learn") from e
+
+        ngram_range = self.ngram_range
+        vectorizer = TfidfVectorizer(analyzer=lambda text: analyze_utterance(text, ngram_range))
+        features = vectorizer.fit_transform(texts)
+
+        model = LogisticRegression(C=regularization, max_iter=1000)
+        model.fit(features, labels)
+
+        terms = vectorizer.get_feature_names_out()
+        self.vocabulary = {term: index for index, term in enumerate(terms)}
+        self.idf = np.asarray(vectorizer.idf_, dtype=np.float64)
+        self.classes = [str(label) for label in model.classes_]
+
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        intercept = np.asarray(model.intercept_, dtype=np.float64)
+        if len(self.classes) == 2:
+            # Binary models expose one decision function; softmax over
+            # [0, d] reproduces the logistic probability of class 1
+            coef = np.vstack([np.zeros_like(coef[0]), coef[0]])
+            intercept = np.array([0.0, intercept[0]])
+
+        self.weights = np.ascontiguousarray(coef.T)
+        self.intercept = intercept
+
+    def save(self, path: str):
+        """
+        Publish the model artifact to a directory.
+
+        Each save writes a new version directory (v1, v2, ...) inside the
+        artifact directory and then atomically replaces the CURRENT file
+        that names it, so readers always find a complete artifact. Saves
+        from several processes are serialized with a file lock.
+
+        Args:
+            path: Artifact directory
+        """
+        if not self.is_trained:
+            raise ValueError("Cannot save an untrained intent classifier")
+
+        os.makedirs(path, exist_ok=True)
+        with file_lock(path + '.lock'):
+            self._publish(path)
+
+    def _publish(self, path: str):
+        """Write and publish a new artifact version (caller holds the artifact lock)."""
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=path)
+
+        terms = [None] * len(self.vocabulary)
+        for term, index in self.vocabulary.items():
+            terms[index] = term
+
+        with open(os.path.join(staging, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': ARTIFACT_VERSION,
+                'classes': self.classes,
+                'ngram_range': list(self.ngram_range),
+                'terms': terms
+            }, f, ensure_ascii=False)
+        np.save(os.path.join(staging, 'idf.npy'), self.idf)
+        np.save(os.path.join(staging, 'weights.npy'), self.weights)
+        np.save(os.path.join(staging, 'intercept.npy'), self.intercept)
+
+        names = os.listdir(path)
+        number = max([_version_number(name) for name in names] + [0]) + 1
+        version = f'v{number}'
+        os.rename(staging, os.path.join(path, version))
+        write_file_atomic(os.path.join(path, CURRENT_FILE), version.encode('utf-8'))
+
+        # Old versions, files of a pre-versioning artifact and staging
+        # directories left by crashed writers are no longer read
+        for name in names:
+            target = os.path.join(path, name)
+            old_version = 0 <= _version_number(name) <= number - KEEP_VERSIONS
+            if name.endswith('.npy') or name == 'vocabulary.json':
+                os.remove(target)
+            elif old_version or (name.startswith('.staging-') and target != staging):
+                shutil.rmtree(target, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str) -> 'IntentClassifier':
+        """
+        Load the published model artifact, memory-mapping its weight matrix.
+
+        Args:
+            path: Artifact directory
+
+        Returns:
+            Loaded classifier
+
+        Raises:
+            FileNotFoundError: If no artifact is published
+        """
+        for attempt in range(LOAD_ATTEMPTS):
+            directory = artifact_dir(path)
+            if directory is None:
+                raise FileNotFoundError(f"No intent model published at {path}")
+            try:
+                return cls._load_version(directory)
+            except FileNotFoundError:
+                # The version was retired by newer saves while it was being read
+                if attempt == LOAD_ATTEMPTS - 1:
+                    raise
+
+    @classmethod
+    def _load_version(cls, path: str) -> 'IntentClassifier':
+        """Load the files of one artifact version."""
+        with open(os.path.join(path, 'vocabulary.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported intent model version: {meta.get('version')}")
+
+        classifier = cls()
+        classifier.classes = meta['classes']
+        classifier.ngram_range = tuple(meta['ngram_range'])
+        classifier.vocabulary = {term: index for index, term in enumerate(meta['terms'])}
+        classifier.idf = np.load(os.path.join(path, 'idf.npy'), mmap_mode='r')
+        classifier.weights = np.load(os.path.join(path, 'weights.npy'), mmap_mode='r')
+        classifier.intercept = np.load(os.path.join(path, 'intercept.npy'))
+        return classifier
+
+    @classmethod
+    def load_or_train(cls, path: str, intent_patterns: Dict[str, Dict],
+                      texts: Iterable[str] = (), labels: Iterable[str] = ()) -> 'IntentClassifier':
+        """
+        Load the artifact at path, training and saving it first if missing.
+
+        Training happens under the artifact lock, so when several workers
+        start at once only the first one trains and the others load its
+        artifact.
+
+        Args:
+            path: Artifact directory
+            intent_patterns: Intent table whose keywords seed the training set
+            texts: Additional labeled utterances
+            labels: Labels for the additional utterances
+
+        Returns:
+            Loaded classifier
+        """
+        if artifact_dir(path) is None:
+            os.makedirs(path, exist_ok=True)
+            with file_lock(path + '.lock'):
+                if artifact_dir(path) is None:
+                    seed_texts, seed_labels = seed_examples(intent_patterns)
+                    classifier = cls()
+                    classifier.train(seed_texts + list(texts), seed_labels + list(labels))
+                    classifier._publish(path)
+        return cls.load(path)
+
+    def _features(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (term indices, l2-normalized tf-idf values) for a text."""
+        vocabulary = self.vocabulary
+        counts = Counter()
+        for term in analyze_utterance(text, self.ngram_range):
+            index = vocabulary.get(term)
+            if index is not None:
+                counts[index] += 1
+
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if len(indices):
+            values *= self.idf[indices]
+            values /= np.sqrt(np.dot(values, values))
+        return indices, values
+
+    def _best(self, logits: np.ndarray) -> Tuple[str, float]:
+        """Pick the most probable class from one row of logits."""
+        logits = logits - logits.max()
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum()
+        best = int(np.argmax(probabilities))
+        return self.classes[best], float(probabilities[best])
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Predict the intent of a text.
+
+        Args:
+            text: Input text
+
+        Returns:
+            Tuple of (intent_name, confidence_score); confidence is the
+            predicted class probability
+        """
+        if not text or not text.strip():
+            return 'unknown', 0.0
+
+        indices, values = self._features(text)
+        if not len(indices):
+            return 'unknown', 0.0
+
+        # Sparse dot product: only the weight rows of present terms are read
+        return self._best(values @ self.weights[indices] + self.intercept)
+
+    def predict_batch(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """
+        Predict intents for many texts with one sparse matrix product.
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            List of (intent_name, confidence_score) in input order
+        """
+        rows = []
+        columns = []
+        values = []
+        for row, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            indices, weights = self._features(text)
+            rows.extend([row] * len(indices))
+            columns.extend(indices.tolist())
+            values.extend(weights.tolist())
+
+        logits = np.zeros((len(texts), len(self.classes)), dtype=np.float64)
+        if rows:
+            rows = np.asarray(rows, dtype=np.int64)
+            columns = np.asarray(columns, dtype=np.int64)
+            values = np.asarray(values, dtype=np.float64)
+            np.add.at(logits, rows, values[:, None] * self.weights[columns])
+
+        has_features = np.zeros(len(texts), dtype=bool)
+        if len(rows):
+            has_features[rows] = True
+
+        results = []
+        for row in range(len(texts)):
+            if has_features[row]:
+                results.append(self._best(logits[row] + self.intercept))
+            else:
+                results.append(('unknown', 0.0))
+        return results
@@ -9,18 +9,365 @@ Phone: +91 93305 39277
 Year: 2026
 """
 
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Set, Union
 from collections import Counter
 import re
 
+import numpy as np
+
+from keyword_automaton import KeywordAutomaton
+from message_preprocessor import AnalyzedMessage, normalize_text
+from regex_guard import chunked_search
+from config import INTENT_BACKEND, INTENT_MODEL_PATH
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+
+def required_literals(pattern: str) -> Optional[List[str]]:
+    """
+    Find lowercase literals of which every match of a pattern contains one.
+    
+    Args:
+        pattern: Regular expression (matched case-insensitively)
+        
+    Returns:
+        Alternative literals, or None if no safe literal set could be derived
+    """
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+    except (re.error, TypeError):
+        return None
+    
+    def better(candidate, current):
+        if candidate is None:
+            return current
+        if current is None:
+            return candidate
+        candidate_key = (min(map(len, candidate)), -len(candidate))
+        current_key = (min(map(len, current)), -len(current))
+        return candidate if candidate_key > current_key else current
+    
+    def sequence(items):
+        best = None
+        run = []
+        for op, value in items:
+            char = chr(value) if op is sre_constants.LITERAL else ''
+            # Only characters that lowercasing leaves alone can be looked up
+            # in the lowercased message without changing the outcome
+            if char and char.isascii() and char.lower() == char:
+                run.append(char)
+                continue
+            if run:
+                best = better([''.join(run)], best)
+                run = []
+            if op is sre_constants.SUBPATTERN:
+                best = better(sequence(value[-1]), best)
+            elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and value[0] >= 1:
+                best = better(sequence(value[2]), best)
+            elif op is sre_constants.BRANCH:
+                alternatives = []
+                for branch in value[1]:
+                    branch_literals = sequence(branch)
+                    if branch_literals is None:
+                        alternatives = None
+                        break
+                    alternatives.extend(branch_literals)
+                if alternatives:
+                    best = better(sorted(set(alternatives)), best)
+        if run:
+            best = better([''.join(run)], best)
+        return best
+    
+    return sequence(parsed)
+
+
+class IntentEngine:
+    """
+    Compiled form of an intent pattern table.
+    
+    Keywords, together with a literal that every regular expression
+    requires, live in one Aho-Corasick automaton, so a message is scanned
+    once no matter how many intents are defined. Only the expressions whose
+    required literal was seen in that scan are then confirmed.
+    """
+    
+    def __init__(self, intent_patterns: Dict[str, Dict]):
+        """
+        Compile an intent pattern table.
+        
+        Args:
+            intent_patterns: Mapping of intent name to keywords, patterns
+                and base confidence (see IntentRecognizer.intent_patterns)
+        """
+        self.intent_names: List[str] = []
+        self.keyword_counts: List[int] = []
+        self.pattern_counts: List[int] = []
+        self.confidences: List[float] = []
+        
+        keywords: List[str] = []
+        keyword_owners: List[int] = []
+        self.patterns: List[str] = []
+        self.pattern_owners: List[int] = []
+        
+        for intent_name, intent_data in intent_patterns.items():
+            if intent_name == 'unknown':
+                continue
+            
+            intent_index = len(self.intent_names)
+            intent_keywords = intent_data.get('keywords', [])
+            intent_regexes = intent_data.get('patterns', [])
+            
+            self.intent_names.append(intent_name)
+            self.keyword_counts.append(len(intent_keywords))
+            self.pattern_counts.append(len(intent_regexes))
+            self.confidences.append(intent_data.get('confidence', 0.5))
+            
+            for keyword in intent_keywords:
+                keywords.append(keyword)
+                keyword_owners.append(intent_index)
+            for pattern in intent_regexes:
+                self.patterns.append(pattern)
+                self.pattern_owners.append(intent_index)
+        
+        # Identifies the compiled table, e.g. for caching recognition results
+        self.fingerprint = hash(repr(intent_patterns))
+        
+        self.regexes = [re.compile(pattern, re.IGNORECASE) for pattern in self.patterns]
+        literal_sets = [required_literals(pattern) for pattern in self.patterns]
+        
+        self.automaton = KeywordAutomaton(
+            keywords + [literal for literals in literal_sets if literals for literal in literals]
+        )
+        needle_count = len(self.automaton)
+        
+        # A keyword may be listed by several intents (or twice by one), and
+        # every listing counts towards that intent's score
+        self.keyword_targets: List[List[int]] = [[] for _ in range(needle_count)]
+        for keyword, owner in zip(keywords, keyword_owners):
+            keyword_id = self.automaton.keyword_id(keyword)
+            if keyword_id >= 0:
+                self.keyword_targets[keyword_id].append(owner)
+        
+        self.literal_targets: List[List[int]] = [[] for _ in range(needle_count)]
+        self.unfiltered_patterns: List[int] = []
+        for pattern_index, literals in enumerate(literal_sets):
+            if literals:
+                for literal in literals:
+                    self.literal_targets[self.automaton.keyword_id(literal)].append(pattern_index)
+            else:
+                self.unfiltered_patterns.append(pattern_index)
+        
+        self._feature_weights = None
+    
+    def feature_weights(self):
+        """
+        Sparse feature x intent count matrix used by score_batch.
+        
+        Features are automaton needles followed by regex patterns. Columns
+        0..I-1 count keyword listings per intent and columns I..2I-1 count
+        patterns per intent, so one product yields both match counts.
+        
+        Returns:
+            Tuple of (indptr, columns, values) in CSR layout
+        """
+        if self._feature_weights is None:
+            intent_count = len(self.intent_names)
+            rows = [self.keyword_targets[needle] for needle in range(len(self.automaton))]
+            rows += [[intent_count + owner] for owner in self.pattern_owners]
+            
+            indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+            columns = []
+            values = []
+            for feature, targets in enumerate(rows):
+                counts = Counter(targets)
+                columns.extend(counts.keys())
+                values.extend(counts.values())
+                indptr[feature + 1] = indptr[feature] + len(counts)
+            
+            self._feature_weights = (
+                indptr,
+                np.asarray(columns, dtype=np.int64),
+                np.asarray(values, dtype=np.float64),
+            )
+        return self._feature_weights
+    
+    def scan(self, text_lower: str) -> Tuple[Set[int], Set[int]]:
+        """
+        Find the keywords and patterns present in a message.
+        
+        Args:
+            text_lower: Normalized message text (see normalize_text)
+            
+        Returns:
+            Tuple of (matched keyword ids, matched pattern ids)
+        """
+        needle_ids = self.automaton.find(text_lower)
+        keyword_ids = {needle for needle in needle_ids if self.keyword_targets[needle]}
+        
+        candidates = set(self.unfiltered_patterns)
+        for needle in needle_ids:
+            candidates.update(self.literal_targets[needle])
+        
+        regexes = self.regexes
+        pattern_ids = {index for index in candidates if chunked_search(regexes[index], text_lower)}
+        
+        return keyword_ids, pattern_ids
+    
+    def score(self, text_lower: str) -> Tuple[str, float]:
+        """
+        Score every intent against a message in one pass.
+        
+        Args:
+            text_lower: Normalized message text (see normalize_text)
+            
+        Returns:
+            Tuple of (intent_name, confidence_score)
+        """
+        keyword_ids, pattern_ids = self.scan(text_lower)
+        if not keyword_ids and not pattern_ids:
+            return 'unknown', 0.0
+        
+        keyword_matches = Counter()
+        for keyword_id in keyword_ids:
+            keyword_matches.update(self.keyword_targets[keyword_id])
+        pattern_matches = Counter(self.pattern_owners[index] for index in pattern_ids)
+        
+        best_intent = None
+        best_score = 0.0
+        for intent_index in sorted(set(keyword_matches) | set(pattern_matches)):
+            base_confidence = self.confidences[intent_index]
+            score = 0.0
+            
+            matches = keyword_matches[intent_index]
+            if matches > 0:
+                score += (matches / self.keyword_counts[intent_index]) * base_confidence
+            
+            matches = pattern_matches[intent_index]
+            if matches > 0:
+                score += (matches / self.pattern_counts[intent_index]) * base_confidence
+            
+            score = min(score, 1.0)
+            if best_intent is None or score > best_score:
+                best_intent = self.intent_names[intent_index]
+                best_score = score
+        
+        return best_intent, best_score
+    
+    def score_batch(self, texts_lower: List[str], chunk_size: int = 4096) -> List[Tuple[str, float]]:
+        """
+        Score many messages with vectorized intent scoring.
+        
+        Each chunk of messages becomes a sparse message x feature hit
+        matrix that is multiplied by the feature x intent weights, and the
+        per-intent scores are reduced with the same arithmetic as score().
+        
+        Args:
+            texts_lower: Normalized message texts (see normalize_text)
+            chunk_size: Number of distinct messages scored per product
+            
+        Returns:
+            List of (intent_name, confidence_score) in input order
+        """
+        results: List[Tuple[str, float]] = [('unknown', 0.0)] * len(texts_lower)
+        
+        # Logged traffic repeats itself a lot; score each distinct text once
+        positions: Dict[str, List[int]] = {}
+        for position, text in enumerate(texts_lower):
+            if text:
+                positions.setdefault(text, []).append(position)
+        unique_texts = list(positions)
+        if not unique_texts or not self.intent_names:
+            return results
+        
+        indptr, weight_columns, weight_values = self.feature_weights()
+        intent_count = len(self.intent_names)
+        pattern_offset = len(self.automaton)
+        
+        confidences = np.asarray(self.confidences, dtype=np.float64)
+        keyword_totals = np.asarray(self.keyword_counts, dtype=np.float64)
+        pattern_totals = np.asarray(self.pattern_counts, dtype=np.float64)
+        keyword_totals[keyword_totals == 0] = 1.0
+        pattern_totals[pattern_totals == 0] = 1.0
+        
+        for start in range(0, len(unique_texts), chunk_size):
+            chunk = unique_texts[start:start + chunk_size]
+            
+            hit_rows = []
+            hit_features = []
+            for row, text in enumerate(chunk):
+                keyword_ids, pattern_ids = self.scan(text)
+                for keyword_id in keyword_ids:
+                    hit_rows.append(row)
+                    hit_features.append(keyword_id)
+                for pattern_id in pattern_ids:
+                    hit_rows.append(row)
+                    hit_features.append(pattern_offset + pattern_id)
+            
+            counts = np.zeros((len(chunk), 2 * intent_count), dtype=np.float64)
+            if hit_rows:
+                hit_rows = np.asarray(hit_rows, dtype=np.int64)
+                hit_features = np.asarray(hit_features, dtype=np.int64)
+                
+                # Sparse (hits) x sparse (weights) product: expand every hit
+                # into the weight entries of its feature and accumulate
+                lengths = indptr[hit_features + 1] - indptr[hit_features]
+                total = int(lengths.sum())
+                if total:
+                    entry_rows = np.repeat(hit_rows, lengths)
+                    starts = np.repeat(indptr[hit_features], lengths)
+                    within = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                    entries = starts + within
+                    np.add.at(counts, (entry_rows, weight_columns[entries]), weight_values[entries])
+            
+            keyword_matches = counts[:, :intent_count]
+            pattern_matches = counts[:, intent_count:]
+            scores = (
+                np.where(keyword_matches > 0, (keyword_matches / keyword_totals) * confidences, 0.0)
+                + np.where(pattern_matches > 0, (pattern_matches / pattern_totals) * confidences, 0.0)
+            )
+            scores = np.minimum(scores, 1.0)
+            matched = (keyword_matches > 0) | (pattern_matches > 0)
+            scores = np.where(matched, scores, -np.inf)
+            
+            best = np.argmax(scores, axis=1)
+            best_scores = scores[np.arange(len(chunk)), best]
+            has_match = matched.any(axis=1)
+            
+            for row, text in enumerate(chunk):
+                if has_match[row]:
+                    result = (self.intent_names[best[row]], float(best_scores[row]))
+                else:
+                    result = ('unknown', 0.0)
+                for position in positions[text]:
+                    results[position] = result
+        
+        return results
+
 
 class IntentRecognizer:
     """
     Recognizes user intentions from natural language text.
     """
     
-    def __init__(self):
-        """Initialize the intent recognizer with predefined patterns."""
+    def __init__(self, backend: Optional[str] = None, model_path: Optional[str] = None,
+                 intent_patterns: Optional[Dict[str, Dict]] = None):
+        """
+        Initialize the intent recognizer with predefined patterns.
+        
+        Args:
+            backend: "rules" or "sklearn" (defaults to INTENT_BACKEND)
+            model_path: Classifier artifact directory (defaults to INTENT_MODEL_PATH)
+            intent_patterns: Custom intent definitions replacing the built-in
+                English ones (same layout as intent_patterns)
+        """
+        self.backend = backend or INTENT_BACKEND
+        self.model_path = model_path or INTENT_MODEL_PATH
+        
         # Intent patterns with keywords and confidence scores
         self.intent_patterns = {
             'greeting': {
@@ -121,54 +468,136 @@ class IntentRecognizer:
                 'confidence': 0.0
             }
         }
+        
+        if intent_patterns is not None:
+            self.intent_patterns = {
+                intent: dict(intent_data) for intent, intent_data in intent_patterns.items()
+            }
+        
+        self._engine: Optional[IntentEngine] = None
+        self._classifier = None
+        self._classifier_loads = 0  # Bumped whenever a model is (re)loaded
     
-    def recognize(self, text: str) -> Tuple[str, float]:
+    def recognize(self, text: Union[str, AnalyzedMessage]) -> Tuple[str, float]:
         """
         Recognize intent from text.
         
         Args:
-            text: Input text to analyze
+            text: Input text (or preprocessed message) to analyze
             
         Returns:
             Tuple of (intent_name, confidence_score)
         """
-        if not text or not text.strip():
+        if isinstance(text, AnalyzedMessage):
+            text_lower = text.normalized
+        else:
+            text_lower = normalize_text(text) if text else ''
+        if not text_lower:
             return 'unknown', 0.0
         
-        text_lower = text.lower().strip()
-        intent_scores = {}
+        classifier = self.classifier
+        if classifier is not None:
+            return classifier.predict(text_lower)
+        return self.engine.score(text_lower)
+    
+    def recognize_batch(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """
+        Recognize intents for many texts at once.
         
-        # Calculate scores for each intent
-        for intent_name, intent_data in self.intent_patterns.items():
-            if intent_name == 'unknown':
-                continue
+        Produces exactly the same results as calling recognize() on each
+        text, but scores them with vectorized matrix operations.
+        
+        Args:
+            texts: Input texts to analyze
             
-            score = 0.0
-            keywords = intent_data.get('keywords', [])
-            patterns = intent_data.get('patterns', [])
-            base_confidence = intent_data.get('confidence', 0.5)
-            
-            # Check keyword matches
-            keyword_matches = sum(1 for keyword in keywords if keyword in text_lower)
-            if keyword_matches > 0:
-                score += (keyword_matches / len(keywords)) * base_confidence
-            
-            # Check pattern matches
-            pattern_matches = sum(1 for pattern in patterns 
-                                if re.search(pattern, text_lower, re.IGNORECASE))
-            if pattern_matches > 0:
-                score += (pattern_matches / len(patterns)) * base_confidence
-            
-            # Normalize score
-            if keyword_matches > 0 or pattern_matches > 0:
-                intent_scores[intent_name] = min(score, 1.0)
-        
-        # Return the intent with highest score
-        if intent_scores:
-            best_intent = max(intent_scores.items(), key=lambda x: x[1])
-            return best_intent[0], best_intent[1]
-        
-        return 'unknown', 0.0
+        Returns:
+            List of (intent_name, confidence_score) in input order
+        """
+        texts_lower = [normalize_text(text) if text else '' for text in texts]
+        classifier = self.classifier
+        if classifier is not None:
+            return classifier.predict_batch(texts_lower)
+        return self.engine.score_batch(texts_lower)
+    
+    @property
+    def engine(self) -> 'IntentEngine':
+        """Compiled matcher for the current intent patterns (built on first use)."""
+        if self._engine is None:
+            self._engine = IntentEngine(self.intent_patterns)
+        return self._engine
+    
+    @property
+    def cache_token(self) -> tuple:
+        """Value that changes whenever recognition results could change."""
+        if self.backend == 'sklearn':
+            return ('sklearn', self.model_path, self._classifier_loads)
+        return ('rules', self.engine.fingerprint)
+    
+    @property
+    def classifier(self):
+        """
+        Trained classifier for the "sklearn" backend, loaded on first use.
+        
+        The artifact is trained from intent_patterns and saved the first
+        time it is missing. Returns None for the "rules" backend, or if no
+        model could be loaded, in which case the rules engine is used.
+        """
+        if self.backend != 'sklearn':
+            return None
+        if self._classifier is None:
+            from intent_classifier import IntentClassifier
+            try:
+                self._classifier = IntentClassifier.load_or_train(
+                    self.model_path, self.intent_patterns
+                )
+                self._classifier_loads += 1
+            except (ImportError, OSError, ValueError) as e:
+                print(f"Error loading intent model, using rules: {e}")
+                self.backend = 'rules'
+                return None
+        return self._classifier
+    
+    def train(self, texts: List[str], labels: List[str]):
+        """
+        Train and save the classifier for the "sklearn" backend.
+        
+        Args:
+            texts: Labeled example utterances (added to keyword seeds)
+            labels: Intent label for each utterance
+        """
+        from intent_classifier import IntentClassifier, seed_examples
+        seed_texts, seed_labels = seed_examples(self.intent_patterns)
+        classifier = IntentClassifier()
+        classifier.train(seed_texts + list(texts), seed_labels + list(labels))
+        classifier.save(self.model_path)
+        self._classifier = IntentClassifier.load(self.model_path)
+        self._classifier_loads += 1
+    
+    def refresh(self):
+        """
+        Discard the compiled matcher so it is rebuilt from intent_patterns.
+        
+        Call this after modifying intent_patterns directly.
+        """
+        self._engine = None
+    
+    def add_intent(self, intent: str, keywords: List[str], patterns: List[str],
+                   confidence: float = 0.5):
+        """
+        Add or replace an intent definition.
+        
+        Args:
+            intent: Intent name
+            keywords: Lowercase keywords that indicate the intent
+            patterns: Regular expressions that indicate the intent
+            confidence: Base confidence score for the intent
+        """
+        self.intent_patterns[intent] = {
+            'keywords': list(keywords),
+            'patterns': list(patterns),
+            'confidence': confidence
+        }
+        self.refresh()
     
     def get_intent_confidence(self, intent: str) -> float:
         """
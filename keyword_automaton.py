@@ -0,0 +1,117 @@
+"""
+Keyword Automaton Module
+Multi-pattern substring matcher (Aho-Corasick) used by the NLU components.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Dict, Iterable, List, Set
+from collections import deque
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton that finds every keyword occurring in a text
+    with a single left-to-right scan, independent of the number of keywords.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        """
+        Build the automaton.
+
+        Args:
+            keywords: Keywords to match; duplicates share one keyword id
+        """
+        self.keywords: List[str] = []
+        self._keyword_ids: Dict[str, int] = {}
+
+        # State 0 is the root; each state has goto edges, a failure link
+        # and the ids of the keywords that end in it
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for keyword in keywords:
+            if not keyword or keyword in self._keyword_ids:
+                continue
+            keyword_id = len(self.keywords)
+            self._keyword_ids[keyword] = keyword_id
+            self.keywords.append(keyword)
+            self._insert(keyword, keyword_id)
+
+        self._build_failure_links()
+
+    def _insert(self, keyword: str, keyword_id: int):
+        """Add a keyword to the trie."""
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append(keyword_id)
+
+    def _build_failure_links(self):
+        """Compute failure links breadth-first and merge outputs."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+
+    def keyword_id(self, keyword: str) -> int:
+        """
+        Get the id assigned to a keyword.
+
+        Args:
+            keyword: Keyword text
+
+        Returns:
+            Keyword id, or -1 if the keyword is unknown
+        """
+        return self._keyword_ids.get(keyword, -1)
+
+    def find(self, text: str) -> Set[int]:
+        """
+        Find the keywords occurring anywhere in text.
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Set of matched keyword ids
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found: Set[int] = set()
+        state = 0
+
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+
+        return found
+
+    def __len__(self) -> int:
+        """Number of distinct keywords."""
+        return len(self.keywords)
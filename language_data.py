@@ -0,0 +1,353 @@
+"""
+Language Resource Data Module
+Intent patterns, sentiment lexicons and response templates for non-English languages.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+# Each bundle mirrors the English resources:
+#   intents         - same layout as IntentRecognizer.intent_patterns
+#   sentiment       - positive / negative / intensifiers / negations word lists
+#   templates       - response templates; missing names fall back to English
+#   entity_patterns - extra entity pattern specs tried before the built-in ones
+#
+# Devanagari vowel signs are not word characters for the re module, so the
+# Hindi patterns are unanchored alternations rather than \b-anchored ones.
+
+LANGUAGE_BUNDLES = {
+    'es': {
+        'intents': {
+            'greeting': {
+                'keywords': ['hola', 'buenos días', 'buenas tardes', 'buenas noches', 'saludos'],
+                'patterns': [r'\b(hola|saludos)\b', r'buen[oa]s\s+(días|tardes|noches)'],
+                'confidence': 0.9
+            },
+            'goodbye': {
+                'keywords': ['adiós', 'hasta luego', 'hasta pronto', 'nos vemos', 'chao'],
+                'patterns': [r'\b(adiós|chao)\b', r'hasta\s+(luego|pronto|mañana)'],
+                'confidence': 0.9
+            },
+            'question': {
+                'keywords': ['qué', 'cuándo', 'dónde', 'quién', 'por qué', 'cómo', 'cuál', 'puedes'],
+                'patterns': [r'^¿', r'\?', r'^(qué|cuándo|dónde|quién|cómo|cuál)'],
+                'confidence': 0.8
+            },
+            'name_introduction': {
+                'keywords': ['me llamo', 'mi nombre es', 'soy'],
+                'patterns': [r'me\s+llamo', r'mi\s+nombre\s+es'],
+                'confidence': 0.85
+            },
+            'name_query': {
+                'keywords': ['cómo me llamo', 'cuál es mi nombre', 'sabes mi nombre'],
+                'patterns': [r'cómo\s+me\s+llamo', r'cuál\s+es\s+mi\s+nombre'],
+                'confidence': 0.9
+            },
+            'help': {
+                'keywords': ['ayuda', 'ayúdame', 'qué puedes hacer'],
+                'patterns': [r'\bayuda\b', r'qué\s+puedes\s+hacer'],
+                'confidence': 0.8
+            },
+            'weather': {
+                'keywords': ['tiempo hace', 'clima', 'temperatura', 'lluvia', 'pronóstico'],
+                'patterns': [r'clima', r'temperatura', r'qué\s+tiempo\s+hace'],
+                'confidence': 0.75
+            },
+            'time': {
+                'keywords': ['qué hora', 'la hora'],
+                'patterns': [r'qué\s+hora'],
+                'confidence': 0.8
+            },
+            'date': {
+                'keywords': ['qué fecha', 'fecha de hoy', 'qué día es'],
+                'patterns': [r'qué\s+fecha', r'qué\s+día\s+es'],
+                'confidence': 0.8
+            },
+            'compliment': {
+                'keywords': ['gracias', 'muchas gracias', 'excelente', 'buen trabajo'],
+                'patterns': [r'\bgracias\b', r'buen\s+trabajo'],
+                'confidence': 0.7
+            },
+        },
+        'sentiment': {
+            'positive': ['bueno', 'buena', 'genial', 'excelente', 'increíble', 'perfecto', 'feliz',
+                         'contento', 'encanta', 'gusta', 'gracias', 'maravilloso', 'fantástico', 'sí'],
+            'negative': ['malo', 'mala', 'terrible', 'horrible', 'odio', 'triste', 'enojado',
+                         'frustrado', 'decepcionado', 'inútil', 'peor', 'no', 'nunca'],
+            'intensifiers': ['muy', 'muchísimo', 'realmente', 'totalmente', 'demasiado'],
+            'negations': ['no', 'nunca', 'jamás', 'nada', 'tampoco'],
+        },
+        'templates': {
+            'greeting': ["¡Hola! ¿En qué puedo ayudarte hoy?", "¡Hola! ¿Cómo puedo ayudarte?"],
+            'greeting_with_name': ["¡Hola {name}! ¿En qué puedo ayudarte hoy?"],
+            'goodbye': ["¡Adiós! Fue un placer hablar contigo.", "¡Hasta luego! Cuídate."],
+            'goodbye_with_name': ["¡Adiós {name}! Fue un placer hablar contigo."],
+            'name_introduction': ["¡Mucho gusto, {name}! Lo recordaré. ¿En qué puedo ayudarte?"],
+            'name_query': ["Te llamas {name}. ¡Lo recuerdo!"],
+            'name_not_found': ["Todavía no sé tu nombre. ¿Cómo te llamas?"],
+            'help': ["Puedo mantener conversaciones, recordar lo que me dices, "
+                     "reconocer nombres, fechas y lugares, y responder preguntas sencillas. ¿En qué te ayudo?"],
+            'unknown': ["Lo siento, no te entendí. ¿Puedes decirlo de otra forma?"],
+            'compliment': ["¡Gracias! ¿Hay algo más en lo que pueda ayudarte?"],
+            'time': ["Son las {time}."],
+            'date': ["Hoy es {date}."],
+            'weather': ["No tengo datos del tiempo en tiempo real para {location}. "
+                        "Te recomiendo consultar un servicio meteorológico."],
+            'error': ["Lo siento, ocurrió un error. Inténtalo de nuevo."],
+        },
+        'entity_patterns': [
+            {'type': 'PERSON', 'group': 1, 'requires': 0,
+             'pattern': r'(?i:me llamo|mi nombre es|soy)\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)?)'},
+        ],
+    },
+    'fr': {
+        'intents': {
+            'greeting': {
+                'keywords': ['bonjour', 'salut', 'bonsoir', 'coucou'],
+                'patterns': [r'\b(bonjour|salut|bonsoir|coucou)\b'],
+                'confidence': 0.9
+            },
+            'goodbye': {
+                'keywords': ['au revoir', 'à bientôt', 'à plus tard', 'bonne journée', 'adieu'],
+                'patterns': [r'au\s+revoir', r'à\s+(bientôt|plus\s+tard|demain)'],
+                'confidence': 0.9
+            },
+            'question': {
+                'keywords': ['quoi', 'quand', 'où', 'qui', 'pourquoi', 'comment', 'quel', 'pouvez'],
+                'patterns': [r'\?', r'^(quoi|quand|où|qui|pourquoi|comment|quel|quelle)'],
+                'confidence': 0.8
+            },
+            'name_introduction': {
+                'keywords': ["je m'appelle", 'mon nom est', 'je suis'],
+                'patterns': [r"je\s+m'appelle", r'mon\s+nom\s+est'],
+                'confidence': 0.85
+            },
+            'name_query': {
+                'keywords': ["comment je m'appelle", 'quel est mon nom', 'connais mon nom'],
+                'patterns': [r"comment\s+je\s+m'appelle", r'quel\s+est\s+mon\s+nom'],
+                'confidence': 0.9
+            },
+            'help': {
+                'keywords': ['aide', 'aidez-moi', 'que pouvez-vous faire'],
+                'patterns': [r'\baide\b', r'que\s+peux[- ]tu\s+faire', r'que\s+pouvez[- ]vous\s+faire'],
+                'confidence': 0.8
+            },
+            'weather': {
+                'keywords': ['météo', 'temps fait', 'température', 'pluie', 'prévisions'],
+                'patterns': [r'météo', r'température', r'quel\s+temps\s+fait'],
+                'confidence': 0.75
+            },
+            'time': {
+                'keywords': ['quelle heure', "l'heure"],
+                'patterns': [r'quelle\s+heure'],
+                'confidence': 0.8
+            },
+            'date': {
+                'keywords': ['quelle date', "date d'aujourd'hui", 'quel jour'],
+                'patterns': [r'quelle\s+date', r'quel\s+jour'],
+                'confidence': 0.8
+            },
+            'compliment': {
+                'keywords': ['merci', 'merci beaucoup', 'excellent', 'bon travail', 'génial'],
+                'patterns': [r'\bmerci\b', r'bon\s+travail'],
+                'confidence': 0.7
+            },
+        },
+        'sentiment': {
+            'positive': ['bon', 'bonne', 'bien', 'génial', 'excellent', 'parfait', 'heureux',
+                         'content', 'aime', 'adore', 'merci', 'super', 'magnifique', 'oui'],
+            'negative': ['mauvais', 'mauvaise', 'terrible', 'horrible', 'déteste', 'triste', 'fâché',
+                         'frustré', 'déçu', 'nul', 'inutile', 'pire', 'non', 'jamais'],
+            'intensifiers': ['très', 'vraiment', 'tellement', 'trop', 'totalement'],
+            'negations': ['ne', 'pas', 'non', 'jamais', 'rien', 'aucun'],
+        },
+        'templates': {
+            'greeting': ["Bonjour ! Comment puis-je vous aider aujourd'hui ?", "Salut ! Que puis-je faire pour vous ?"],
+            'greeting_with_name': ["Bonjour {name} ! Comment puis-je vous aider ?"],
+            'goodbye': ["Au revoir ! Ce fut un plaisir de discuter avec vous.", "À bientôt ! Prenez soin de vous."],
+            'goodbye_with_name': ["Au revoir {name} ! Ce fut un plaisir."],
+            'name_introduction': ["Enchanté, {name} ! Je m'en souviendrai. Comment puis-je vous aider ?"],
+            'name_query': ["Vous vous appelez {name}. Je m'en souviens !"],
+            'name_not_found': ["Je ne connais pas encore votre nom. Comment vous appelez-vous ?"],
+            'help': ["Je peux tenir une conversation, me souvenir de ce que vous dites, "
+                     "reconnaître des noms, des dates et des lieux, et répondre à des questions simples."],
+            'unknown': ["Désolé, je n'ai pas compris. Pouvez-vous reformuler ?"],
+            'compliment': ["Merci ! Puis-je vous aider avec autre chose ?"],
+            'time': ["Il est {time}."],
+            'date': ["Nous sommes le {date}."],
+            'weather': ["Je n'ai pas accès à la météo en temps réel pour {location}. "
+                        "Consultez un service météo."],
+            'error': ["Désolé, une erreur s'est produite. Veuillez réessayer."],
+        },
+        'entity_patterns': [
+            {'type': 'PERSON', 'group': 1, 'requires': 0,
+             'pattern': r"(?i:je m'appelle|mon nom est)\s+([A-ZÀ-Ý][a-zà-ÿ]+(?:\s+[A-ZÀ-Ý][a-zà-ÿ]+)?)"},
+        ],
+    },
+    'de': {
+        'intents': {
+            'greeting': {
+                'keywords': ['hallo', 'guten tag', 'guten morgen', 'guten abend', 'servus', 'moin'],
+                'patterns': [r'\b(hallo|servus|moin)\b', r'guten\s+(tag|morgen|abend)'],
+                'confidence': 0.9
+            },
+            'goodbye': {
+                'keywords': ['tschüss', 'auf wiedersehen', 'bis später', 'bis bald', 'ciao'],
+                'patterns': [r'\b(tschüss|ciao)\b', r'auf\s+wiedersehen', r'bis\s+(später|bald|morgen)'],
+                'confidence': 0.9
+            },
+            'question': {
+                'keywords': ['was', 'wann', 'wo', 'wer', 'warum', 'wie', 'welche', 'kannst du'],
+                'patterns': [r'\?', r'^(was|wann|wo|wer|warum|wie|welche)\b'],
+                'confidence': 0.8
+            },
+            'name_introduction': {
+                'keywords': ['ich heiße', 'mein name ist', 'ich bin'],
+                'patterns': [r'ich\s+heiße', r'mein\s+name\s+ist'],
+                'confidence': 0.85
+            },
+            'name_query': {
+                'keywords': ['wie heiße ich', 'wie ist mein name', 'kennst du meinen namen'],
+                'patterns': [r'wie\s+heiße\s+ich', r'wie\s+ist\s+mein\s+name'],
+                'confidence': 0.9
+            },
+            'help': {
+                'keywords': ['hilfe', 'hilf mir', 'was kannst du'],
+                'patterns': [r'\bhilfe\b', r'was\s+kannst\s+du'],
+                'confidence': 0.8
+            },
+            'weather': {
+                'keywords': ['wetter', 'temperatur', 'regen', 'vorhersage'],
+                'patterns': [r'wetter', r'temperatur'],
+                'confidence': 0.75
+            },
+            'time': {
+                'keywords': ['wie spät', 'uhrzeit', 'wie viel uhr'],
+                'patterns': [r'wie\s+spät', r'uhrzeit'],
+                'confidence': 0.8
+            },
+            'date': {
+                'keywords': ['welches datum', 'welcher tag', 'datum heute'],
+                'patterns': [r'welches\s+datum', r'welcher\s+tag'],
+                'confidence': 0.8
+            },
+            'compliment': {
+                'keywords': ['danke', 'vielen dank', 'super', 'gute arbeit', 'toll'],
+                'patterns': [r'\bdanke\b', r'gute\s+arbeit'],
+                'confidence': 0.7
+            },
+        },
+        'sentiment': {
+            'positive': ['gut', 'toll', 'super', 'großartig', 'perfekt', 'glücklich', 'froh',
+                         'liebe', 'mag', 'danke', 'wunderbar', 'fantastisch', 'ja'],
+            'negative': ['schlecht', 'schrecklich', 'furchtbar', 'hasse', 'traurig', 'wütend',
+                         'frustriert', 'enttäuscht', 'nutzlos', 'schlimmste', 'nein', 'nie'],
+            'intensifiers': ['sehr', 'wirklich', 'total', 'extrem', 'ziemlich'],
+            'negations': ['nicht', 'nein', 'nie', 'kein', 'keine', 'nichts'],
+        },
+        'templates': {
+            'greeting': ["Hallo! Wie kann ich Ihnen heute helfen?", "Hallo! Was kann ich für Sie tun?"],
+            'greeting_with_name': ["Hallo {name}! Wie kann ich helfen?"],
+            'goodbye': ["Auf Wiedersehen! Es war schön, mit Ihnen zu sprechen.", "Tschüss! Passen Sie auf sich auf."],
+            'goodbye_with_name': ["Auf Wiedersehen, {name}! Es war schön."],
+            'name_introduction': ["Freut mich, {name}! Das merke ich mir. Wie kann ich helfen?"],
+            'name_query': ["Sie heißen {name}. Daran erinnere ich mich!"],
+            'name_not_found': ["Ich kenne Ihren Namen noch nicht. Wie heißen Sie?"],
+            'help': ["Ich kann Gespräche führen, mir merken, was Sie sagen, Namen, Daten und Orte "
+                     "erkennen und einfache Fragen beantworten."],
+            'unknown': ["Entschuldigung, das habe ich nicht verstanden. Können Sie es anders formulieren?"],
+            'compliment': ["Danke! Kann ich sonst noch helfen?"],
+            'time': ["Es ist {time}."],
+            'date': ["Heute ist der {date}."],
+            'weather': ["Ich habe keine aktuellen Wetterdaten für {location}. Bitte nutzen Sie einen Wetterdienst."],
+            'error': ["Entschuldigung, ein Fehler ist aufgetreten. Bitte versuchen Sie es erneut."],
+        },
+        'entity_patterns': [
+            {'type': 'PERSON', 'group': 1, 'requires': 0,
+             'pattern': r'(?i:ich heiße|mein name ist)\s+([A-ZÄÖÜ][a-zäöüß]+(?:\s+[A-ZÄÖÜ][a-zäöüß]+)?)'},
+        ],
+    },
+    'hi': {
+        'intents': {
+            'greeting': {
+                'keywords': ['नमस्ते', 'नमस्कार', 'हैलो', 'प्रणाम'],
+                'patterns': [r'(नमस्ते|नमस्कार|हैलो|प्रणाम)'],
+                'confidence': 0.9
+            },
+            'goodbye': {
+                'keywords': ['अलविदा', 'फिर मिलेंगे', 'नमस्ते जी चलता हूं'],
+                'patterns': [r'(अलविदा|फिर मिलेंगे)'],
+                'confidence': 0.9
+            },
+            'question': {
+                'keywords': ['क्या', 'कब', 'कहां', 'कौन', 'क्यों', 'कैसे'],
+                'patterns': [r'\?'],
+                'confidence': 0.8
+            },
+            'name_introduction': {
+                'keywords': ['मेरा नाम', 'मैं हूं'],
+                'patterns': [r'(मेरा नाम\s+(?!क्या|याद)\S+|मैं\s+\S+\s+हूं)'],
+                'confidence': 0.85
+            },
+            'name_query': {
+                'keywords': ['मेरा नाम क्या है', 'मेरा नाम याद है'],
+                'patterns': [r'मेरा नाम\s+(क्या|याद)'],
+                'confidence': 0.9
+            },
+            'help': {
+                'keywords': ['मदद', 'सहायता'],
+                'patterns': [r'(मदद|सहायता)'],
+                'confidence': 0.8
+            },
+            'weather': {
+                'keywords': ['मौसम', 'तापमान', 'बारिश'],
+                'patterns': [r'(मौसम|तापमान|बारिश)'],
+                'confidence': 0.75
+            },
+            'time': {
+                'keywords': ['समय', 'कितने बजे'],
+                'patterns': [r'(समय|कितने बजे)'],
+                'confidence': 0.8
+            },
+            'date': {
+                'keywords': ['तारीख', 'आज कौन सा दिन'],
+                'patterns': [r'(तारीख|कौन सा दिन)'],
+                'confidence': 0.8
+            },
+            'compliment': {
+                'keywords': ['धन्यवाद', 'शुक्रिया', 'बहुत अच्छा'],
+                'patterns': [r'(धन्यवाद|शुक्रिया)'],
+                'confidence': 0.7
+            },
+        },
+        'sentiment': {
+            'positive': ['अच्छा', 'अच्छी', 'बढ़िया', 'शानदार', 'खुश', 'धन्यवाद', 'पसंद', 'हां'],
+            'negative': ['बुरा', 'बुरी', 'खराब', 'दुखी', 'नाराज़', 'गुस्सा', 'बेकार', 'नहीं'],
+            'intensifiers': ['बहुत', 'ज़्यादा', 'सच में'],
+            'negations': ['नहीं', 'न', 'मत', 'कभी नहीं'],
+        },
+        'templates': {
+            'greeting': ["नमस्ते! मैं आपकी कैसे मदद कर सकता हूं?"],
+            'greeting_with_name': ["नमस्ते {name}! मैं आपकी कैसे मदद कर सकता हूं?"],
+            'goodbye': ["अलविदा! आपसे बात करके अच्छा लगा।"],
+            'goodbye_with_name': ["अलविदा {name}! आपसे बात करके अच्छा लगा।"],
+            'name_introduction': ["आपसे मिलकर खुशी हुई, {name}! मैं यह याद रखूंगा।"],
+            'name_query': ["आपका नाम {name} है। मुझे याद है!"],
+            'name_not_found': ["मुझे अभी आपका नाम नहीं पता। आपका नाम क्या है?"],
+            'help': ["मैं बातचीत कर सकता हूं, आपकी बातें याद रख सकता हूं और सरल सवालों के जवाब दे सकता हूं।"],
+            'unknown': ["माफ़ कीजिए, मैं समझ नहीं पाया। क्या आप दूसरे शब्दों में कह सकते हैं?"],
+            'compliment': ["धन्यवाद! क्या मैं और कुछ मदद कर सकता हूं?"],
+            'time': ["अभी {time} बजे हैं।"],
+            'date': ["आज {date} है।"],
+            'weather': ["मेरे पास {location} का ताज़ा मौसम नहीं है। कृपया किसी मौसम सेवा से जांच करें।"],
+            'error': ["माफ़ कीजिए, कोई त्रुटि हुई। कृपया फिर से प्रयास करें।"],
+        },
+        'entity_patterns': [
+            {'type': 'PERSON', 'group': 1, 'requires': 0,
+             'pattern': r'मेरा नाम\s+(\S+)'},
+        ],
+    },
+}
@@ -0,0 +1,369 @@
+"""
+Language Identification Module
+Character-trigram language identifier with precomputed log-probability profiles.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from collections import Counter
+import math
+import re
+import threading
+
+import numpy as np
+
+from message_preprocessor import AnalyzedMessage, normalize_text
+from config import LANGUAGE_MIN_CONFIDENCE, LANGUAGE_SHORT_TEXT_TRIGRAMS, LANGUAGE_SHORT_MIN_CONFIDENCE
+
+
+# Seed text for each supported language. Profiles are built from these
+# once per process; chat-style phrasing matters more than volume here.
+SEED_CORPORA = {
+    'en': """
+        hello hi hey good morning good evening how are you today i am fine thank you
+        what is your name my name is john nice to meet you where are you from
+        i live in the city and i work from home can you help me with something
+        what time is it what is the weather like today it is going to rain tomorrow
+        please tell me a joke that was really funny thanks a lot for your help
+        i would like to know more about this what can you do for me
+        the quick brown fox jumps over the lazy dog while the children play outside
+        we should have dinner together this weekend with our friends and family
+        this is not what i wanted i think there is a problem with my order
+        could you please explain how this works and why it happened again
+        goodbye see you later have a nice day take care of yourself
+        they were thinking about the weather and the news of the world
+        which one should i choose there are so many things that i need to do
+    """,
+    'es': """
+        hola buenos días buenas tardes buenas noches cómo estás hoy estoy bien gracias
+        cuál es tu nombre me llamo juan mucho gusto de dónde eres
+        vivo en la ciudad y trabajo desde casa puedes ayudarme con algo
+        qué hora es qué tiempo hace hoy va a llover mañana por la tarde
+        por favor cuéntame un chiste eso fue muy divertido muchas gracias por tu ayuda
+        me gustaría saber más sobre esto qué puedes hacer por mí
+        el perro corre por el parque mientras los niños juegan en la calle
+        deberíamos cenar juntos este fin de semana con nuestros amigos y la familia
+        esto no es lo que quería creo que hay un problema con mi pedido
+        podrías explicarme cómo funciona esto y por qué pasó otra vez
+        adiós hasta luego que tengas un buen día cuídate mucho
+        ellos estaban pensando en el clima y en las noticias del mundo
+        cuál debería elegir hay tantas cosas que tengo que hacer
+    """,
+    'fr': """
+        bonjour salut bonsoir comment allez vous aujourd'hui je vais bien merci
+        quel est votre nom je m'appelle jean enchanté d'où venez vous
+        j'habite en ville et je travaille à la maison pouvez vous m'aider avec quelque chose
+        quelle heure est il quel temps fait il aujourd'hui il va pleuvoir demain
+        s'il vous plaît racontez moi une blague c'était très drôle merci beaucoup pour votre aide
+        je voudrais en savoir plus sur ceci que pouvez vous faire pour moi
+        le chien court dans le parc pendant que les enfants jouent dans la rue
+        nous devrions dîner ensemble ce week end avec nos amis et la famille
+        ce n'est pas ce que je voulais je pense qu'il y a un problème avec ma commande
+        pourriez vous m'expliquer comment cela fonctionne et pourquoi c'est encore arrivé
+        au revoir à bientôt bonne journée prenez soin de vous
+        ils pensaient au temps qu'il fait et aux nouvelles du monde
+        lequel devrais je choisir il y a tellement de choses que je dois faire
+    """,
+    'de': """
+        hallo hallo zusammen guten tag guten morgen guten abend wie geht es dir heute mir geht es gut danke
+        wie heißt du ich heiße hans freut mich woher kommst du
+        ich wohne in der stadt und arbeite von zu hause kannst du mir bei etwas helfen
+        wie spät ist es wie ist das wetter heute morgen wird es regnen
+        bitte erzähl mir einen witz das war wirklich lustig vielen dank für deine hilfe
+        ich möchte mehr darüber wissen was kannst du für mich tun
+        der hund läuft durch den park während die kinder auf der straße spielen
+        wir sollten dieses wochenende zusammen mit unseren freunden und der familie essen
+        das ist nicht was ich wollte ich glaube es gibt ein problem mit meiner bestellung
+        könntest du mir erklären wie das funktioniert und warum es wieder passiert ist
+        auf wiedersehen bis später einen schönen tag noch pass auf dich auf
+        sie dachten über das wetter und die nachrichten aus der welt nach
+        welches soll ich wählen es gibt so viele dinge die ich tun muss
+    """,
+    'hi': """
+        नमस्ते नमस्कार हैलो आप कैसे हैं मैं ठीक हूं धन्यवाद आपका नाम क्या है मेरा नाम राम है
+        आप कहां से हैं मैं शहर में रहता हूं क्या आप मेरी मदद कर सकते हैं अभी क्या समय हुआ है
+        आज मौसम कैसा है कल बारिश होगी कृपया मुझे एक चुटकुला सुनाइए बहुत बहुत धन्यवाद
+        मैं इसके बारे में और जानना चाहता हूं फिर मिलेंगे आपका दिन शुभ हो
+    """,
+    'zh': """
+        你好 您好 你今天好吗 我很好 谢谢 你叫什么名字 我叫小明 很高兴认识你 你是哪里人
+        我住在城市里 我在家工作 你能帮我吗 现在几点了 今天天气怎么样 明天会下雨
+        请给我讲个笑话 非常感谢你的帮助 我想知道更多 你能为我做什么 再见 祝你有美好的一天
+        这不是我想要的 我的订单有问题 你能解释一下这是怎么回事吗
+    """,
+    'ja': """
+        こんにちは こんばんは おはようございます お元気ですか 元気です ありがとうございます
+        お名前は何ですか 私の名前は田中です はじめまして どこから来ましたか
+        私は町に住んでいて 家で仕事をしています 手伝ってもらえますか 今何時ですか
+        今日の天気はどうですか 明日は雨が降るでしょう 冗談を言ってください 本当にありがとう
+        これについてもっと知りたいです さようなら また後で 良い一日を
+    """,
+    'ar': """
+        مرحبا السلام عليكم كيف حالك اليوم أنا بخير شكرا ما اسمك اسمي أحمد تشرفت بمعرفتك
+        من أين أنت أعيش في المدينة وأعمل من المنزل هل يمكنك مساعدتي كم الساعة الآن
+        كيف الطقس اليوم ستمطر غدا من فضلك أخبرني نكتة شكرا جزيلا على مساعدتك
+        أريد أن أعرف المزيد عن هذا مع السلامة أتمنى لك يوما سعيدا
+    """,
+}
+
+# Script groups; trigram scoring only compares languages of the text's script
+SCRIPT_LANGUAGES = {
+    'latin': ('en', 'es', 'fr', 'de'),
+    'devanagari': ('hi',),
+    'arabic': ('ar',),
+    'cjk': ('zh', 'ja'),
+}
+
+# Log prior added to each language score; English is the default language
+LANGUAGE_PRIORS = {'en': math.log(2.0)}
+
+# Additive smoothing for unseen trigrams
+SMOOTHING = 0.5
+
+_NON_LETTERS = re.compile(r"[\W\d_]+")
+
+
+def _script_of(char: str) -> Optional[str]:
+    """Script group of a single non-ASCII character."""
+    code = ord(char)
+    if 0x0900 <= code <= 0x097F:
+        return 'devanagari'
+    if 0x0600 <= code <= 0x06FF:
+        return 'arabic'
+    if 0x3040 <= code <= 0x30FF or 0x4E00 <= code <= 0x9FFF:
+        return 'cjk'
+    if char.isalpha() and code < 0x0250:
+        return 'latin'
+    return None
+
+
+def script_histogram(text: str) -> Counter:
+    """
+    Count letters per script group in one pass.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Counter of script group -> number of letters
+    """
+    histogram = Counter()
+    for char in text:
+        if char < '\x80':
+            if char.isalpha():
+                histogram['latin'] += 1
+        else:
+            script = _script_of(char)
+            if script:
+                histogram[script] += 1
+    return histogram
+
+
+def trigrams(text_lower: str) -> List[str]:
+    """
+    Get the character trigrams of normalized text.
+
+    Non-letters collapse to single spaces and words are padded with a
+    space on each side, so word starts and ends form their own trigrams.
+
+    Args:
+        text_lower: Normalized text
+
+    Returns:
+        List of trigrams
+    """
+    cleaned = ' ' + _NON_LETTERS.sub(' ', text_lower).strip() + ' '
+    if len(cleaned) < 3 or cleaned == '  ':
+        return []
+    return [cleaned[i:i + 3] for i in range(len(cleaned) - 2)]
+
+
+class LanguageIdentifier:
+    """
+    Identifies the language of short messages.
+
+    A single-pass script histogram picks the script group, then character
+    trigram log-probabilities (one precomputed row per trigram, one column
+    per language) decide between the group's languages. Pure ASCII text
+    skips the histogram and goes straight to the Latin group.
+    """
+
+    def __init__(self, corpora: Optional[Dict[str, str]] = None,
+                 min_confidence: float = LANGUAGE_MIN_CONFIDENCE,
+                 default_language: str = 'en',
+                 short_text_trigrams: int = LANGUAGE_SHORT_TEXT_TRIGRAMS,
+                 short_min_confidence: float = LANGUAGE_SHORT_MIN_CONFIDENCE):
+        """
+        Build the trigram profiles.
+
+        Args:
+            corpora: Seed text per language code (defaults to SEED_CORPORA)
+            min_confidence: Below this confidence the default language is returned
+            default_language: Language for empty or ambiguous text
+            short_text_trigrams: Texts with fewer trigrams count as short
+            short_min_confidence: Confidence a short text needs to leave
+                the default language (a word or two carries little evidence)
+        """
+        corpora = corpora or SEED_CORPORA
+        self.languages: Tuple[str, ...] = tuple(corpora)
+        self.min_confidence = min_confidence
+        self.default_language = default_language
+        self.short_text_trigrams = short_text_trigrams
+        self.short_min_confidence = short_min_confidence
+
+        counts = {lang: Counter(trigrams(normalize_text(' '.join(text.split()))))
+                  for lang, text in corpora.items()}
+        vocabulary = sorted(set().union(*counts.values()))
+        self.trigram_ids: Dict[str, int] = {gram: index for index, gram in enumerate(vocabulary)}
+
+        # Last row holds the log-probability of an unseen trigram
+        table = np.empty((len(vocabulary) + 1, len(self.languages)), dtype=np.float64)
+        for column, lang in enumerate(self.languages):
+            total = sum(counts[lang].values()) + SMOOTHING * (len(vocabulary) + 1)
+            table[:-1, column] = [math.log((counts[lang][gram] + SMOOTHING) / total)
+                                  for gram in vocabulary]
+            table[-1, column] = math.log(SMOOTHING / total)
+        self.table = table
+        self.unseen = len(vocabulary)
+        self.priors = np.array([LANGUAGE_PRIORS.get(lang, 0.0) for lang in self.languages])
+
+        self.group_columns = {
+            script: np.array([self.languages.index(lang) for lang in langs if lang in self.languages])
+            for script, langs in SCRIPT_LANGUAGES.items()
+        }
+
+    def _script(self, text: str, is_ascii: bool) -> Optional[str]:
+        """Dominant script group of a text (None if it has no letters)."""
+        if is_ascii:
+            return 'latin' if any(char.isalpha() for char in text) else None
+        histogram = script_histogram(text)
+        if not histogram:
+            return None
+        return histogram.most_common(1)[0][0]
+
+    def _ids(self, text_lower: str) -> List[int]:
+        get_id = self.trigram_ids.get
+        unseen = self.unseen
+        return [get_id(gram, unseen) for gram in trigrams(text_lower)]
+
+    def _decide(self, script: Optional[str], scores: Optional[np.ndarray],
+                length: int = 0) -> Tuple[str, float]:
+        """Pick a language from per-language log scores of `length` trigrams within a script group."""
+        if script is None:
+            return self.default_language, 0.0
+        columns = self.group_columns.get(script)
+        if columns is None or not len(columns):
+            return self.default_language, 0.0
+        if len(columns) == 1 or scores is None:
+            return self.languages[columns[0]], 1.0
+
+        group_scores = scores[columns] + self.priors[columns]
+        group_scores -= group_scores.max()
+        probabilities = np.exp(group_scores)
+        probabilities /= probabilities.sum()
+        best = int(probabilities.argmax())
+        confidence = round(float(probabilities[best]), 3)
+        language = self.languages[columns[best]]
+        min_confidence = self.min_confidence
+        if length < self.short_text_trigrams:
+            min_confidence = max(min_confidence, self.short_min_confidence)
+        if confidence < min_confidence and self.default_language in (
+                self.languages[column] for column in columns):
+            return self.default_language, confidence
+        return language, confidence
+
+    def identify(self, text: Union[str, AnalyzedMessage]) -> Tuple[str, float]:
+        """
+        Identify the language of one text.
+
+        Args:
+            text: Input text (or preprocessed message)
+
+        Returns:
+            Tuple of (language code, confidence)
+        """
+        if isinstance(text, AnalyzedMessage):
+            raw, text_lower, is_ascii = text.text, text.normalized, text.is_ascii
+        else:
+            raw = text or ''
+            text_lower = normalize_text(raw)
+            is_ascii = raw.isascii()
+
+        script = self._script(raw, is_ascii)
+        scores = None
+        ids = []
+        if script is not None and len(self.group_columns.get(script, ())) > 1:
+            ids = self._ids(text_lower)
+            if ids:
+                scores = self.table[ids].sum(axis=0)
+        return self._decide(script, scores, len(ids))
+
+    def identify_batch(self, texts: Sequence[Union[str, AnalyzedMessage]]) -> Tuple[List[str], np.ndarray]:
+        """
+        Identify the languages of many texts at once.
+
+        Trigram ids of all texts are concatenated and the per-language log
+        scores are summed per text with one np.add.reduceat call. Results
+        equal identify() for each text.
+
+        Args:
+            texts: Input texts (or preprocessed messages)
+
+        Returns:
+            Tuple of (language codes, float64 confidences)
+        """
+        scripts = []
+        ids: List[int] = []
+        offsets = []
+        for text in texts:
+            if isinstance(text, AnalyzedMessage):
+                raw, text_lower, is_ascii = text.text, text.normalized, text.is_ascii
+            else:
+                raw = text or ''
+                text_lower = normalize_text(raw)
+                is_ascii = raw.isascii()
+            script = self._script(raw, is_ascii)
+            scripts.append(script)
+            offsets.append(len(ids))
+            if script is not None and len(self.group_columns.get(script, ())) > 1:
+                ids.extend(self._ids(text_lower))
+
+        lengths = np.diff(np.append(offsets, len(ids)))
+        scores = np.zeros((len(texts), len(self.languages)))
+        nonempty = np.flatnonzero(lengths)
+        if len(nonempty):
+            rows = self.table[np.asarray(ids, dtype=np.int64)]
+            scores[nonempty] = np.add.reduceat(rows, np.asarray(offsets)[nonempty], axis=0)
+
+        languages = []
+        confidences = np.zeros(len(texts))
+        for index, script in enumerate(scripts):
+            language, confidence = self._decide(script, scores[index] if lengths[index] else None,
+                                              int(lengths[index]))
+            languages.append(language)
+            confidences[index] = confidence
+        return languages, confidences
+
+
+_shared_identifier: Optional[LanguageIdentifier] = None
+_shared_lock = threading.Lock()
+
+
+def get_language_identifier() -> LanguageIdentifier:
+    """
+    Get the process-wide identifier, building its profiles on first use.
+
+    Returns:
+        Shared LanguageIdentifier
+    """
+    global _shared_identifier
+    if _shared_identifier is None:
+        with _shared_lock:
+            if _shared_identifier is None:
+                _shared_identifier = LanguageIdentifier()
+    return _shared_identifier
@@ -0,0 +1,209 @@
+"""
+Language Pipeline Module
+Lazily compiled per-language NLU pipelines kept in a shared, bounded registry.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+import importlib
+import threading
+
+from intent_recognizer import IntentRecognizer
+from sentiment_analyzer import SentimentAnalyzer
+from entity_extractor import EntityExtractor
+from response_templates import ResponseTemplates
+from config import LANGUAGE, LANGUAGE_PIPELINE_CACHE_SIZE
+
+
+class LanguagePipeline:
+    """
+    NLU components and response templates compiled for one language.
+    """
+
+    def __init__(self, language: str, bundle: Dict[str, Any]):
+        """
+        Build the pipeline from a language resource bundle.
+
+        Args:
+            language: Language code (e.g. 'es')
+            bundle: Resource bundle (see language_data.LANGUAGE_BUNDLES)
+        """
+        sentiment = bundle.get('sentiment', {})
+
+        self.language = language
+        self.intent_recognizer = IntentRecognizer(
+            backend='rules', intent_patterns=bundle.get('intents')
+        )
+        self.sentiment_analyzer = SentimentAnalyzer(
+            lexicon_path=sentiment.get('lexicon_path'),
+            positive_words=sentiment.get('positive', ()),
+            negative_words=sentiment.get('negative', ()),
+            intensifiers=sentiment.get('intensifiers', ()),
+            negations=sentiment.get('negations', ())
+        )
+        self.entity_extractor = EntityExtractor(extra_patterns=bundle.get('entity_patterns'))
+        self.response_templates = ResponseTemplates(bundle.get('templates'))
+
+        # Compile now so the first routed turn does not pay for it
+        self.intent_recognizer.engine
+        self.sentiment_analyzer.lexicon
+
+    @property
+    def cache_token(self) -> tuple:
+        """Value identifying the compiled components of this pipeline."""
+        return (
+            self.language,
+            self.sentiment_analyzer.cache_token,
+            self.intent_recognizer.cache_token,
+            self.entity_extractor.cache_token,
+        )
+
+
+class PipelineRegistry:
+    """
+    Size-bounded LRU registry of compiled language pipelines.
+
+    Resources for a language are imported and compiled the first time a
+    message in that language is routed here, so processes that only see
+    the default language never load them. The default language has no
+    pipeline: callers keep using their own components for it.
+    """
+
+    def __init__(self, max_size: int = LANGUAGE_PIPELINE_CACHE_SIZE,
+                 default_language: str = LANGUAGE):
+        """
+        Initialize the registry.
+
+        Args:
+            max_size: Maximum number of compiled pipelines kept at once
+            default_language: Language served by the callers' own components
+        """
+        self.max_size = max_size
+        self.default_language = default_language
+        self._pipelines: 'OrderedDict[str, LanguagePipeline]' = OrderedDict()
+        self._bundles: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def register_bundle(self, language: str, bundle: Dict[str, Any]):
+        """
+        Add or replace the resource bundle for a language.
+
+        Args:
+            language: Language code
+            bundle: Resource bundle (same layout as language_data bundles)
+        """
+        with self._lock:
+            self._bundles[language] = bundle
+            self._pipelines.pop(language, None)
+            self.version += 1
+
+    def _bundle(self, language: str) -> Optional[Dict[str, Any]]:
+        """Find the resource bundle for a language, importing the data on demand."""
+        bundle = self._bundles.get(language)
+        if bundle is None:
+            try:
+                language_data = importlib.import_module('language_data')
+            except ImportError as e:
+                print(f"Error loading language resources: {e}")
+                return None
+            bundle = language_data.LANGUAGE_BUNDLES.get(language)
+        return bundle
+
+    def get(self, language: str) -> Optional[LanguagePipeline]:
+        """
+        Get the compiled pipeline for a language.
+
+        Args:
+            language: Language code
+
+        Returns:
+            The pipeline, or None for the default language and languages
+            without resources
+        """
+        if language == self.default_language:
+            return None
+
+        with self._lock:
+            pipeline = self._pipelines.get(language)
+            if pipeline is not None:
+                self._pipelines.move_to_end(language)
+                return pipeline
+
+            bundle = self._bundle(language)
+            if bundle is None:
+                return None
+            pipeline = LanguagePipeline(language, bundle)
+            self.loads += 1
+            self._pipelines[language] = pipeline
+            while len(self._pipelines) > self.max_size:
+                self._pipelines.popitem(last=False)
+                self.evictions += 1
+            return pipeline
+
+    @property
+    def cache_token(self) -> tuple:
+        """
+        Value that changes whenever routed results could change.
+
+        Covers replaced bundles and changes made to the components of
+        loaded pipelines. Loading a pipeline also changes it, since the
+        new pipeline's components are included from then on.
+        """
+        with self._lock:
+            return (self.version, tuple(
+                self._pipelines[language].cache_token for language in sorted(self._pipelines)
+            ))
+
+    def loaded_languages(self) -> List[str]:
+        """Languages with a compiled pipeline, least recently used first."""
+        with self._lock:
+            return list(self._pipelines)
+
+    def clear(self):
+        """Drop all compiled pipelines."""
+        with self._lock:
+            self._pipelines.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get registry statistics.
+
+        Returns:
+            Dictionary with loaded languages, loads, evictions and size
+        """
+        with self._lock:
+            return {
+                'languages': list(self._pipelines),
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'size': len(self._pipelines),
+                'max_size': self.max_size
+            }
+
+
+_shared_registry: Optional[PipelineRegistry] = None
+_shared_registry_lock = threading.Lock()
+
+
+def get_pipeline_registry() -> PipelineRegistry:
+    """
+    Get the process-wide language pipeline registry.
+
+    Returns:
+        Shared PipelineRegistry instance
+    """
+    global _shared_registry
+    if _shared_registry is None:
+        with _shared_registry_lock:
+            if _shared_registry is None:
+                _shared_registry = PipelineRegistry()
+    return _shared_registry
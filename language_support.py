@@ -9,8 +9,10 @@ Phone: +91 93305 39277
 Year: 2026
 """
 
-from typing import Dict, Optional
-import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from message_preprocessor import AnalyzedMessage
+from language_id import LanguageIdentifier, get_language_identifier
 
 
 class LanguageSupport:
@@ -32,55 +34,51 @@ class LanguageSupport:
             'ar': 'Arabic'
         }
         
-        # Language detection patterns
-        self.language_patterns = {
-            'hi': r'[\u0900-\u097F]',  # Devanagari script
-            'zh': r'[\u4e00-\u9fff]',  # Chinese characters
-            'ja': r'[\u3040-\u309F\u30A0-\u30FF]',  # Hiragana/Katakana
-            'ar': r'[\u0600-\u06FF]',  # Arabic script
-        }
-        
-        # Common phrases in different languages
-        self.greetings = {
-            'en': ['hello', 'hi', 'hey', 'greetings'],
-            'es': ['hola', 'buenos días', 'buenas tardes'],
-            'fr': ['bonjour', 'salut', 'bonsoir'],
-            'de': ['hallo', 'guten tag', 'guten morgen'],
-            'hi': ['नमस्ते', 'नमस्कार', 'हैलो'],
-            'zh': ['你好', '您好'],
-            'ja': ['こんにちは', 'こんばんは'],
-            'ar': ['مرحبا', 'السلام عليكم']
-        }
+        # Shared trigram language identifier
+        self.identifier: LanguageIdentifier = get_language_identifier()
         
         self.current_language = 'en'
     
-    def detect_language(self, text: str) -> str:
+    @property
+    def cache_token(self) -> int:
+        """Value identifying the language identifier in use."""
+        return id(self.identifier)
+    
+    def detect_language(self, text: Union[str, AnalyzedMessage]) -> str:
         """
         Detect language of input text.
         
         Args:
-            text: Input text
+            text: Input text (or preprocessed message)
             
         Returns:
             Language code (e.g., 'en', 'es', 'hi')
         """
-        if not text:
-            return 'en'
-        
-        # Check for script-based languages
-        for lang_code, pattern in self.language_patterns.items():
-            if re.search(pattern, text):
-                return lang_code
+        return self.identifier.identify(text)[0]
+    
+    def detect_language_with_confidence(self, text: Union[str, AnalyzedMessage]) -> Tuple[str, float]:
+        """
+        Detect language of input text together with a confidence score.
         
-        # Check for common phrases
-        text_lower = text.lower()
-        for lang_code, phrases in self.greetings.items():
-            for phrase in phrases:
-                if phrase.lower() in text_lower:
-                    return lang_code
+        Args:
+            text: Input text (or preprocessed message)
+            
+        Returns:
+            Tuple of (language code, confidence from 0.0 to 1.0)
+        """
+        return self.identifier.identify(text)
+    
+    def detect_languages(self, texts: List[Union[str, AnalyzedMessage]]) -> List[str]:
+        """
+        Detect the languages of many texts at once.
         
-        # Default to English
-        return 'en'
+        Args:
+            texts: Input texts (or preprocessed messages)
+            
+        Returns:
+            Language codes in input order
+        """
+        return self.identifier.identify_batch(texts)[0]
     
     def set_language(self, language_code: str) -> bool:
         """
@@ -0,0 +1,122 @@
+"""
+Message Preprocessing Module
+Builds the shared analyzed form of a message used by every NLU stage.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import List, Tuple, Union
+import re
+import unicodedata
+
+
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+_DIGIT = re.compile(r'[0-9]')
+_UPPER = re.compile(r'[A-Z]')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for case-insensitive matching.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Stripped, casefolded, NFC-normalized text
+    """
+    text = text.strip()
+    if text.isascii():
+        return text.lower()
+    return unicodedata.normalize('NFC', text.casefold())
+
+
+def normalize_token(token: str) -> str:
+    """Normalize a single token the same way as normalize_text."""
+    if token.isascii():
+        return token.lower()
+    return unicodedata.normalize('NFC', token.casefold())
+
+
+def tokenize(text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Split text into normalized word tokens.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Tuple of (normalized tokens, (start, end) offsets into text)
+    """
+    tokens = []
+    offsets = []
+    for match in TOKEN_PATTERN.finditer(text):
+        tokens.append(normalize_token(match.group()))
+        offsets.append(match.span())
+    return tokens, offsets
+
+
+class AnalyzedMessage:
+    """
+    Immutable, preprocessed view of one user message.
+
+    Built once per turn and passed to the language, sentiment, intent and
+    entity stages so none of them lowercases or tokenizes the text again.
+    """
+
+    __slots__ = ('text', 'normalized', 'tokens', 'offsets',
+                 'is_ascii', 'has_digit', 'has_at', 'has_upper')
+
+    def __init__(self, text: str):
+        """
+        Preprocess a message.
+
+        Args:
+            text: Original message text
+        """
+        text = text or ''
+        tokens, offsets = tokenize(text)
+        is_ascii = text.isascii()
+
+        setattr_ = object.__setattr__
+        setattr_(self, 'text', text)
+        setattr_(self, 'normalized', normalize_text(text))
+        setattr_(self, 'tokens', tuple(tokens))
+        setattr_(self, 'offsets', tuple(offsets))
+        setattr_(self, 'is_ascii', is_ascii)
+        setattr_(self, 'has_digit', _DIGIT.search(text) is not None)
+        setattr_(self, 'has_at', '@' in text)
+        setattr_(self, 'has_upper', _UPPER.search(text) is not None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AnalyzedMessage is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("AnalyzedMessage is immutable")
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether the message has no non-whitespace content."""
+        return not self.normalized
+
+    def __repr__(self) -> str:
+        return f"AnalyzedMessage({self.text!r})"
+
+
+def analyze_message(message: Union[str, AnalyzedMessage]) -> AnalyzedMessage:
+    """
+    Get the analyzed form of a message, reusing it if already analyzed.
+
+    Args:
+        message: Raw text or an AnalyzedMessage
+
+    Returns:
+        AnalyzedMessage for the text
+    """
+    if isinstance(message, AnalyzedMessage):
+        return message
+    return AnalyzedMessage(message)
@@ -0,0 +1,122 @@
+"""
+NLU Cache Module
+Process-wide LRU cache for context-free NLU analysis results.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Any, Dict, Hashable, Optional
+from collections import OrderedDict
+import threading
+
+from config import NLU_CACHE_SIZE
+
+
+class NLUCache:
+    """
+    Size-bounded LRU cache shared by all sessions in a process.
+
+    Keys combine the normalized message text with a signature of the NLU
+    components that produced the result, so entries computed with old
+    intent patterns or lexicons are never returned after they change.
+    """
+
+    def __init__(self, max_size: int = NLU_CACHE_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached analyses
+        """
+        self.max_size = max_size
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a cached value and mark it as recently used.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Store a value, evicting the least recently used entry when full.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached entries (statistics are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with hits, misses, evictions, size and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        """Number of cached entries."""
+        return len(self._entries)
+
+
+_shared_cache: Optional[NLUCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_nlu_cache() -> NLUCache:
+    """
+    Get the process-wide NLU cache.
+
+    Returns:
+        Shared NLUCache instance
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = NLUCache()
+    return _shared_cache
@@ -0,0 +1,105 @@
+"""
+Regex Guard Module
+Input budgets and chunked regex scanning that keep matching time linear.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Iterator, Optional
+import re
+
+from config import MAX_NLU_INPUT_CHARS, REGEX_CHUNK_SIZE, REGEX_CHUNK_OVERLAP
+
+
+def clip_input(text: str, limit: Optional[int] = MAX_NLU_INPUT_CHARS) -> str:
+    """
+    Cut a message down to the NLU input budget.
+
+    The cut is moved back to the last whitespace in the second half of the
+    budget so the final word is not split.
+
+    Args:
+        text: Input text
+        limit: Maximum number of characters (None disables the budget)
+
+    Returns:
+        Text of at most limit characters
+    """
+    if not text or limit is None or len(text) <= limit:
+        return text
+    cut = max(text.rfind(' ', limit // 2, limit + 1), text.rfind('\n', limit // 2, limit + 1))
+    return text[:cut] if cut > 0 else text[:limit]
+
+
+def _window_end(text: str, start: int, limit: int) -> int:
+    """Last whitespace in text[start:limit], or limit if there is none."""
+    if limit >= len(text):
+        return len(text)
+    cut = max(text.rfind(' ', start, limit), text.rfind('\n', start, limit))
+    return cut if cut > start else limit
+
+
+def chunked_finditer(regex: re.Pattern, text: str,
+                     chunk_size: int = REGEX_CHUNK_SIZE,
+                     overlap: int = REGEX_CHUNK_OVERLAP) -> Iterator[re.Match]:
+    """
+    Iterate over the matches of a regex, scanning long texts in windows.
+
+    Matches may start anywhere in a chunk and extend up to overlap
+    characters past it; windows end on whitespace where possible so word
+    boundaries behave as in a full scan. Each window is scanned in place
+    (pos/endpos) without copying. A pattern that backtracks quadratically
+    therefore costs O(len(text) * window) instead of O(len(text) ** 2).
+    For matches shorter than overlap the result equals regex.finditer(text).
+
+    Args:
+        regex: Compiled pattern
+        text: Text to scan
+        chunk_size: Characters per chunk in which a match may start
+        overlap: Extra characters a match may extend past its chunk
+
+    Returns:
+        Iterator over non-overlapping matches in text order
+    """
+    length = len(text)
+    if length <= chunk_size + overlap:
+        yield from regex.finditer(text)
+        return
+
+    position = 0
+    while position < length:
+        chunk_end = position + chunk_size
+        scan_end = _window_end(text, chunk_end, min(length, chunk_end + overlap))
+        next_position = chunk_end
+        for match in regex.finditer(text, position, scan_end):
+            if match.start() >= chunk_end:
+                break
+            yield match
+            next_position = max(next_position, match.end())
+        position = next_position
+
+
+def chunked_search(regex: re.Pattern, text: str,
+                   chunk_size: int = REGEX_CHUNK_SIZE,
+                   overlap: int = REGEX_CHUNK_OVERLAP) -> Optional[re.Match]:
+    """
+    Find the first match of a regex, scanning long texts in windows.
+
+    Args:
+        regex: Compiled pattern
+        text: Text to search
+        chunk_size: Characters per chunk in which a match may start
+        overlap: Extra characters a match may extend past its chunk
+
+    Returns:
+        First match, or None
+    """
+    if len(text) <= chunk_size + overlap:
+        return regex.search(text)
+    for match in chunked_finditer(regex, text, chunk_size, overlap):
+        return match
+    return None
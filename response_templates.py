@@ -18,8 +18,14 @@ class ResponseTemplates:
     Manages response templates for the chatbot.
     """
     
-    def __init__(self):
-        """Initialize response templates."""
+    def __init__(self, templates: Optional[Dict[str, List[str]]] = None):
+        """
+        Initialize response templates.
+        
+        Args:
+            templates: Custom templates by name, replacing the built-in
+                English ones they name (others are kept as a fallback)
+        """
         self.templates = {
             'greeting': [
                 "Hello! I'm a conversational AI bot. How can I assist you today?",
@@ -112,6 +118,10 @@ You can ask me questions, introduce yourself, or just have a conversation. How c
                 "I apologize, but I'm having trouble processing that. Please try again."
             ]
         }
+        
+        if templates:
+            for template_name, template_list in templates.items():
+                self.templates[template_name] = list(template_list)
     
     def get_response(self, template_name: str, **kwargs) -> str:
         """
@@ -0,0 +1,360 @@
+"""
+Retention Module
+Expires old conversation history by age, session count and size in the background.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+import threading
+import time
+
+from history_store import HistoryStore, get_history_store
+from history_index import get_history_index
+from config import (
+    ENABLE_HISTORY_INDEX,
+    RETENTION_MAX_AGE_DAYS, RETENTION_MAX_SESSIONS, RETENTION_MAX_BYTES, RETENTION_ACTION,
+    RETENTION_INTERVAL, RETENTION_BATCH_SIZE, RETENTION_BATCH_PAUSE
+)
+
+RETENTION_ACTIONS = ('delete', 'archive')
+
+
+def _epoch(timestamp: Optional[str]) -> Optional[float]:
+    """Epoch seconds of an ISO timestamp (None if missing or invalid)."""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class RetentionPolicy:
+    """
+    Limits on how much conversation history is kept.
+
+    A limit of 0 disables it. Sessions older than max_age_seconds expire
+    first; if more than max_sessions sessions or max_bytes bytes remain,
+    the least recently active sessions expire until both fit.
+    """
+
+    def __init__(self, max_age_seconds: float = RETENTION_MAX_AGE_DAYS * 86400,
+                 max_sessions: int = RETENTION_MAX_SESSIONS, max_bytes: int = RETENTION_MAX_BYTES):
+        """
+        Initialize the policy.
+
+        Args:
+            max_age_seconds: Idle time after which a session expires
+            max_sessions: Maximum number of sessions kept
+            max_bytes: Maximum stored bytes kept
+        """
+        self.max_age_seconds = max_age_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any limit is set."""
+        return bool(self.max_age_seconds or self.max_sessions or self.max_bytes)
+
+    def select(self, usage: List[Tuple[str, Optional[float], int]], now: float) -> Dict[str, str]:
+        """
+        Pick the sessions to expire.
+
+        Args:
+            usage: (session id, last active epoch or None, bytes) per session
+            now: Current epoch time
+
+        Returns:
+            Mapping of expired session id to the limit it broke
+            ('age', 'sessions' or 'bytes')
+        """
+        expired = {}
+        remaining = []
+        for session_id, last_active, size in usage:
+            if (self.max_age_seconds and last_active is not None
+                    and now - last_active > self.max_age_seconds):
+                expired[session_id] = 'age'
+            else:
+                remaining.append((last_active or 0.0, session_id, size))
+
+        remaining.sort()
+        count = len(remaining)
+        total = sum(size for _, _, size in remaining)
+        for _, session_id, size in remaining:
+            if self.max_sessions and count > self.max_sessions:
+                expired[session_id] = 'sessions'
+            elif self.max_bytes and total > self.max_bytes:
+                expired[session_id] = 'bytes'
+            else:
+                break
+            count -= 1
+            total -= size
+        return expired
+
+
+class RetentionSweeper:
+    """
+    Applies a retention policy to a history store in the background.
+
+    A sweep describes every session through HistoryStore.session_usage and
+    then expires the selected ones, both in batches of batch_size with a
+    pause in between, so the store is never held for long and request
+    threads keep running. Expired sessions are deleted, or with the
+    'archive' action moved to the archive tier of a TieredHistoryStore.
+    Before a session is expired its newest timestamp is read again, so a
+    session that became active during the sweep is kept.
+
+    Other in-memory state can be swept on the same schedule with
+    add_task, e.g. idle per-session objects of the web app.
+    """
+
+    def __init__(self, store: HistoryStore, policy: Optional[RetentionPolicy] = None,
+                 action: str = RETENTION_ACTION, batch_size: int = RETENTION_BATCH_SIZE,
+                 batch_pause: float = RETENTION_BATCH_PAUSE,
+                 on_delete: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the sweeper.
+
+        Args:
+            store: History store to sweep
+            policy: Limits to enforce (defaults to the configured ones)
+            action: 'delete' or 'archive'
+            batch_size: Sessions described or expired per batch
+            batch_pause: Seconds to sleep between batches
+            on_delete: Called with each deleted session id (e.g. to drop it
+                from the search index)
+        """
+        if action not in RETENTION_ACTIONS:
+            raise ValueError(f"Unknown retention action: {action}")
+        if action == 'archive' and not hasattr(store, 'archive_sessions'):
+            raise ValueError("The archive retention action needs a store with an archive tier")
+
+        self.store = store
+        self.policy = policy if policy is not None else RetentionPolicy()
+        self.action = action
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = batch_pause
+        self.on_delete = on_delete
+        self._tasks: Dict[str, Callable[[float], int]] = {}
+
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.runs = 0
+        self.sessions_expired = 0
+        self.bytes_reclaimed = 0
+        self.last_run: Dict[str, Any] = {}
+
+    def add_task(self, name: str, task: Callable[[float], int]):
+        """
+        Run an extra cleanup step with every sweep.
+
+        Args:
+            name: Name reported in the sweep results
+            task: Called with the current epoch time; returns the number of
+                items it removed
+        """
+        self._tasks[name] = task
+
+    def _pause(self):
+        if self.batch_pause:
+            self._stop.wait(self.batch_pause)
+
+    def _sessions(self) -> List[str]:
+        """Sessions the policy applies to (hot ones only when archiving)."""
+        if self.action == 'archive':
+            return self.store.hot.session_ids()
+        return self.store.session_ids()
+
+    def _usage(self, session_id: str) -> Tuple[Optional[str], int]:
+        if self.action == 'archive':
+            return self.store.hot.session_usage(session_id)
+        return self.store.session_usage(session_id)
+
+    def _delete(self, session_ids: List[str], sizes: Dict[str, int]) -> int:
+        """
+        Delete sessions, returning the bytes this freed.
+
+        Archived sessions only free space once every session of their
+        archive file is gone, so they count the archive files deleted.
+        """
+        archive = getattr(self.store, 'archive', None)
+        freed_before = archive.bytes_freed if archive is not None else 0
+        reclaimed = 0
+        for session_id in session_ids:
+            if archive is None or session_id not in archive:
+                reclaimed += sizes[session_id]
+            self.store.clear_session(session_id)
+            if self.on_delete is not None:
+                self.on_delete(session_id)
+        if archive is not None:
+            reclaimed += archive.bytes_freed - freed_before
+        return reclaimed
+
+    def sweep(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Run one sweep.
+
+        Args:
+            now: Current epoch time (defaults to time.time())
+
+        Returns:
+            Dictionary with scanned and expired session counts (per limit),
+            deleted/archived counts, bytes reclaimed, extra task results
+            and duration; bytes count the stored size of the expired hot
+            sessions (append-only backends free the space at compaction)
+            and the archive files deleted
+        """
+        with self._run_lock:
+            started = time.monotonic()
+            now = time.time() if now is None else now
+            report: Dict[str, Any] = {
+                'scanned': 0, 'expired': {'age': 0, 'sessions': 0, 'bytes': 0},
+                'deleted': 0, 'archived': 0, 'bytes_reclaimed': 0, 'tasks': {}
+            }
+
+            expired: Dict[str, str] = {}
+            newest: Dict[str, Optional[str]] = {}
+            sizes: Dict[str, int] = {}
+            if self.policy.enabled:
+                usage = []
+                session_ids = self._sessions()
+                for first in range(0, len(session_ids), self.batch_size):
+                    if self._stop.is_set():
+                        break
+                    for session_id in session_ids[first:first + self.batch_size]:
+                        newest[session_id], sizes[session_id] = self._usage(session_id)
+                        usage.append((session_id, _epoch(newest[session_id]), sizes[session_id]))
+                    self._pause()
+                report['scanned'] = len(usage)
+                expired = self.policy.select(usage, now)
+
+            batch = list(expired)
+            for first in range(0, len(batch), self.batch_size):
+                if self._stop.is_set():
+                    break
+                # Keep sessions that received a turn since they were described
+                unchanged = [
+                    session_id for session_id in batch[first:first + self.batch_size]
+                    if self._usage(session_id)[0] == newest[session_id]
+                ]
+                if self.action == 'archive':
+                    result = self.store.archive_sessions(unchanged)
+                    report['archived'] += result['sessions']
+                    report['bytes_reclaimed'] += sum(sizes[session_id] for session_id in unchanged)
+                else:
+                    report['bytes_reclaimed'] += self._delete(unchanged, sizes)
+                    report['deleted'] += len(unchanged)
+                for session_id in unchanged:
+                    report['expired'][expired[session_id]] += 1
+                self._pause()
+
+            for name, task in self._tasks.items():
+                try:
+                    report['tasks'][name] = task(now)
+                except Exception as e:
+                    print(f"Error running retention task {name}: {e}")
+
+            report['seconds'] = round(time.monotonic() - started, 3)
+            self.runs += 1
+            self.sessions_expired += report['deleted'] + report['archived']
+            self.bytes_reclaimed += report['bytes_reclaimed']
+            self.last_run = report
+            return report
+
+    def start(self, interval: float = RETENTION_INTERVAL):
+        """Run sweep every `interval` seconds on a daemon thread."""
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"Error sweeping history: {e}")
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=run, name='history-retention', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread (a running sweep ends after its current batch)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get sweeper statistics.
+
+        Returns:
+            Dictionary with the limits, run count, totals and the last report
+        """
+        return {
+            'max_age_seconds': self.policy.max_age_seconds,
+            'max_sessions': self.policy.max_sessions,
+            'max_bytes': self.policy.max_bytes,
+            'action': self.action,
+            'runs': self.runs,
+            'sessions_expired': self.sessions_expired,
+            'bytes_reclaimed': self.bytes_reclaimed,
+            'last_run': self.last_run
+        }
+
+
+def create_retention_sweeper(store: HistoryStore, action: str = RETENTION_ACTION,
+                             on_delete: Optional[Callable[[str], None]] = None) -> RetentionSweeper:
+    """
+    Create a sweeper with the configured policy for a store.
+
+    A configuration the store cannot serve (e.g. the 'archive' action on
+    a store without an archive tier) is reported once, and the sweeper
+    then runs its extra tasks but expires no history, rather than
+    deleting sessions that were meant to be archived.
+
+    Args:
+        store: History store to sweep
+        action: 'delete' or 'archive'
+        on_delete: Called with each deleted session id
+
+    Returns:
+        New RetentionSweeper
+    """
+    try:
+        return RetentionSweeper(store, action=action, on_delete=on_delete)
+    except ValueError as e:
+        print(f"Error configuring history retention: {e}; history will not be expired")
+        return RetentionSweeper(store, RetentionPolicy(0, 0, 0), action='delete')
+
+
+_shared_sweeper: Optional[RetentionSweeper] = None
+_shared_sweeper_lock = threading.Lock()
+
+
+def get_retention_sweeper() -> RetentionSweeper:
+    """
+    Get the process-wide sweeper of the shared history store.
+
+    The sweeper is started on first use and runs every RETENTION_INTERVAL
+    seconds. Deleted sessions are also dropped from the shared search
+    index when ENABLE_HISTORY_INDEX is set.
+
+    Returns:
+        Shared RetentionSweeper instance
+    """
+    global _shared_sweeper
+    if _shared_sweeper is None:
+        with _shared_sweeper_lock:
+            if _shared_sweeper is None:
+                store = get_history_store()
+                on_delete = None
+                if ENABLE_HISTORY_INDEX and store.process_local:
+                    on_delete = get_history_index(store).clear_session
+                sweeper = create_retention_sweeper(store, on_delete=on_delete)
+                sweeper.start()
+                _shared_sweeper = sweeper
+    return _shared_sweeper
@@ -9,57 +9,132 @@ Phone: +91 93305 39277
 Year: 2026
 """
 
-from typing import Dict, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 import re
 from collections import Counter
 
+import numpy as np
+
+from message_preprocessor import AnalyzedMessage, analyze_message, tokenize, TOKEN_PATTERN
+from sentiment_lexicon import (
+    SentimentLexicon, NEGATION, INTENSIFIER, token_hash, lexicon_from_words, load_lexicon
+)
+from config import SENTIMENT_LEXICON_PATH
+
+
+# Sentiment labels indexed by the codes returned from analyze_batch
+SENTIMENT_LABELS = ('negative', 'neutral', 'positive')
+
+# Built-in lexicons, shared by every analyzer instance
+DEFAULT_POSITIVE_WORDS = frozenset({
+    'good', 'great', 'excellent', 'awesome', 'fantastic', 'wonderful',
+    'amazing', 'perfect', 'love', 'like', 'happy', 'glad', 'pleased',
+    'delighted', 'satisfied', 'thankful', 'grateful', 'appreciate',
+    'wonderful', 'brilliant', 'outstanding', 'superb', 'marvelous',
+    'terrific', 'fabulous', 'splendid', 'nice', 'cool', 'fine',
+    'okay', 'ok', 'yes', 'yeah', 'sure', 'definitely', 'absolutely'
+})
+
+DEFAULT_NEGATIVE_WORDS = frozenset({
+    'bad', 'terrible', 'awful', 'horrible', 'worst', 'hate', 'dislike',
+    'sad', 'angry', 'mad', 'frustrated', 'disappointed', 'upset',
+    'annoyed', 'irritated', 'depressed', 'miserable', 'unhappy',
+    'disgusting', 'pathetic', 'useless', 'stupid', 'dumb', 'idiot',
+    'no', 'not', 'never', 'can\'t', 'won\'t', 'don\'t', 'doesn\'t',
+    'shouldn\'t', 'wouldn\'t', 'couldn\'t', 'isn\'t', 'aren\'t'
+})
+
+DEFAULT_INTENSIFIERS = frozenset({
+    'very', 'extremely', 'really', 'quite', 'rather', 'too', 'so',
+    'incredibly', 'absolutely', 'completely', 'totally', 'utterly'
+})
+
+DEFAULT_NEGATIONS = frozenset({
+    'not', 'no', 'never', 'none', 'nobody', 'nothing', 'nowhere',
+    'neither', 'nor', 'cannot', 'can\'t', 'won\'t', 'don\'t'
+})
+
 
 class SentimentAnalyzer:
     """
     Analyzes sentiment of text using lexicon-based approach.
     Can be extended with ML models for better accuracy.
+    
+    Scoring sums the weights of matched lexicon entries: an entry directly
+    preceded by an intensifier is scaled by its multiplier, and one
+    directly preceded by a negation has its sign flipped. Without a
+    compiled lexicon file the built-in word lists weigh +1/-1 each.
     """
     
-    def __init__(self):
-        """Initialize sentiment analyzer with sentiment lexicons."""
-        # Positive words
-        self.positive_words = {
-            'good', 'great', 'excellent', 'awesome', 'fantastic', 'wonderful',
-            'amazing', 'perfect', 'love', 'like', 'happy', 'glad', 'pleased',
-            'delighted', 'satisfied', 'thankful', 'grateful', 'appreciate',
-            'wonderful', 'brilliant', 'outstanding', 'superb', 'marvelous',
-            'terrific', 'fabulous', 'splendid', 'nice', 'cool', 'fine',
-            'okay', 'ok', 'yes', 'yeah', 'sure', 'definitely', 'absolutely'
-        }
-        
-        # Negative words
-        self.negative_words = {
-            'bad', 'terrible', 'awful', 'horrible', 'worst', 'hate', 'dislike',
-            'sad', 'angry', 'mad', 'frustrated', 'disappointed', 'upset',
-            'annoyed', 'irritated', 'depressed', 'miserable', 'unhappy',
-            'disgusting', 'pathetic', 'useless', 'stupid', 'dumb', 'idiot',
-            'no', 'not', 'never', 'can\'t', 'won\'t', 'don\'t', 'doesn\'t',
-            'shouldn\'t', 'wouldn\'t', 'couldn\'t', 'isn\'t', 'aren\'t'
-        }
+    def __init__(self, lexicon_path: Optional[str] = None,
+                 positive_words: Optional[Iterable[str]] = None,
+                 negative_words: Optional[Iterable[str]] = None,
+                 intensifiers: Optional[Iterable[str]] = None,
+                 negations: Optional[Iterable[str]] = None):
+        """
+        Initialize sentiment analyzer with sentiment lexicons.
         
-        # Intensifiers
-        self.intensifiers = {
-            'very', 'extremely', 'really', 'quite', 'rather', 'too', 'so',
-            'incredibly', 'absolutely', 'completely', 'totally', 'utterly'
-        }
+        Args:
+            lexicon_path: Compiled weighted lexicon file (see
+                sentiment_lexicon.py); defaults to SENTIMENT_LEXICON_PATH
+                unless custom word lists are given, and the word lists are
+                used when no file is set
+            positive_words: Custom positive words (replace the built-in list)
+            negative_words: Custom negative words (replace the built-in list)
+            intensifiers: Custom intensifiers (replace the built-in list)
+            negations: Custom negation words (replace the built-in list)
+        """
+        word_lists = (positive_words, negative_words, intensifiers, negations)
+        custom = any(words is not None for words in word_lists)
+        self.positive_words = frozenset(positive_words) if positive_words is not None else DEFAULT_POSITIVE_WORDS
+        self.negative_words = frozenset(negative_words) if negative_words is not None else DEFAULT_NEGATIVE_WORDS
+        self.intensifiers = frozenset(intensifiers) if intensifiers is not None else DEFAULT_INTENSIFIERS
+        self.negations = frozenset(negations) if negations is not None else DEFAULT_NEGATIONS
+        self.lexicon_path = lexicon_path or (None if custom else SENTIMENT_LEXICON_PATH)
         
-        # Negation words
-        self.negations = {
-            'not', 'no', 'never', 'none', 'nobody', 'nothing', 'nowhere',
-            'neither', 'nor', 'cannot', 'can\'t', 'won\'t', 'don\'t'
-        }
+        self._cache_token = None
+        self._lexicon = None
+    
+    @property
+    def cache_token(self) -> int:
+        """Value that changes whenever the lexicons change (see refresh)."""
+        if self._cache_token is None:
+            self._cache_token = hash((
+                frozenset(self.positive_words), frozenset(self.negative_words),
+                frozenset(self.intensifiers), frozenset(self.negations),
+                self.lexicon_path
+            ))
+        return self._cache_token
+    
+    @property
+    def lexicon(self) -> SentimentLexicon:
+        """Lexicon used for scoring (the shared compiled file, or the word lists)."""
+        if self._lexicon is None:
+            if self.lexicon_path:
+                try:
+                    self._lexicon = load_lexicon(self.lexicon_path)
+                except (OSError, ValueError) as e:
+                    print(f"Error loading sentiment lexicon: {e}")
+                    self.lexicon_path = None
+                    self._cache_token = None
+            if self._lexicon is None:
+                self._lexicon = lexicon_from_words(
+                    frozenset(self.positive_words), frozenset(self.negative_words),
+                    frozenset(self.intensifiers), frozenset(self.negations)
+                )
+        return self._lexicon
     
-    def analyze(self, text: str) -> Dict[str, any]:
+    def refresh(self):
+        """Call after modifying the lexicons so cached analyses are not reused."""
+        self._cache_token = None
+        self._lexicon = None
+    
+    def analyze(self, text: Union[str, AnalyzedMessage]) -> Dict[str, any]:
         """
         Analyze sentiment of text.
         
         Args:
-            text: Input text to analyze
+            text: Input text (or preprocessed message) to analyze
             
         Returns:
             Dictionary with sentiment analysis results:
@@ -71,7 +146,8 @@ class SentimentAnalyzer:
                 'negative_words': list
             }
         """
-        if not text or not text.strip():
+        message = analyze_message(text)
+        if message.is_empty:
             return {
                 'sentiment': 'neutral',
                 'score': 0.0,
@@ -80,47 +156,44 @@ class SentimentAnalyzer:
                 'negative_words': []
             }
         
-        text_lower = text.lower()
-        words = re.findall(r'\b\w+\b', text_lower)
+        words = message.tokens
         
-        positive_count = 0
-        negative_count = 0
+        positive_weight = 0.0
+        negative_weight = 0.0
         found_positive = []
         found_negative = []
         
-        # Check for negations
-        has_negation = any(neg in text_lower for neg in self.negations)
-        
-        # Analyze each word
-        for i, word in enumerate(words):
-            # Check for positive words
-            if word in self.positive_words:
-                # Check if negated
-                if has_negation and i > 0 and words[i-1] in self.negations:
-                    negative_count += 1
-                    found_negative.append(word)
+        # Analyze each matched word or phrase
+        previous_end = -1
+        previous_flags = 0
+        for start, end, weight, multiplier, flags in self.lexicon.match(words):
+            if weight:
+                if previous_end == start:
+                    if previous_flags & INTENSIFIER:
+                        weight = weight * previous_multiplier
+                    if previous_flags & NEGATION:
+                        weight = -weight
+                
+                phrase = words[start] if end - start == 1 else ' '.join(words[start:end])
+                if weight > 0:
+                    positive_weight += weight
+                    found_positive.append(phrase)
                 else:
-                    positive_count += 1
-                    found_positive.append(word)
+                    negative_weight += -weight
+                    found_negative.append(phrase)
             
-            # Check for negative words
-            elif word in self.negative_words:
-                # Check if negated
-                if has_negation and i > 0 and words[i-1] in self.negations:
-                    positive_count += 1
-                    found_positive.append(word)
-                else:
-                    negative_count += 1
-                    found_negative.append(word)
+            previous_end = end
+            previous_flags = flags
+            previous_multiplier = multiplier
         
         # Calculate sentiment score
-        total_sentiment_words = positive_count + negative_count
-        if total_sentiment_words == 0:
+        total_weight = positive_weight + negative_weight
+        if total_weight == 0:
             score = 0.0
             sentiment = 'neutral'
             confidence = 0.0
         else:
-            score = (positive_count - negative_count) / max(total_sentiment_words, 1)
+            score = (positive_weight - negative_weight) / total_weight
             
             if score > 0.1:
                 sentiment = 'positive'
@@ -139,6 +212,92 @@ class SentimentAnalyzer:
             'negative_words': list(set(found_negative))
         }
     
+    def analyze_batch(self, texts: List[Union[str, AnalyzedMessage]]) -> Dict[str, np.ndarray]:
+        """
+        Analyze the sentiment of many texts at once.
+        
+        Tokens are hashed once and all messages are matched against the
+        lexicon together with NumPy over one flat token array plus
+        offsets, so per-message cost is just tokenization. Sentiment, score
+        and confidence equal those returned by analyze() for each text;
+        matched word lists are not produced.
+        
+        Args:
+            texts: Input texts (or preprocessed messages)
+            
+        Returns:
+            Dictionary of arrays, one element per text:
+            {
+                'sentiment': int8 codes indexing SENTIMENT_LABELS,
+                'score': float64,
+                'confidence': float64
+            }
+        """
+        lexicon = self.lexicon
+        
+        # Flat token hash array plus per-message offsets into it
+        hashes: List[int] = []
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        for index, text in enumerate(texts):
+            if isinstance(text, AnalyzedMessage):
+                tokens = text.tokens
+            elif not text:
+                tokens = ()
+            elif text.isascii():
+                tokens = TOKEN_PATTERN.findall(text.lower())
+            else:
+                tokens = tokenize(text)[0]
+            hashes.extend([token_hash(token) for token in tokens])
+            offsets[index + 1] = len(hashes)
+        
+        lengths, entries = lexicon.longest_entries(np.array(hashes, dtype=np.uint64), offsets)
+        
+        # Leftmost-longest selection only visits positions where an entry starts
+        starts = []
+        covered = 0
+        for start in np.flatnonzero(lengths).tolist():
+            if start >= covered:
+                starts.append(start)
+                covered = start + int(lengths[start])
+        starts = np.array(starts, dtype=np.int64)
+        ends = starts + lengths[starts]
+        matched = entries[starts]
+        owners = np.searchsorted(offsets, starts, side='right') - 1
+        
+        # Intensifiers and negations apply to the directly preceding match
+        previous = np.concatenate(([-1], matched[:-1])).astype(np.int64)
+        adjacent = np.zeros(len(starts), dtype=bool)
+        adjacent[1:] = (ends[:-1] == starts[1:]) & (owners[:-1] == owners[1:])
+        previous_flags = np.where(adjacent, lexicon.flags[previous], 0)
+        
+        weights = lexicon.weights[matched]
+        weights = weights * np.where(previous_flags & INTENSIFIER, lexicon.multipliers[previous], 1.0)
+        weights = np.where(previous_flags & NEGATION, -weights, weights)
+        
+        positive = np.bincount(owners, weights=np.where(weights > 0, weights, 0.0), minlength=len(texts))
+        negative = np.bincount(owners, weights=np.where(weights < 0, -weights, 0.0), minlength=len(texts))
+        
+        # Score each distinct (positive, negative) pair with the same Python
+        # arithmetic and rounding as analyze(), then scatter the results
+        pairs = np.stack([positive, negative], axis=1)
+        unique_pairs, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        codes = np.empty(len(unique_pairs), dtype=np.int8)
+        scores = np.empty(len(unique_pairs), dtype=np.float64)
+        confidences = np.empty(len(unique_pairs), dtype=np.float64)
+        for row, (positive_weight, negative_weight) in enumerate(unique_pairs.tolist()):
+            total = positive_weight + negative_weight
+            score = (positive_weight - negative_weight) / total if total else 0.0
+            codes[row] = 2 if score > 0.1 else 0 if score < -0.1 else 1
+            scores[row] = round(score, 3)
+            confidences[row] = round(min(abs(score) * 2, 1.0), 3) if total else 0.0
+        
+        inverse = inverse.reshape(-1)
+        return {
+            'sentiment': codes[inverse],
+            'score': scores[inverse],
+            'confidence': confidences[inverse]
+        }
+    
     def get_sentiment_label(self, text: str) -> str:
         """
         Get simple sentiment label.
@@ -0,0 +1,405 @@
+"""
+Sentiment Lexicon Module
+Compact read-only weighted sentiment lexicons with phrase and intensifier support.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+from functools import lru_cache
+import argparse
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+
+import numpy as np
+
+from message_preprocessor import tokenize
+
+
+MAGIC = b'SLX1'
+VERSION = 1
+
+# magic, version, entry count, longest phrase in tokens
+HEADER = struct.Struct('<4sIII')
+
+# Entry flag bits
+NEGATION = 1
+INTENSIFIER = 2
+
+KINDS = ('sentiment', 'intensifier', 'negation')
+
+# Phrase hashes fold 64-bit token hashes FNV-style, so n-gram hashes can be
+# extended one token at a time (and computed for whole arrays with NumPy)
+_OFFSET = 0xcbf29ce484222325
+_PRIME = 0x100000001b3
+_MASK = 0xffffffffffffffff
+
+
+@lru_cache(maxsize=65536)
+def token_hash(token: str) -> int:
+    """
+    Get the 64-bit hash of a normalized token.
+
+    Args:
+        token: Normalized token
+
+    Returns:
+        Unsigned 64-bit hash
+    """
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def phrase_hash(tokens: Sequence[str]) -> int:
+    """
+    Get the 64-bit hash of a normalized token sequence.
+
+    Args:
+        tokens: Normalized tokens
+
+    Returns:
+        Unsigned 64-bit hash
+    """
+    value = _OFFSET
+    for token in tokens:
+        value = (value * _PRIME + token_hash(token)) & _MASK
+    return value
+
+
+def _build_arrays(entries: Iterable[Tuple[str, float, str]]):
+    """Merge (phrase, weight, kind) entries into sorted lexicon arrays."""
+    merged: Dict[int, List] = {}
+    max_tokens = 0
+    for phrase, weight, kind in entries:
+        if kind not in KINDS:
+            raise ValueError(f"Unknown lexicon entry kind: {kind}")
+        tokens, _ = tokenize(phrase)
+        if not tokens:
+            continue
+        max_tokens = max(max_tokens, len(tokens))
+        # [sentiment weight, intensifier multiplier, flags]; first value wins
+        entry = merged.setdefault(phrase_hash(tokens), [None, None, 0])
+        if kind == 'sentiment' and entry[0] is None:
+            entry[0] = float(weight)
+        elif kind == 'intensifier' and entry[1] is None:
+            entry[1] = float(weight)
+            entry[2] |= INTENSIFIER
+        elif kind == 'negation':
+            entry[2] |= NEGATION
+
+    keys = sorted(merged)
+    hashes = np.array(keys, dtype=np.uint64)
+    weights = np.array([merged[key][0] or 0.0 for key in keys], dtype=np.float64)
+    multipliers = np.array([1.0 if merged[key][1] is None else merged[key][1] for key in keys],
+                           dtype=np.float64)
+    flags = np.array([merged[key][2] for key in keys], dtype=np.uint8)
+    return hashes, weights, multipliers, flags, max_tokens
+
+
+def compile_lexicon(entries: Iterable[Tuple[str, float, str]], path: str) -> Dict[str, int]:
+    """
+    Compile weighted lexicon entries into a memory-mappable file.
+
+    Phrases are tokenized and normalized exactly like user messages. A
+    phrase may appear with several kinds (e.g. 'absolutely' as both a
+    sentiment term and an intensifier); for repeated kinds the first
+    entry wins.
+
+    File layout (little-endian):
+        header      HEADER struct
+        hashes      entries x u64 phrase hashes, sorted
+        weights     entries x f64 sentiment weights (0 = none)
+        multipliers entries x f64 intensifier multipliers (1 = none)
+        flags       entries x u8 NEGATION / INTENSIFIER bits
+
+    Args:
+        entries: Iterable of (phrase, weight, kind) with kind in KINDS
+        path: Output file path
+
+    Returns:
+        Dictionary with entry count and longest phrase length
+    """
+    hashes, weights, multipliers, flags, max_tokens = _build_arrays(entries)
+
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(hashes), max_tokens))
+        for array in (hashes, weights, multipliers, flags):
+            f.write(array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes())
+    os.replace(temp_path, path)
+
+    return {'entries': len(hashes), 'max_tokens': max_tokens}
+
+
+class SentimentLexicon:
+    """
+    Read-only weighted lexicon stored as a sorted hash array.
+
+    Lookups binary search the phrase hash array, so a lexicon of any size
+    costs one array per field. Lexicons opened from a file are
+    memory-mapped and shared by worker processes through the OS page cache.
+    """
+
+    def __init__(self, hashes: np.ndarray, weights: np.ndarray, multipliers: np.ndarray,
+                 flags: np.ndarray, max_tokens: int, source=None):
+        """
+        Wrap lexicon arrays (see from_entries and open).
+
+        Args:
+            hashes: Sorted u64 phrase hashes
+            weights: Sentiment weight per entry
+            multipliers: Intensifier multiplier per entry
+            flags: NEGATION / INTENSIFIER bits per entry
+            max_tokens: Longest phrase in tokens
+            source: Object backing the arrays (kept open)
+        """
+        self.hashes = hashes
+        self.weights = weights
+        self.multipliers = multipliers
+        self.flags = flags
+        self.max_tokens = max_tokens
+        self._source = source
+        # Plain memoryviews give fast scalar access for single-message matching
+        self._hash_view = memoryview(np.ascontiguousarray(hashes)).cast('B').cast('Q')
+        self._weight_view = memoryview(np.ascontiguousarray(weights)).cast('B').cast('d')
+        self._multiplier_view = memoryview(np.ascontiguousarray(multipliers)).cast('B').cast('d')
+        self._flag_view = memoryview(np.ascontiguousarray(flags)).cast('B')
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[str, float, str]]) -> 'SentimentLexicon':
+        """
+        Build an in-memory lexicon.
+
+        Args:
+            entries: Iterable of (phrase, weight, kind) with kind in KINDS
+
+        Returns:
+            SentimentLexicon
+        """
+        return cls(*_build_arrays(entries))
+
+    @classmethod
+    def open(cls, path: str) -> 'SentimentLexicon':
+        """
+        Memory-map a compiled lexicon file.
+
+        Args:
+            path: Path produced by compile_lexicon
+
+        Returns:
+            SentimentLexicon
+        """
+        if sys.byteorder != 'little':
+            raise OSError("Lexicon files can only be mapped on little-endian hosts")
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, max_tokens = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a sentiment lexicon file: {path}")
+
+        offset = HEADER.size
+        arrays = []
+        for dtype in (np.uint64, np.float64, np.float64, np.uint8):
+            arrays.append(np.frombuffer(mapped, dtype=dtype, count=count, offset=offset))
+            offset += count * np.dtype(dtype).itemsize
+        return cls(*arrays, max_tokens, source=mapped)
+
+    def __len__(self) -> int:
+        """Number of entries."""
+        return len(self.hashes)
+
+    def find(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Look up many phrase hashes at once.
+
+        Args:
+            hashes: u64 phrase hashes
+
+        Returns:
+            Entry index for each hash, or -1 where it is not in the lexicon
+        """
+        if not len(self.hashes):
+            return np.full(len(hashes), -1, dtype=np.int64)
+        positions = np.searchsorted(self.hashes, hashes)
+        clipped = np.minimum(positions, len(self.hashes) - 1)
+        return np.where(self.hashes[clipped] == hashes, clipped, -1)
+
+    def longest_entries(self, token_hashes: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the longest entry starting at every token of a token stream.
+
+        Args:
+            token_hashes: u64 token hashes of all messages, concatenated
+            offsets: Start of each message in token_hashes, plus the total
+
+        Returns:
+            Tuple of (match length in tokens, entry index) per token, with
+            length 0 where no entry starts
+        """
+        count = len(token_hashes)
+        lengths = np.zeros(count, dtype=np.int64)
+        entries = np.full(count, -1, dtype=np.int64)
+        if not count:
+            return lengths, entries
+
+        # Tokens left in the message from each position (phrases never cross messages)
+        owner_ends = np.repeat(offsets[1:], np.diff(offsets))
+        remaining = owner_ends - np.arange(count)
+
+        ngrams = np.full(count, _OFFSET, dtype=np.uint64)
+        prime = np.uint64(_PRIME)
+        with np.errstate(over='ignore'):
+            for n in range(1, self.max_tokens + 1):
+                ngrams[:count - n + 1] = ngrams[:count - n + 1] * prime + token_hashes[n - 1:]
+                valid = np.flatnonzero(remaining[:count - n + 1] >= n)
+                if not len(valid):
+                    break
+                found = self.find(ngrams[valid])
+                hit = found >= 0
+                lengths[valid[hit]] = n
+                entries[valid[hit]] = found[hit]
+        return lengths, entries
+
+    def _find_one(self, value: int) -> int:
+        """Entry index of one phrase hash, or -1."""
+        view = self._hash_view
+        position = bisect.bisect_left(view, value)
+        if position < len(view) and view[position] == value:
+            return position
+        return -1
+
+    def match(self, tokens: Sequence[str]) -> List[Tuple[int, int, float, float, int]]:
+        """
+        Find leftmost-longest, non-overlapping entries in a message.
+
+        Args:
+            tokens: Normalized tokens
+
+        Returns:
+            List of (start, end, weight, multiplier, flags) tuples
+        """
+        if not tokens or not len(self.hashes):
+            return []
+        hashes = [token_hash(token) for token in tokens]
+        count = len(hashes)
+        find_one = self._find_one
+
+        matches = []
+        start = 0
+        while start < count:
+            best_end = 0
+            best_entry = -1
+            value = _OFFSET
+            for end in range(start + 1, min(count, start + self.max_tokens) + 1):
+                value = (value * _PRIME + hashes[end - 1]) & _MASK
+                entry = find_one(value)
+                if entry >= 0:
+                    best_end = end
+                    best_entry = entry
+            if best_entry < 0:
+                start += 1
+                continue
+            matches.append((start, best_end, self._weight_view[best_entry],
+                            self._multiplier_view[best_entry], self._flag_view[best_entry]))
+            start = best_end
+        return matches
+
+
+@lru_cache(maxsize=8)
+def lexicon_from_words(positive: FrozenSet[str], negative: FrozenSet[str],
+                       intensifiers: FrozenSet[str], negations: FrozenSet[str]) -> SentimentLexicon:
+    """
+    Build an unweighted lexicon from word sets (positive wins over negative).
+
+    Positive and negative words weigh +1 and -1 and intensifiers multiply
+    by 1, so weighted scoring reduces to plain word counts. Word lists are
+    looked up one token at a time, so only words that are exactly one
+    normalized token are kept: contractions such as "don't" split into two
+    tokens and never matched. Identical sets share one cached lexicon.
+
+    Returns:
+        SentimentLexicon
+    """
+    def single_tokens(words: FrozenSet[str]) -> List[str]:
+        return sorted(word for word in words if tokenize(word)[0] == [word])
+
+    entries = [(word, 1.0, 'sentiment') for word in single_tokens(positive)]
+    entries += [(word, -1.0, 'sentiment') for word in single_tokens(negative - positive)]
+    entries += [(word, 1.0, 'intensifier') for word in single_tokens(intensifiers)]
+    entries += [(word, 0.0, 'negation') for word in single_tokens(negations)]
+    return SentimentLexicon.from_entries(entries)
+
+
+_loaded: Dict[str, SentimentLexicon] = {}
+_loaded_lock = threading.Lock()
+
+
+def load_lexicon(path: str) -> SentimentLexicon:
+    """
+    Get the process-wide lexicon for a compiled file, mapping it on first use.
+
+    Args:
+        path: Path produced by compile_lexicon
+
+    Returns:
+        Shared SentimentLexicon instance
+    """
+    key = os.path.abspath(path)
+    with _loaded_lock:
+        if key not in _loaded:
+            _loaded[key] = SentimentLexicon.open(key)
+        return _loaded[key]
+
+
+def read_lexicon_tsv(path: str):
+    """
+    Read lexicon entries from a TSV file.
+
+    Each line is 'phrase<TAB>weight[<TAB>kind]' where kind is one of KINDS
+    (default 'sentiment'); blank lines and lines starting with '#' are
+    skipped.
+
+    Args:
+        path: TSV file path
+
+    Returns:
+        Iterator of (phrase, weight, kind) tuples
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) < 2:
+                raise ValueError(f"{path}:{line_number}: expected phrase<TAB>weight[<TAB>kind]")
+            kind = fields[2].strip() if len(fields) > 2 and fields[2].strip() else 'sentiment'
+            yield fields[0], float(fields[1]), kind
+
+
+def main():
+    """Compile TSV lexicons into a lexicon file."""
+    parser = argparse.ArgumentParser(description="Compile weighted sentiment lexicons")
+    parser.add_argument('output', help="Output lexicon file")
+    parser.add_argument('lexicons', nargs='+', help="TSV files of phrase, weight and optional kind")
+    args = parser.parse_args()
+
+    def entries():
+        for path in args.lexicons:
+            yield from read_lexicon_tsv(path)
+
+    stats = compile_lexicon(entries(), args.output)
+    print(f"Compiled {stats['entries']} entries "
+          f"(longest phrase {stats['max_tokens']} tokens) into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+spaCy Entity Extraction Module
+Optional spaCy NER backend with lazy model loading and batched processing.
+
+Developer: RSK World
+Website: https://rskworld.in
+Email: help@rskworld.in
+Phone: +91 93305 39277
+Year: 2026
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Union
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+from entity_extractor import EntityExtractor
+from message_preprocessor import AnalyzedMessage
+from config import (
+    SPACY_MODEL, SPACY_BATCH_SIZE, SPACY_N_PROCESS,
+    SPACY_MICROBATCH_WAIT_MS, SPACY_MICROBATCH_MAX_SIZE
+)
+
+
+# spaCy labels mapped onto the bot's entity types
+SPACY_LABELS = {
+    'PERSON': 'PERSON',
+    'GPE': 'LOCATION',
+    'LOC': 'LOCATION',
+    'FAC': 'LOCATION',
+    'ORG': 'ORGANIZATION',
+    'DATE': 'DATE',
+    'TIME': 'TIME',
+    'MONEY': 'MONEY',
+    'PERCENT': 'PERCENT',
+}
+
+# Pipeline components the bot never uses; excluding them skips loading them
+UNUSED_COMPONENTS = ['tagger', 'parser', 'attribute_ruler', 'lemmatizer',
+                     'morphologizer', 'senter', 'textcat', 'textcat_multilabel']
+
+# Entity types spaCy models do not produce; these still come from the regex scanner
+FALLBACK_TYPES = ('EMAIL', 'PHONE')
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent single-item requests into small batches.
+
+    The first waiting request opens a batch that closes after max_wait_ms or
+    once max_batch_size requests have arrived, then batch_fn runs once for
+    the whole batch on a background thread.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = SPACY_MICROBATCH_MAX_SIZE,
+                 max_wait_ms: float = SPACY_MICROBATCH_WAIT_MS):
+        """
+        Initialize the batcher.
+
+        Args:
+            batch_fn: Function mapping a list of items to a list of results
+            max_batch_size: Maximum number of items per batch
+            max_wait_ms: Maximum time to wait for more items
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queue an item for the next batch.
+
+        Args:
+            item: Item to process
+
+        Returns:
+            Future resolving to the item's result
+        """
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def process(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Process one item through the batcher and wait for its result.
+
+        Args:
+            item: Item to process
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Result for the item
+        """
+        return self.submit(item).result(timeout)
+
+    def close(self):
+        """Stop the batcher after the queued items are processed."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            pending = [first]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stop = True
+                    break
+                pending.append(entry)
+
+            self._dispatch(pending)
+            if stop:
+                return
+
+    def _dispatch(self, pending):
+        self.batches += 1
+        self.items += len(pending)
+        try:
+            results = list(self.batch_fn([item for item, _ in pending]))
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            future.set_result(result)
+        # A short result list must not leave callers waiting forever
+        for _, future in pending[len(results):]:
+            future.set_exception(RuntimeError(
+                f"Batch function returned {len(results)} results for {len(pending)} items"
+            ))
+
+
+class SpacyEntityExtractor:
+    """
+    Entity extractor backed by a local spaCy model.
+
+    The model is loaded on first use with unused pipeline components
+    excluded. Output has the same Dict[str, List[str]] shape as
+    EntityExtractor.extract; EMAIL and PHONE, which spaCy does not tag,
+    come from the regex extractor. If spaCy or the model is not
+    installed, the error is reported once and the regex extractor is
+    used for everything.
+    """
+
+    def __init__(self, model: str = SPACY_MODEL, batch_size: int = SPACY_BATCH_SIZE,
+                 n_process: int = SPACY_N_PROCESS, micro_batching: bool = True,
+                 fallback: Optional[EntityExtractor] = None):
+        """
+        Initialize the spaCy extractor.
+
+        Args:
+            model: Installed spaCy model name or model directory
+            batch_size: Texts per nlp.pipe batch
+            n_process: Worker processes used by nlp.pipe
+            micro_batching: Group concurrent extract() calls into batches
+            fallback: Regex extractor for entity types spaCy does not tag
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.micro_batching = micro_batching
+        self.fallback = fallback or EntityExtractor()
+        self._nlp = None
+        self._unavailable = False
+        self._batcher: Optional[MicroBatcher] = None
+        self._lock = threading.Lock()
+
+    @property
+    def nlp(self):
+        """Loaded spaCy pipeline (loaded on first access)."""
+        if self._nlp is None:
+            with self._lock:
+                if self._nlp is None:
+                    try:
+                        import spacy
+                    except ImportError as e:
+                        raise ImportError("The spaCy entity backend requires spaCy") from e
+                    self._nlp = spacy.load(self.model, exclude=UNUSED_COMPONENTS)
+        return self._nlp
+
+    @property
+    def available(self) -> bool:
+        """
+        Whether the spaCy model can be used, loading it on first call.
+
+        Returns False, after printing the error once, if spaCy or the
+        model is missing.
+        """
+        if self._nlp is None and not self._unavailable:
+            try:
+                self.nlp
+            except (ImportError, OSError) as e:
+                print(f"Error loading spaCy model, using regex entities: {e}")
+                self._unavailable = True
+        return not self._unavailable
+
+    @property
+    def cache_token(self) -> tuple:
+        """Value identifying the model and fallback patterns."""
+        if self._unavailable:
+            return self.fallback.cache_token
+        return ('spacy', self.model, self.fallback.cache_token)
+
+    def _entities(self, doc, text: str) -> Dict[str, List[str]]:
+        """Convert a spaCy Doc into the bot's entity dictionary."""
+        entities: Dict[str, List[str]] = {}
+        for ent in doc.ents:
+            entity_type = SPACY_LABELS.get(ent.label_)
+            if entity_type is None:
+                continue
+            values = entities.setdefault(entity_type, [])
+            if ent.text not in values:
+                values.append(ent.text)
+
+        fallback = self.fallback.extract(text)
+        for entity_type in FALLBACK_TYPES:
+            if entity_type in fallback:
+                entities[entity_type] = fallback[entity_type]
+        return entities
+
+    def extract_batch(self, texts: List[Union[str, AnalyzedMessage]],
+                      batch_size: Optional[int] = None,
+                      n_process: Optional[int] = None) -> List[Dict[str, List[str]]]:
+        """
+        Extract entities from many texts with nlp.pipe.
+
+        Args:
+            texts: Input texts (or preprocessed messages)
+            batch_size: Texts per batch (defaults to the configured size)
+            n_process: Worker processes (defaults to the configured count)
+
+        Returns:
+            List of entity dictionaries in input order
+        """
+        if not self.available:
+            return [self.fallback.extract(text) for text in texts]
+        raw = [text.text if isinstance(text, AnalyzedMessage) else (text or '') for text in texts]
+        docs = self.nlp.pipe(raw, batch_size=batch_size or self.batch_size,
+                             n_process=n_process or self.n_process)
+        return [self._entities(doc, text) for doc, text in zip(docs, raw)]
+
+    def extract(self, text: Union[str, AnalyzedMessage]) -> Dict[str, List[str]]:
+        """
+        Extract entities from one text.
+
+        With micro-batching enabled, concurrent calls from different
+        sessions are processed together in one nlp.pipe batch.
+
+        Args:
+            text: Input text (or preprocessed message)
+
+        Returns:
+            Dictionary mapping entity types to extracted values
+        """
+        if not self.micro_batching or not self.available:
+            return self.extract_batch([text], n_process=1)[0]
+        if self._batcher is None:
+            with self._lock:
+                if self._batcher is None:
+                    self._batcher = MicroBatcher(
+                        lambda items: self.extract_batch(items, n_process=1)
+                    )
+        return self._batcher.process(text)
+
+    def close(self):
+        """Stop the micro-batching thread."""
+        if self._batcher is not None:
+            self._batcher.close()
+            self._batcher = None
+
+
+_shared_extractor: Optional[SpacyEntityExtractor] = None
+_shared_lock = threading.Lock()
+
+
+def get_spacy_extractor() -> SpacyEntityExtractor:
+    """
+    Get the process-wide spaCy extractor.
+
+    Sharing one instance means the model is loaded once per process and
+    turns from all sessions feed the same micro-batching queue.
+
+    Returns:
+        Shared SpacyEntityExtractor
+    """
+    global _shared_extractor
+    if _shared_extractor is None:
+        with _shared_lock:
+            if _shared_extractor is None:
+                _shared_extractor = SpacyEntityExtractor()
+    return _shared_extractor
@@ -8,10 +8,59 @@ Year: 2026
 """
 
 import unittest
+import importlib.util
+import tempfile
+import os
+import re
+import time
 from chatbot import ConversationalAIBot
 from intent_recognizer import IntentRecognizer
+from intent_classifier import IntentClassifier, artifact_dir
 from entity_extractor import EntityExtractor
-from context_manager import ContextManager
+from context_manager import ContextManager, RingBuffer
+from nlu_cache import NLUCache
+from message_preprocessor import AnalyzedMessage
+from gazetteer import compile_gazetteer, Gazetteer
+from spacy_extractor import MicroBatcher, SpacyEntityExtractor
+from regex_guard import clip_input, chunked_finditer
+from sentiment_analyzer import SentimentAnalyzer, SENTIMENT_LABELS
+from sentiment_lexicon import compile_lexicon
+from language_support import LanguageSupport
+from language_pipeline import PipelineRegistry
+from history_store import (
+    JSONLHistoryStore, SQLiteHistoryStore, ShardedHistoryStore, JSONFileHistoryStore, create_history_store
+)
+from conversation_history import ConversationHistory
+from history_segment import write_segment, read_history_sessions, HistorySegment
+from history_archive import HistoryArchive, TieredHistoryStore
+from history_index import HistoryIndex, PostingList
+from retention import RetentionPolicy, RetentionSweeper, create_retention_sweeper
+from context_store import (
+    ConflictError, ContextCache, MemoryContextStore, SQLiteContextStore, FileContextStore, KeyValueContextStore
+)
+from datetime import datetime, timedelta
+import json
+import multiprocessing
+import threading
+
+# Runtime files (history shards, archives, the context store) that the
+# bots under test create in the working directory go to a temporary one
+_runtime_dir = None
+_original_cwd = None
+
+
+def setUpModule():
+    """Run the tests from a temporary working directory."""
+    global _runtime_dir, _original_cwd
+    _runtime_dir = tempfile.TemporaryDirectory()
+    _original_cwd = os.getcwd()
+    os.chdir(_runtime_dir.name)
+
+
+def tearDownModule():
+    """Return to the original working directory."""
+    os.chdir(_original_cwd)
+    _runtime_dir.cleanup()
 
 
 class TestIntentRecognizer(unittest.TestCase):
@@ -38,6 +87,63 @@ class TestIntentRecognizer(unittest.TestCase):
         intent, confidence = self.recognizer.recognize("My name is John")
         self.assertEqual(intent, "name_introduction")
         self.assertGreater(confidence, 0.5)
+    
+    def test_added_intent(self):
+        """Test that intents added at runtime are compiled into the engine."""
+        self.recognizer.recognize("Hello")
+        self.recognizer.add_intent('order_status', ['order', 'tracking'],
+                                   [r'where\s+is\s+my\s+order'], 0.9)
+        intent, confidence = self.recognizer.recognize("Where is my order?")
+        self.assertEqual(intent, "order_status")
+        self.assertGreater(confidence, 0.5)
+    
+    def test_recognize_batch_matches_recognize(self):
+        """Test that batch scoring agrees with single-message scoring."""
+        texts = ["Hello", "What is this?", "My name is John", "thanks, bye!",
+                 "what time is it", "", "   ", "Hello", "no idea"]
+        expected = [self.recognizer.recognize(text) for text in texts]
+        self.assertEqual(self.recognizer.recognize_batch(texts), expected)
+
+
+@unittest.skipUnless(importlib.util.find_spec('sklearn'), "scikit-learn not installed")
+class TestIntentClassifier(unittest.TestCase):
+    """Test the scikit-learn intent classifier backend."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.model_dir = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.model_dir.name, 'intent_model')
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.model_dir.cleanup()
+    
+    def test_trained_backend(self):
+        """Test that the artifact is saved once and reloaded for inference."""
+        recognizer = IntentRecognizer(backend='sklearn', model_path=self.model_path)
+        intent, confidence = recognizer.recognize("hello there")
+        self.assertEqual(intent, "greeting")
+        self.assertTrue(os.path.exists(os.path.join(artifact_dir(self.model_path), 'weights.npy')))
+        
+        reloaded = IntentRecognizer(backend='sklearn', model_path=self.model_path)
+        self.assertEqual(reloaded.recognize("hello there"), (intent, confidence))
+        self.assertEqual(reloaded.recognize(""), ("unknown", 0.0))
+        
+        # Retraining changes the cache token even if the new model reuses the old one's id
+        token = reloaded.cache_token
+        reloaded.train(["hello there"], ["greeting"])
+        self.assertNotEqual(reloaded.cache_token, token)
+    
+    def test_versioned_publish(self):
+        """Test that saves publish new versions and retire old ones."""
+        classifier = IntentClassifier()
+        classifier.train(["hello there", "goodbye now", "hi friend", "bye bye"],
+                         ["greeting", "goodbye", "greeting", "goodbye"])
+        for _ in range(3):
+            classifier.save(self.model_path)
+        self.assertEqual(artifact_dir(self.model_path), os.path.join(self.model_path, 'v3'))
+        self.assertEqual(sorted(os.listdir(self.model_path)), ['CURRENT', 'v2', 'v3'])
+        self.assertEqual(IntentClassifier.load(self.model_path).predict("hello")[0], "greeting")
 
 
 class TestEntityExtractor(unittest.TestCase):
@@ -58,6 +164,1100 @@ class TestEntityExtractor(unittest.TestCase):
         entities = self.extractor.extract("My email is test@example.com")
         self.assertIn("EMAIL", entities)
         self.assertIn("test@example.com", entities["EMAIL"])
+    
+    def test_entity_spans(self):
+        """Test that spans point at the extracted values."""
+        text = "Call 555-123-4567 at 10:30 pm tomorrow in New York"
+        spans = self.extractor.extract_spans(text)
+        self.assertEqual([span['type'] for span in spans],
+                         ["PHONE", "TIME", "DATE", "LOCATION"])
+        for span in spans:
+            self.assertEqual(text[span['start']:span['end']].lower(), span['value'].lower())
+
+
+class TestAnalyzedMessage(unittest.TestCase):
+    """Test the shared message preprocessing pass."""
+    
+    def test_preprocessing(self):
+        """Test normalized text, token offsets and flags."""
+        message = AnalyzedMessage("  Hello Straße, mail me@x.io at 5 ")
+        self.assertEqual(message.normalized, "hello strasse, mail me@x.io at 5")
+        self.assertEqual(message.tokens[:2], ("hello", "strasse"))
+        start, end = message.offsets[1]
+        self.assertEqual(message.text[start:end], "Straße")
+        self.assertTrue(message.has_at and message.has_digit and message.has_upper)
+        self.assertFalse(message.is_ascii)
+        with self.assertRaises(AttributeError):
+            message.text = "changed"
+    
+    def test_stages_accept_analyzed_message(self):
+        """Test that NLU stages give the same results for analyzed messages."""
+        text = "I am not happy, my email is test@example.com"
+        message = AnalyzedMessage(text)
+        self.assertEqual(IntentRecognizer().recognize(message), IntentRecognizer().recognize(text))
+        self.assertEqual(EntityExtractor().extract(message), EntityExtractor().extract(text))
+
+
+class TestGazetteer(unittest.TestCase):
+    """Test gazetteer-backed entity lookup."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'places.gzt')
+        compile_gazetteer([('New York', 'LOCATION'), ('New York City', 'LOCATION'),
+                           ('Priya', 'PERSON')], self.path)
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.temp_dir.cleanup()
+    
+    def test_longest_match(self):
+        """Test leftmost-longest matching over tokens."""
+        gazetteer = Gazetteer(self.path)
+        tokens = ['priya', 'likes', 'new', 'york', 'city']
+        self.assertEqual(gazetteer.longest_matches(tokens),
+                         [(0, 1, 'PERSON'), (2, 5, 'LOCATION')])
+        self.assertIsNone(gazetteer.lookup('York'))
+    
+    def test_extractor_uses_gazetteer(self):
+        """Test that gazetteer entries are extracted regardless of casing."""
+        extractor = EntityExtractor(gazetteer_path=self.path)
+        entities = extractor.extract("priya is flying to new york city")
+        self.assertEqual(entities.get("PERSON"), ["priya"])
+        self.assertEqual(entities.get("LOCATION"), ["new york city"])
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """Test the micro-batching queue used by the spaCy backend."""
+    
+    def test_concurrent_items_share_batch(self):
+        """Test that items submitted together run as one batch in order."""
+        batches = []
+        
+        def batch_fn(items):
+            batches.append(list(items))
+            return [item * 2 for item in items]
+        
+        batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=50)
+        futures = [batcher.submit(i) for i in range(5)]
+        self.assertEqual([future.result(1) for future in futures], [0, 2, 4, 6, 8])
+        self.assertEqual(batches, [[0, 1, 2, 3, 4]])
+        batcher.close()
+    
+    def test_batch_errors_reach_callers(self):
+        """Test that a failing batch raises in every waiting caller."""
+        def batch_fn(items):
+            raise ValueError("model failed")
+        
+        batcher = MicroBatcher(batch_fn, max_wait_ms=1)
+        with self.assertRaises(ValueError):
+            batcher.process("text", timeout=1)
+        batcher.close()
+    
+    def test_short_results_fail_leftover_items(self):
+        """Test that items without a result fail instead of hanging."""
+        batcher = MicroBatcher(lambda items: items[:1], max_batch_size=8, max_wait_ms=50)
+        futures = [batcher.submit(i) for i in range(3)]
+        self.assertEqual(futures[0].result(1), 0)
+        for future in futures[1:]:
+            with self.assertRaises(RuntimeError):
+                future.result(1)
+        batcher.close()
+    
+    def test_missing_model_falls_back_to_regex(self):
+        """Test that the spaCy backend uses the regex extractor without spaCy or its model."""
+        extractor = SpacyEntityExtractor(model="missing_model_for_tests")
+        text = "My email is test@example.com"
+        self.assertEqual(extractor.extract(text), EntityExtractor().extract(text))
+        self.assertEqual(extractor.extract_batch([text]), [EntityExtractor().extract(text)])
+        self.assertEqual(extractor.cache_token, extractor.fallback.cache_token)
+
+
+class TestRegexGuard(unittest.TestCase):
+    """Test input budgets and bounded-time matching on adversarial input."""
+    
+    def test_clip_input(self):
+        """Test that long input is cut at a word boundary within the budget."""
+        self.assertEqual(clip_input("short text", 100), "short text")
+        clipped = clip_input("word " * 100, 42)
+        self.assertLessEqual(len(clipped), 42)
+        self.assertTrue(clipped.endswith("word"))
+    
+    def test_chunked_scan_matches_full_scan(self):
+        """Test that chunked scanning finds the same matches as a full scan."""
+        regex = re.compile(r'\b(in|at)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,4})\b')
+        text = "we met in New York and then at San Francisco Bay " * 200
+        expected = [match.span() for match in regex.finditer(text)]
+        chunked = [match.span() for match in chunked_finditer(regex, text, 300, 64)]
+        self.assertEqual(chunked, expected)
+    
+    def test_adversarial_input_time_bounded(self):
+        """Test that worst-case extraction time per message stays bounded."""
+        extractor = EntityExtractor()
+        recognizer = IntentRecognizer()
+        size = 50000
+        adversarial = [
+            'a.' * (size // 2) + ' x@',
+            'x@' + 'a.' * (size // 2),
+            '1 ' * (size // 2),
+            '1-(2)-3.' * (size // 8),
+            'in ' + 'Aa ' * (size // 3) + '1',
+            ('1' + ' ' * 200) * (size // 201),
+        ]
+        for text in adversarial:
+            start = time.perf_counter()
+            extractor.extract(text)
+            recognizer.recognize(text)
+            self.assertLess(time.perf_counter() - start, 1.0, text[:20])
+
+
+class TestSentimentAnalyzer(unittest.TestCase):
+    """Test cases for sentiment analysis."""
+    
+    def test_batch_matches_analyze(self):
+        """Test that batch scoring equals per-message analysis."""
+        analyzer = SentimentAnalyzer()
+        texts = ["I love this, it is great", "this is not good", "not bad at all",
+                 "terrible and awful but nice", "", "hello there", "no no yes"]
+        batch = analyzer.analyze_batch(texts)
+        for index, text in enumerate(texts):
+            result = analyzer.analyze(text)
+            self.assertEqual(SENTIMENT_LABELS[batch['sentiment'][index]], result['sentiment'])
+            self.assertEqual(batch['score'][index], result['score'])
+            self.assertEqual(batch['confidence'][index], result['confidence'])
+    
+    def test_contractions_score_like_word_lists(self):
+        """Test that built-in contractions match nothing, as in word-by-word scoring."""
+        analyzer = SentimentAnalyzer()
+        expected = {
+            "I don't like it": ('positive', 1.0, ['like'], []),
+            "this isn't good": ('positive', 1.0, ['good'], []),
+            "can't wait, great": ('positive', 1.0, ['great'], []),
+            "I won't be sad": ('negative', -1.0, [], ['sad']),
+            "I do not like it": ('negative', -1.0, [], ['like', 'not']),
+            "don't": ('neutral', 0.0, [], []),
+        }
+        for text, (sentiment, score, positive, negative) in expected.items():
+            result = analyzer.analyze(text)
+            self.assertEqual(result['sentiment'], sentiment, text)
+            self.assertEqual(result['score'], score, text)
+            self.assertEqual(sorted(result['positive_words']), positive, text)
+            self.assertEqual(sorted(result['negative_words']), negative, text)
+        batch = analyzer.analyze_batch(list(expected))
+        self.assertEqual(batch['score'].tolist(), [value[1] for value in expected.values()])
+    
+    def test_weighted_lexicon(self):
+        """Test phrase weights, intensifiers and negation from a compiled lexicon."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'lexicon.slx')
+            compile_lexicon([('good', 1.0, 'sentiment'), ('waste of time', -2.0, 'sentiment'),
+                             ('very', 3.0, 'intensifier'), ('not', 0.0, 'negation')], path)
+            analyzer = SentimentAnalyzer(lexicon_path=path)
+            
+            result = analyzer.analyze("a waste of time, but good")
+            self.assertEqual(result['negative_words'], ['waste of time'])
+            self.assertAlmostEqual(result['score'], -0.333)
+            self.assertEqual(analyzer.analyze("a waste of time, but very good")['score'], 0.2)
+            self.assertEqual(analyzer.analyze("not good")['sentiment'], 'negative')
+
+
+class TestLanguageSupport(unittest.TestCase):
+    """Test language detection."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.language_support = LanguageSupport()
+    
+    def test_detect_language(self):
+        """Test detection across Latin and non-Latin scripts."""
+        cases = {
+            "how are you doing today": "en",
+            "necesito ayuda con mi cuenta": "es",
+            "je suis très content de vous voir": "fr",
+            "wie geht es dir": "de",
+            "नमस्ते": "hi",
+            "你好": "zh",
+            "こんにちは": "ja",
+            "مرحبا": "ar",
+            "ok": "en",
+        }
+        for text, expected in cases.items():
+            self.assertEqual(self.language_support.detect_language(text), expected, text)
+        
+        language, confidence = self.language_support.detect_language_with_confidence("bonjour")
+        self.assertEqual(language, "fr")
+        self.assertGreater(confidence, 0.6)
+    
+    def test_short_replies_stay_english(self):
+        """Test that one-word English replies are not taken for other languages."""
+        for text in ("sure", "no", "yes", "right", "stop", "true"):
+            self.assertEqual(self.language_support.detect_language(text), "en", text)
+        self.assertEqual(self.language_support.detect_language("hola"), "es")
+        self.assertEqual(self.language_support.detect_language("merci"), "fr")
+    
+    def test_detect_languages_batch(self):
+        """Test that batch detection matches single detection."""
+        texts = ["hello there", "hola amigo", "", "12345", "merci beaucoup", "danke schön", "sure", "no"]
+        expected = [self.language_support.detect_language(text) for text in texts]
+        self.assertEqual(self.language_support.detect_languages(texts), expected)
+
+
+class TestLanguagePipelines(unittest.TestCase):
+    """Test per-language NLU pipelines."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.registry = PipelineRegistry(max_size=2)
+    
+    def test_default_language_has_no_pipeline(self):
+        """Test that English keeps using the bot's own components."""
+        self.assertIsNone(self.registry.get("en"))
+        self.assertIsNone(self.registry.get("xx"))
+        self.assertEqual(self.registry.get_stats()['loads'], 0)
+    
+    def test_pipeline_recognizes_language(self):
+        """Test intents, sentiment and templates of a compiled pipeline."""
+        pipeline = self.registry.get("es")
+        intent, confidence = pipeline.intent_recognizer.recognize("hola, buenos días")
+        self.assertEqual(intent, "greeting")
+        self.assertGreater(confidence, 0.6)
+        self.assertEqual(pipeline.sentiment_analyzer.analyze("esto es muy bueno")['sentiment'], "positive")
+        self.assertIn("Carlos", pipeline.response_templates.get_response("name_introduction", name="Carlos"))
+        self.assertIs(self.registry.get("es"), pipeline)
+        
+        # Changing a loaded pipeline's components changes the registry's token
+        token = self.registry.cache_token
+        pipeline.intent_recognizer.add_intent("thanks", ["gracias"], [])
+        self.assertNotEqual(self.registry.cache_token, token)
+    
+    def test_registry_is_bounded(self):
+        """Test that least recently used pipelines are evicted."""
+        for language in ("es", "fr", "de"):
+            self.registry.get(language)
+        self.assertEqual(self.registry.loaded_languages(), ["fr", "de"])
+        self.assertEqual(self.registry.get_stats()['evictions'], 1)
+    
+    def test_chat_routes_by_language(self):
+        """Test that chat answers in the detected language."""
+        bot = ConversationalAIBot()
+        bot.language_pipelines = self.registry
+        response = bot.chat("me llamo Carlos")
+        self.assertEqual(bot.get_current_language(), "es")
+        self.assertEqual(bot.context_manager.get_user_name(), "Carlos")
+        self.assertIn("Carlos", response)
+        response = bot.chat("hello, good morning")
+        self.assertEqual(bot.get_current_language(), "en")
+        self.assertIn(response, [
+            template.format(name="Carlos")
+            for template in bot.response_templates.templates['greeting_with_name']
+        ])
+
+
+class TestHistoryStore(unittest.TestCase):
+    """Test the append-only JSONL history log."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, "history")
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.temp_dir.cleanup()
+    
+    def _entry(self, text):
+        return {'timestamp': 'now', 'user_message': text, 'bot_response': 'ok', 'intent': None, 'entities': {}}
+    
+    def test_append_and_reopen(self):
+        """Test that concurrent appends survive a reopen, clears included."""
+        store = JSONLHistoryStore(self.directory, fsync_policy='always', legacy_file=None)
+        
+        def write(session):
+            for i in range(20):
+                store.append(session, self._entry(f"{session}-{i}"))
+        
+        threads = [threading.Thread(target=write, args=(f"s{k}",)) for k in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        store.clear_session("s2")
+        store.close()
+        self.assertLessEqual(store.batches_written, 81)
+        
+        store = JSONLHistoryStore(self.directory, legacy_file=None)
+        messages = [e['user_message'] for e in store.load_session("s1")]
+        self.assertEqual(messages, [f"s1-{i}" for i in range(20)])
+        self.assertEqual(store.load_session("s2"), [])
+        store.close()
+    
+    def test_torn_tail_is_cut(self):
+        """Test that records written after a crash's torn line survive restarts."""
+        store = JSONLHistoryStore(self.directory, legacy_file=None)
+        store.append("s", self._entry("one"))
+        store.close()
+        with open(store.segment_path(1), 'ab') as f:
+            f.write(b'{"session_id": "s", "user_mes')
+        
+        store = JSONLHistoryStore(self.directory, legacy_file=None)
+        store.append("s", self._entry("two"))
+        store.close()
+        for _ in range(2):
+            store = JSONLHistoryStore(self.directory, legacy_file=None)
+            self.assertEqual([e['user_message'] for e in store.load_session("s")], ["one", "two"])
+            store.close()
+    
+    def test_compaction(self):
+        """Test that compaction folds segments and keeps the newest entries."""
+        store = JSONLHistoryStore(self.directory, segment_max_bytes=500, compact_segments=0,
+                                  max_entries=3, legacy_file=None)
+        for i in range(40):
+            store.append(f"s{i % 4}", self._entry(f"m{i}"))
+            store.flush()
+        store.clear_session("s3")
+        store.flush()
+        before = store.get_stats()['segments']
+        
+        self.assertGreater(store.compact(), 1)
+        self.assertLess(store.get_stats()['segments'], before)
+        self.assertEqual([e['user_message'] for e in store.load_session("s0")], ["m28", "m32", "m36"])
+        self.assertEqual(store.load_session("s3"), [])
+        store.close()
+    
+    def test_tail_and_streaming(self):
+        """Test the in-memory tail, indexed loads and streaming older turns."""
+        store = JSONLHistoryStore(self.directory, segment_max_bytes=400, compact_segments=0,
+                                  legacy_file=None)
+        history = ConversationHistory("s", store=store)
+        for i in range(60):
+            history.add_message(f"m{i}", "ok")
+            store.append("other", self._entry(f"o{i}"))
+        self.assertEqual(len(history.history), history.tail_size)
+        store.close()
+        self.assertTrue(os.path.exists(store.index_path(1)))
+        
+        store = JSONLHistoryStore(self.directory, segment_max_bytes=400, compact_segments=0,
+                                  legacy_file=None)
+        history = ConversationHistory("s", store=store)
+        self.assertEqual(history.history[-1]['user_message'], "m59")
+        self.assertEqual(len(history.get_history(50)), 50)
+        self.assertEqual([e['user_message'] for e in history.iter_history()], [f"m{i}" for i in range(60)])
+        store.close()
+    
+    def test_legacy_migration(self):
+        """Test that the single-file JSON history is imported once."""
+        legacy = os.path.join(self.temp_dir.name, "history.json")
+        with open(legacy, 'w', encoding='utf-8') as f:
+            json.dump([{'session_id': 'old', 'messages': [self._entry("hello")]}], f)
+        
+        store = JSONLHistoryStore(self.directory, legacy_file=legacy)
+        history = ConversationHistory("old", store=store)
+        self.assertEqual(history.get_history()[0]['user_message'], "hello")
+        self.assertTrue(os.path.exists(legacy + ".migrated"))
+        store.close()
+
+
+def _append_from_process(store_type, path, worker, turns):
+    """Append turns to a shared and an own session from a separate process."""
+    if store_type == 'sharded':
+        store = ShardedHistoryStore(path, fsync_policy='os', legacy_file=None)
+    elif store_type == 'sharded-trim':
+        store = ShardedHistoryStore(path, fsync_policy='os', legacy_file=None,
+                                    shard_max_bytes=2000, max_entries=10)
+    else:
+        store = JSONFileHistoryStore(path)
+    for i in range(turns):
+        entry = {'timestamp': 'now', 'user_message': f"w{worker}-{i}", 'bot_response': 'ok'}
+        store.append("shared", entry)
+        store.append(f"own-{worker}", entry)
+    store.close()
+
+
+class TestMultiProcessHistory(unittest.TestCase):
+    """Test history stores written by several processes at once."""
+    
+    WORKERS = 4
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.temp_dir.cleanup()
+    
+    def run_workers(self, store_type, path, turns):
+        """Run the worker processes and return the elapsed time."""
+        context = multiprocessing.get_context(
+            'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        )
+        started = time.perf_counter()
+        processes = [
+            context.Process(target=_append_from_process, args=(store_type, path, worker, turns))
+            for worker in range(self.WORKERS)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        return time.perf_counter() - started
+    
+    def assert_worker_order(self, entries, turns):
+        """Check that every worker's turns are present once and in order."""
+        for worker in range(self.WORKERS):
+            mine = [e['user_message'] for e in entries if e['user_message'].startswith(f"w{worker}-")]
+            self.assertEqual(mine, [f"w{worker}-{i}" for i in range(turns)])
+    
+    def test_sharded_concurrent_appends(self):
+        """Test that concurrent processes lose no appends to shared or own sessions."""
+        directory = os.path.join(self.temp_dir.name, "shards")
+        turns = 300
+        elapsed = self.run_workers('sharded', directory, turns)
+        
+        store = ShardedHistoryStore(directory, legacy_file=None, max_entries=10 ** 6)
+        shared = list(store.iter_session("shared"))
+        self.assertEqual(len(shared), self.WORKERS * turns)
+        self.assert_worker_order(shared, turns)
+        self.assertEqual(len(store.session_ids()), self.WORKERS + 1)
+        self.assertEqual(len(store.load_session("own-0")), turns)
+        # Generous bound: well over 1000 appends per second even on one core
+        self.assertLess(elapsed, 2 * self.WORKERS * turns / 1000 + 5)
+        store.close()
+    
+    def test_jsonl_in_use_fails_fast(self):
+        """Test that a worker finding the jsonl directory taken fails instead of splitting history."""
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        try:
+            # A second open in this process conflicts like one from another worker
+            owner = JSONLHistoryStore(legacy_file=None)
+            with self.assertRaisesRegex(RuntimeError, "in use by another process"):
+                create_history_store('jsonl')
+            owner.close()
+        finally:
+            os.chdir(cwd)
+    
+    def test_sharded_trim_under_contention(self):
+        """Test that trimming while other processes append keeps shards valid."""
+        directory = os.path.join(self.temp_dir.name, "shards")
+        self.run_workers('sharded-trim', directory, 200)
+        
+        store = ShardedHistoryStore(directory, legacy_file=None, max_entries=10 ** 6)
+        shared = list(store.iter_session("shared"))
+        self.assertTrue(10 <= len(shared) < 40)
+        for worker in range(self.WORKERS):
+            numbers = [int(e['user_message'].split('-')[1]) for e in shared
+                       if e['user_message'].startswith(f"w{worker}-")]
+            self.assertEqual(numbers, sorted(set(numbers)))
+        leftovers = [name for _, _, names in os.walk(directory) for name in names if name.endswith('.tmp')]
+        self.assertEqual(leftovers, [])
+        store.close()
+    
+    def test_json_file_store_keeps_every_session(self):
+        """Test that the locked single-file store loses no sessions across processes."""
+        path = os.path.join(self.temp_dir.name, "history.json")
+        self.run_workers('json', path, 10)
+        store = JSONFileHistoryStore(path)
+        self.assertEqual(len(store.session_ids()), self.WORKERS + 1)
+        self.assert_worker_order(store.load_session("shared"), 10)
+    
+    def test_jsonl_directory_is_single_process(self):
+        """Test that a second open of a JSONL directory is refused."""
+        directory = os.path.join(self.temp_dir.name, "history")
+        store = JSONLHistoryStore(directory, legacy_file=None)
+        if importlib.util.find_spec('fcntl') is not None:
+            with self.assertRaises(RuntimeError):
+                JSONLHistoryStore(directory, legacy_file=None)
+        store.close()
+        JSONLHistoryStore(directory, legacy_file=None).close()
+
+
+class TestSQLiteHistoryStore(unittest.TestCase):
+    """Test the SQLite history backend."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "history.db")
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.temp_dir.cleanup()
+    
+    def test_append_load_and_clear(self):
+        """Test batched appends, tail queries and clearing a session."""
+        store = SQLiteHistoryStore(self.path, batch_size=8, legacy_file=None)
+        for i in range(30):
+            store.append(f"s{i % 3}", {'timestamp': f"2026-01-01T00:00:{i:02d}",
+                                       'user_message': f"m{i}", 'bot_response': "ok",
+                                       'intent': "greeting", 'entities': {'PERSON': ["Ann"]}})
+        store.clear_session("s2")
+        store.close()
+        
+        store = SQLiteHistoryStore(self.path, legacy_file=None)
+        entries = store.load_session("s0", limit=2)
+        self.assertEqual([e['user_message'] for e in entries], ["m24", "m27"])
+        self.assertEqual(entries[0]['entities'], {'PERSON': ["Ann"]})
+        self.assertEqual(store.load_session("s2"), [])
+        self.assertEqual(store.get_stats()['rows'], 20)
+        store.close()
+    
+    def test_sessions_are_trimmed(self):
+        """Test that each session keeps only its newest max_entries rows."""
+        store = SQLiteHistoryStore(self.path, batch_size=4, max_entries=5, legacy_file=None)
+        for i in range(12):
+            store.append("s", {'timestamp': f"2026-01-01T00:00:{i:02d}", 'user_message': f"m{i}"})
+        store.append("other", {'timestamp': "2026-01-01T00:01:00", 'user_message': "o"})
+        self.assertEqual([e['user_message'] for e in store.iter_session("s")],
+                         [f"m{i}" for i in range(7, 12)])
+        self.assertEqual(store.get_stats()['rows'], 6)
+        store.close()
+    
+    def test_legacy_migration_runs_once(self):
+        """Test the one-shot import of the single-file JSON history."""
+        legacy = os.path.join(self.temp_dir.name, "history.json")
+        with open(legacy, 'w', encoding='utf-8') as f:
+            json.dump([{'session_id': 'old', 'messages': [
+                {'timestamp': "2025-01-01T00:00:00", 'user_message': "hello", 'bot_response': "hi",
+                 'intent': "greeting", 'entities': {}}
+            ]}], f)
+        
+        store = SQLiteHistoryStore(self.path, legacy_file=legacy)
+        self.assertEqual(store.load_session("old")[0]['user_message'], "hello")
+        self.assertTrue(os.path.exists(legacy + ".migrated"))
+        os.rename(legacy + ".migrated", legacy)
+        self.assertEqual(store.import_legacy(legacy), 0)
+        self.assertEqual(len(store.load_session("old")), 1)
+        store.close()
+
+
+class TestHistoryPagination(unittest.TestCase):
+    """Test time-range and cursor-paginated history queries."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        directory = self.temp_dir.name
+        self.stores = [
+            JSONLHistoryStore(os.path.join(directory, "jsonl"), legacy_file=None),
+            SQLiteHistoryStore(os.path.join(directory, "history.db"), legacy_file=None),
+            ShardedHistoryStore(os.path.join(directory, "shards"), legacy_file=None),
+        ]
+        self.start = datetime(2026, 1, 1)
+        for store in self.stores:
+            for i in range(25):
+                # Pairs of turns share a timestamp, so cursors must break ties
+                moment = self.start + timedelta(minutes=i // 2)
+                store.append("s", {'timestamp': moment.isoformat(), 'user_message': f"m{i}",
+                                   'bot_response': "ok", 'intent': None, 'entities': {}})
+        self.expected = [f"m{i}" for i in range(25)]
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        for store in self.stores:
+            store.close()
+        self.temp_dir.cleanup()
+    
+    def messages(self, page):
+        """User messages of a page."""
+        return [e['user_message'] for e in page['entries']]
+    
+    def test_backward_and_forward_paging(self):
+        """Test that following cursors visits every entry once in both directions."""
+        for store in self.stores:
+            page = store.query_session("s", limit=4)
+            self.assertIsNone(page['next'])
+            seen = []
+            while True:
+                seen = self.messages(page) + seen
+                if not page['prev']:
+                    break
+                page = store.query_session("s", limit=4, before=page['prev'])
+            self.assertEqual(seen, self.expected)
+            
+            page = store.query_session("s", limit=3, start=self.start.isoformat())
+            seen = []
+            while True:
+                seen += self.messages(page)
+                if not page['next']:
+                    break
+                page = store.query_session("s", limit=3, after=page['next'])
+            self.assertEqual(seen, self.expected)
+    
+    def test_time_range(self):
+        """Test that start and end bound the pages."""
+        for store in self.stores:
+            page = store.query_session("s", start=(self.start + timedelta(minutes=3)).isoformat(),
+                                       end=(self.start + timedelta(minutes=5)).isoformat(), limit=3)
+            self.assertEqual(self.messages(page), ["m6", "m7", "m8"])
+            self.assertIsNone(page['prev'])
+            page = store.query_session("s", after=page['next'],
+                                       end=(self.start + timedelta(minutes=5)).isoformat())
+            self.assertEqual(self.messages(page), ["m9"])
+            self.assertIsNone(page['next'])
+            self.assertIsNotNone(page['prev'])
+    
+    def test_page_size_limit_and_bad_cursor(self):
+        """Test the server-side page size cap and cursor validation."""
+        for store in self.stores:
+            self.assertEqual(len(store.query_session("s", limit=10 ** 6)['entries']), 25)
+            with self.assertRaises(ValueError):
+                store.query_session("s", after="not-a-cursor")
+        
+        history = ConversationHistory("s", store=self.stores[0])
+        self.assertEqual(self.messages(history.query_history(limit=2)), ["m23", "m24"])
+
+
+class TestHistorySegment(unittest.TestCase):
+    """Test the binary history segment format."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "history.hsg")
+        self.sessions = {
+            f"s{k}": [
+                {'timestamp': f"2026-01-0{k + 1}T10:00:{i:02d}.123456", 'session_id': f"s{k}",
+                 'user_message': f"order {i}", 'bot_response': "Hello! How can I help you?",
+                 'intent': "greeting" if i % 2 else None,
+                 'entities': {'PERSON': ["Ann"]} if i % 3 else {}}
+                for i in range(10)
+            ]
+            for k in range(3)
+        }
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.temp_dir.cleanup()
+    
+    def test_round_trip_and_random_access(self):
+        """Test that records decode exactly, singly and by session range."""
+        stats = write_segment(self.sessions.items(), self.path)
+        self.assertEqual(stats['records'], 30)
+        
+        segment = HistorySegment(self.path)
+        self.assertEqual(segment.load_session("s1"), self.sessions["s1"])
+        self.assertEqual(list(segment.iter_session("s2", 3, 5)), self.sessions["s2"][3:5])
+        self.assertEqual(segment.record(12), self.sessions["s1"][2])
+        self.assertEqual(segment.load_session("missing"), [])
+        segment.close()
+        
+        legacy_size = len(json.dumps(
+            [{'session_id': k, 'messages': v} for k, v in self.sessions.items()], indent=2
+        ))
+        self.assertLess(stats['bytes'], legacy_size / 3)
+    
+    def test_non_string_entity_values(self):
+        """Test that numeric entity values from legacy history are stored as text."""
+        entries = [{'timestamp': "2025-01-01T00:00:00", 'user_message': "five", 'entities': {'N': [5, 5.5]}},
+                   {'timestamp': "2025-01-01T00:00:01", 'user_message': "again", 'entities': {'N': [5]}}]
+        write_segment([("old", entries)], self.path)
+        segment = HistorySegment(self.path)
+        self.assertEqual([e['entities'] for e in segment.load_session("old")],
+                         [{'N': ["5", "5.5"]}, {'N': ["5"]}])
+        segment.close()
+    
+    def test_convert_jsonl_store(self):
+        """Test converting a JSONL store directory into a segment."""
+        directory = os.path.join(self.temp_dir.name, "log")
+        store = JSONLHistoryStore(directory, legacy_file=None)
+        for session_id, entries in self.sessions.items():
+            for entry in entries:
+                store.append(session_id, entry)
+        store.close()
+        
+        write_segment(read_history_sessions(directory), self.path)
+        segment = HistorySegment(self.path)
+        self.assertEqual(segment.session_ids(), ["s0", "s1", "s2"])
+        self.assertEqual(segment.load_session("s0", 2), self.sessions["s0"][-2:])
+        segment.close()
+
+
+class TestHistoryArchive(unittest.TestCase):
+    """Test cold-session archival and rehydration."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.hot = JSONLHistoryStore(os.path.join(self.temp_dir.name, "hot"), legacy_file=None)
+        self.store = TieredHistoryStore(
+            self.hot, HistoryArchive(os.path.join(self.temp_dir.name, "archive"), "lzma"),
+            idle_seconds=3600
+        )
+        week_ago = datetime.now() - timedelta(days=7)
+        for session_id, moment in (("idle", week_ago), ("active", datetime.now())):
+            for i in range(5):
+                self.store.append(session_id, {'timestamp': moment.isoformat(), 'user_message': f"m{i}",
+                                               'bot_response': "ok", 'intent': None, 'entities': {}})
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.store.close()
+        self.temp_dir.cleanup()
+    
+    def test_archive_and_rehydrate(self):
+        """Test that idle sessions move to the archive and come back on load."""
+        result = self.store.archive_idle()
+        self.assertEqual(result['sessions'], 1)
+        self.assertEqual(self.hot.session_ids(), ["active"])
+        
+        stats = self.store.get_stats()
+        self.assertTrue(stats['archive']['active'])
+        self.assertEqual(stats['archive']['sessions'], 1)
+        self.assertGreater(stats['archive']['bytes'], 0)
+        
+        entries = self.store.load_session("idle")
+        self.assertEqual([e['user_message'] for e in entries], [f"m{i}" for i in range(5)])
+        self.assertEqual(self.store.get_stats()['archive']['hits'], 1)
+        self.assertNotIn("idle", self.store.archive)
+    
+    def test_archive_survives_reopen(self):
+        """Test that archived sessions are found again after a restart."""
+        self.store.archive_idle()
+        archive = HistoryArchive(os.path.join(self.temp_dir.name, "archive"), "gzip")
+        self.assertEqual(archive.session_ids(), ["idle"])
+        self.assertEqual(len(archive.load("idle")), 5)
+    
+    def test_expired_archives_free_their_files(self):
+        """Test that deleting every session of an archive file deletes the file."""
+        self.store.archive_idle()
+        archive_dir = os.path.join(self.temp_dir.name, "archive")
+        size = sum(os.path.getsize(os.path.join(archive_dir, name))
+                   for name in os.listdir(archive_dir) if name.startswith("archive-"))
+        
+        sweeper = RetentionSweeper(self.store, RetentionPolicy(max_age_seconds=86400), batch_pause=0)
+        report = sweeper.sweep()
+        self.assertEqual(report['deleted'], 1)
+        self.assertEqual(report['bytes_reclaimed'], size)
+        self.assertEqual([name for name in os.listdir(archive_dir) if name.startswith("archive-")], [])
+        self.assertEqual(HistoryArchive(archive_dir).session_ids(), [])
+    
+    def test_writers_never_share_archive_numbers(self):
+        """Test that two writers of one archive directory keep each other's files."""
+        directory = os.path.join(self.temp_dir.name, "shared")
+        first, second = HistoryArchive(directory), HistoryArchive(directory)
+        entries = [{'timestamp': datetime.now().isoformat(), 'user_message': "hi"}]
+        locations = first.write([("a", entries)])
+        locations.update(second.write([("b", entries)]))
+        self.assertNotEqual(locations["a"][0], locations["b"][0])
+        for session_id, location in locations.items():
+            first.add_to_catalog(session_id, location)
+            self.assertEqual([e['user_message'] for e in first.load(session_id)], ["hi"])
+        self.assertEqual(sorted(HistoryArchive(directory).session_ids()), ["a", "b"])
+
+
+class TestHistoryIndex(unittest.TestCase):
+    """Test the full-text history index."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.index = HistoryIndex()
+        messages = [
+            ("alice", "Where is my order status?", {'EMAIL': ['Alice@Example.com']}),
+            ("alice", "The status of my order is unclear", {}),
+            ("bob", "I want a refund for order 12345", {}),
+            ("bob", "order order order refund please", {}),
+            ("carol", "Hello there", {}),
+        ]
+        start = datetime(2026, 1, 1)
+        for i, (session_id, message, entities) in enumerate(messages):
+            self.index.add(session_id, {'timestamp': (start + timedelta(minutes=i)).isoformat(),
+                                        'user_message': message, 'bot_response': "ok",
+                                        'intent': None, 'entities': entities})
+        self.index.flush()
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.index.close()
+    
+    def sessions(self, query):
+        """Session ids of the results of a query, best first."""
+        return [result['session_id'] for result in self.index.search(query)]
+    
+    def test_boolean_queries(self):
+        """Test AND, OR and NOT queries."""
+        self.assertEqual(len(self.index.search("order")), 4)
+        self.assertEqual(self.sessions("order refund"), ["bob", "bob"])
+        self.assertEqual(self.sessions("order -refund"), ["alice", "alice"])
+        self.assertEqual(sorted(self.sessions("hello OR 12345")), ["bob", "carol"])
+        self.assertEqual(self.index.search("missingword"), [])
+    
+    def test_phrase_and_entity_queries(self):
+        """Test that phrases need consecutive words and entities are searchable."""
+        results = self.index.search('"order status"')
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['timestamp'], datetime(2026, 1, 1).isoformat())
+        self.assertEqual(self.sessions("email:alice@example.com"), ["alice"])
+    
+    def test_bm25_ranking(self):
+        """Test that higher term frequency ranks first."""
+        results = self.index.search("refund order")
+        self.assertEqual(results[0]['timestamp'], datetime(2026, 1, 1, 0, 3).isoformat())
+        self.assertGreater(results[0]['score'], results[1]['score'])
+    
+    def test_clear_session(self):
+        """Test that cleared sessions drop out of results and can be reused."""
+        self.index.clear_session("bob")
+        self.index.add("bob", {'timestamp': datetime(2026, 2, 1).isoformat(),
+                               'user_message': "new refund", 'entities': {}})
+        self.index.flush()
+        results = self.index.search("refund")
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['timestamp'], datetime(2026, 2, 1).isoformat())
+    
+    def test_backfill_skips_indexed_turns(self):
+        """Test that a turn both backfilled and added live is indexed once."""
+        live = {'timestamp': datetime(2026, 1, 1, 0, 1).isoformat(),
+                'user_message': "The status of my order is unclear", 'entities': {}}
+        late = {'timestamp': datetime(2026, 3, 1).isoformat(), 'user_message': "late refund", 'entities': {}}
+        self.index.backfill([("alice", [live]), ("dave", [late])])
+        self.index.add("dave", late)
+        self.index.flush()
+        self.assertEqual(len(self.index.search("unclear")), 1)
+        self.assertEqual(self.sessions("late"), ["dave"])
+    
+    def test_same_timestamp_turns(self):
+        """Test that search results fetch the right turn when timestamps collide."""
+        with tempfile.TemporaryDirectory() as directory:
+            store = ShardedHistoryStore(os.path.join(directory, "shards"), legacy_file=None)
+            bot = ConversationalAIBot("s")
+            bot.conversation_history = ConversationHistory("s", store=store, index=self.index)
+            timestamp = datetime(2026, 4, 1).isoformat()
+            for message in ("first parcel", "second parcel", "other words"):
+                entry = {'timestamp': timestamp, 'user_message': message, 'bot_response': "ok",
+                         'intent': None, 'entities': {}}
+                store.append("s", entry)
+                self.index.add("s", entry)
+            self.index.flush()
+            
+            results = bot.search_history("second")
+            self.assertEqual([entry['user_message'] for entry in results], ["second parcel"])
+            results = bot.search_history("parcel")
+            self.assertEqual(sorted(entry['user_message'] for entry in results),
+                             ["first parcel", "second parcel"])
+            store.close()
+    
+    def test_shared_store_search_sees_other_workers(self):
+        """Test that sessions of a store shared by processes are searched without the index."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "shards")
+            mine, other = (ShardedHistoryStore(path, legacy_file=None) for _ in range(2))
+            history = ConversationHistory("s", store=mine)
+            self.assertIsNone(history.index)
+            other.append("s", {'timestamp': datetime(2026, 5, 1).isoformat(),
+                               'user_message': "where is my parcel", 'bot_response': "ok",
+                               'intent': None, 'entities': {}})
+            
+            bot = ConversationalAIBot("s")
+            bot.conversation_history = history
+            results = bot.search_history("parcel")
+            self.assertEqual([entry['user_message'] for entry in results], ["where is my parcel"])
+            self.assertFalse(bot.get_history_stats()['archive']['active'])
+            mine.close()
+            other.close()
+    
+    def test_posting_blocks(self):
+        """Test that postings spanning many blocks decode and seek correctly."""
+        postings = PostingList()
+        docs = list(range(0, 1000, 3))
+        for doc in docs:
+            postings.add(doc, [doc % 7, doc % 7 + 200])
+        self.assertEqual([doc for doc, _ in postings.iter_postings()], docs)
+        block = postings.decode_block(postings.find_block(600))
+        self.assertEqual(block[600], [600 % 7, 600 % 7 + 200])
+        self.assertIsNone(postings.find_block(5000))
+
+
+class TestRetention(unittest.TestCase):
+    """Test the retention policy and background sweeper."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = ShardedHistoryStore(os.path.join(self.temp_dir.name, "shards"), legacy_file=None)
+        now = datetime.now()
+        # s0 is the oldest session, s5 the newest
+        for i in range(6):
+            moment = now - timedelta(days=400 - i * 80)
+            for j in range(3):
+                self.store.append(f"s{i}", {'timestamp': moment.isoformat(), 'user_message': f"m{j}",
+                                            'bot_response': "ok", 'intent': None, 'entities': {}})
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.store.close()
+        self.temp_dir.cleanup()
+    
+    def test_age_limit(self):
+        """Test that sessions idle past the age limit are deleted and reported."""
+        deleted = []
+        sweeper = RetentionSweeper(self.store, RetentionPolicy(max_age_seconds=200 * 86400),
+                                   batch_size=2, batch_pause=0, on_delete=deleted.append)
+        report = sweeper.sweep()
+        self.assertEqual(report['scanned'], 6)
+        self.assertEqual(report['expired']['age'], 3)
+        self.assertEqual(sorted(deleted), ["s0", "s1", "s2"])
+        self.assertEqual(sorted(self.store.session_ids()), ["s3", "s4", "s5"])
+        self.assertGreater(report['bytes_reclaimed'], 0)
+        self.assertEqual(sweeper.get_stats()['sessions_expired'], 3)
+    
+    def test_session_and_byte_limits(self):
+        """Test that the least recently active sessions go first under pressure."""
+        size = self.store.session_usage("s5")[1]
+        sweeper = RetentionSweeper(self.store, RetentionPolicy(0, max_sessions=4), batch_pause=0)
+        self.assertEqual(sweeper.sweep()['expired']['sessions'], 2)
+        self.assertEqual(sorted(self.store.session_ids()), ["s2", "s3", "s4", "s5"])
+        
+        sweeper = RetentionSweeper(self.store, RetentionPolicy(0, max_bytes=size * 2), batch_pause=0)
+        report = sweeper.sweep()
+        self.assertEqual(report['expired']['bytes'], 2)
+        self.assertEqual(report['bytes_reclaimed'], size * 2)
+        self.assertEqual(sorted(self.store.session_ids()), ["s4", "s5"])
+    
+    def test_tasks_and_archive_action(self):
+        """Test extra cleanup tasks and archiving instead of deleting."""
+        tiered = TieredHistoryStore(
+            self.store, HistoryArchive(os.path.join(self.temp_dir.name, "archive")), idle_seconds=10 ** 9
+        )
+        sweeper = RetentionSweeper(tiered, RetentionPolicy(max_age_seconds=300 * 86400),
+                                   action='archive', batch_pause=0)
+        sweeper.add_task('noop', lambda now: 7)
+        report = sweeper.sweep()
+        self.assertEqual(report['archived'], 2)
+        self.assertEqual(report['tasks'], {'noop': 7})
+        self.assertEqual(sorted(tiered.archive.session_ids()), ["s0", "s1"])
+        self.assertEqual(len(tiered.load_session("s0")), 3)
+        with self.assertRaises(ValueError):
+            RetentionSweeper(self.store, action='archive')
+        
+        # The configured sweeper reports the mismatch instead of raising
+        sessions = sorted(self.store.session_ids())
+        sweeper = create_retention_sweeper(self.store, action='archive')
+        self.assertFalse(sweeper.policy.enabled)
+        self.assertEqual(sweeper.sweep()['deleted'], 0)
+        self.assertEqual(sorted(self.store.session_ids()), sessions)
+
+
+class TestContextStore(unittest.TestCase):
+    """Test the external context stores and the context cache."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.temp_dir.cleanup()
+    
+    def make_stores(self):
+        return [
+            MemoryContextStore(),
+            SQLiteContextStore(os.path.join(self.temp_dir.name, "context.db")),
+            FileContextStore(os.path.join(self.temp_dir.name, "contexts")),
+            KeyValueContextStore(),
+        ]
+    
+    def test_serialization_round_trip(self):
+        """Test that a context survives to_bytes/from_bytes, compressed once large."""
+        manager = ContextManager("s1")
+        manager.update_context("Hi, my name is Ana", "Hello Ana!", "greeting", {'PERSON': ["Ana"]})
+        manager.update_sentiment(0.5, 'positive')
+        data = manager.to_bytes()
+        restored = ContextManager.from_bytes("s1", data)
+        self.assertEqual(restored.get_user_name(), "Ana")
+        self.assertEqual(restored.get_previous_intent(), "greeting")
+        turn = restored.get_recent_history(1)[0]
+        self.assertEqual((turn['user_message'], turn['bot_response'], turn['entities']),
+                         ("Hi, my name is Ana", "Hello Ana!", {'PERSON': ["Ana"]}))
+        self.assertEqual(restored.get_sentiment_state(), manager.get_sentiment_state())
+        self.assertFalse(restored.is_context_expired())
+        
+        for i in range(10):
+            manager.update_context(f"message number {i} " * 5, "reply " * 10, "question", {})
+        self.assertLess(len(manager.to_bytes()), len(json.dumps(manager.get_context(), default=str)) / 2)
+        self.assertEqual(len(ContextManager.from_bytes("s1", manager.to_bytes()).conversation_history), 10)
+    
+    def test_versioned_put(self):
+        """Test compare-and-set versions on every backend."""
+        for store in self.make_stores():
+            self.assertIsNone(store.get("s1"))
+            first = store.put("s1", b"one", 0)
+            self.assertGreater(first, 0)
+            self.assertEqual(store.put("s1", b"two", first), first + 1)
+            self.assertEqual(store.get("s1"), (first + 1, b"two"))
+            self.assertEqual(store.version("s1"), first + 1)
+            with self.assertRaises(ConflictError):
+                store.put("s1", b"stale", first)
+            with self.assertRaises(ConflictError):
+                store.put("s1", b"new", 0)
+            
+            # Deleting leaves a tombstone, so versions keep growing
+            store.delete("s1")
+            self.assertEqual(store.get("s1"), (first + 2, b""))
+            self.assertEqual(store.put("s1", b"three", first + 2), first + 3)
+            store.close()
+    
+    def test_cache_shared_between_workers(self):
+        """Test that a session continues on another worker and concurrent turns merge."""
+        store = SQLiteContextStore(os.path.join(self.temp_dir.name, "context.db"))
+        worker_a = ContextCache(store)
+        worker_b = ContextCache(store, write_behind=False)
+        
+        context = worker_a.load("s1")
+        context.update_context("I'm Ana", "Hi Ana", "greeting", {'PERSON': ["Ana"]})
+        worker_a.save("s1", context)
+        worker_a.flush()
+        
+        # Worker B reads the session through, worker A's copy is still current
+        context_b = worker_b.load("s1")
+        self.assertEqual(context_b.get_user_name(), "Ana")
+        self.assertIs(worker_a.load("s1"), context)
+        self.assertEqual(worker_a.get_stats()['hits'], 1)
+        
+        # Both workers handle a turn of the session at the same time
+        context_b.update_context("Weather in Paris?", "Sunny", "weather", {'GPE': ["Paris"]})
+        worker_b.save("s1", context_b)
+        context.update_context("What time is it?", "Noon", "time", {})
+        worker_a.save("s1", context)
+        worker_a.flush()
+        self.assertEqual(worker_a.get_stats()['merges'], 1)
+        
+        merged = worker_b.load("s1")
+        self.assertEqual([turn['intent'] for turn in merged.get_recent_history(3)],
+                         ["greeting", "weather", "time"])
+        self.assertEqual(merged.get_entities()['GPE'], ["Paris"])
+        worker_a.close()
+        worker_b.close()
+    
+    def test_clear_and_delete_win_over_concurrent_saves(self):
+        """Test that a clear or delete is not undone by another worker's stale copy."""
+        store = MemoryContextStore()
+        worker_a = ContextCache(store, write_behind=False)
+        worker_b = ContextCache(store, write_behind=False)
+        context = worker_a.load("s1")
+        context.update_context("I'm Ana", "Hi Ana", "greeting", {'PERSON': ["Ana"]})
+        worker_a.save("s1", context)
+        context_b = worker_b.load("s1")
+        
+        # Worker A clears while worker B saves a turn based on the old context
+        context.clear_context()
+        worker_a.save("s1", context)
+        context_b.update_context("Weather?", "Sunny", "weather", {})
+        worker_b.save("s1", context_b)
+        cleared = worker_b.load("s1")
+        self.assertIsNone(cleared.get_user_name())
+        self.assertEqual(cleared.get_recent_history(5), [])
+        self.assertEqual(worker_a.load("s1").get_entities(), {})
+        
+        # After a delete, a copy cached at an old version is neither served nor saved
+        context_b = worker_b.load("s1")
+        context_b.update_context("I'm Bo", "Hi Bo", "greeting", {'PERSON': ["Bo"]})
+        worker_a.delete("s1")
+        worker_b.save("s1", context_b)
+        self.assertEqual(worker_b.get_stats()['dropped_writes'], 1)
+        self.assertIsNone(worker_b.load("s1").get_user_name())
 
 
 class TestContextManager(unittest.TestCase):
@@ -90,6 +1290,89 @@ class TestContextManager(unittest.TestCase):
         history = self.context_manager.get_recent_history(1)
         self.assertEqual(len(history), 1)
         self.assertEqual(history[0]["user_message"], "Hello")
+    
+    def test_sentiment_trajectory(self):
+        """Test rolling sentiment state and escalation."""
+        self.context_manager.update_sentiment(0.5, "positive")
+        for _ in range(3):
+            self.context_manager.update_sentiment(-1.0, "negative")
+        
+        state = self.context_manager.get_sentiment_state()
+        self.assertEqual(state["turns"], 4)
+        self.assertEqual((state["min"], state["max"]), (-1.0, 0.5))
+        self.assertEqual(state["negative_streak"], 3)
+        self.assertTrue(state["escalate"])
+        
+        self.context_manager.update_sentiment(1.0, "positive")
+        self.assertEqual(self.context_manager.get_sentiment_state()["negative_streak"], 0)
+        self.assertIn("Mood:", self.context_manager.get_context_summary())
+    
+    def test_one_negative_turn_does_not_escalate(self):
+        """Test that a single negative turn after a neutral one is not a trend."""
+        self.context_manager.update_sentiment(0.0, "neutral")
+        self.context_manager.update_sentiment(-1.0, "negative")
+        self.assertFalse(self.context_manager.get_sentiment_state()["escalate"])
+        
+        self.context_manager.update_sentiment(-1.0, "negative")
+        self.assertTrue(self.context_manager.get_sentiment_state()["escalate"])
+    
+    def test_history_window(self):
+        """Test that the context window keeps only the newest turns and intents."""
+        for i in range(self.context_manager.max_history + 5):
+            self.context_manager.update_context(f"m{i}", "ok", "greeting" if i % 2 else "question",
+                                                {"EMAIL": [f"u{i}@example.com"]})
+        history = self.context_manager.get_recent_history(100)
+        self.assertEqual(len(history), self.context_manager.max_history)
+        self.assertEqual(history[-1]["user_message"], f"m{self.context_manager.max_history + 4}")
+        self.assertIsInstance(datetime.fromisoformat(history[-1]["timestamp"]), datetime)
+        self.assertEqual(len(self.context_manager.get_context()["previous_intents"]), 5)
+        self.assertEqual(self.context_manager.get_entities()["EMAIL"],
+                         [f"u{self.context_manager.max_history + 4}@example.com"])
+        self.assertFalse(self.context_manager.is_context_expired())
+        
+        self.context_manager.clear_context()
+        self.assertEqual(self.context_manager.get_recent_history(), [])
+        self.assertIsNone(self.context_manager.get_previous_intent())
+    
+    def test_ring_buffer(self):
+        """Test ring buffer overwrite order and indexing."""
+        ring = RingBuffer(3)
+        for i in range(5):
+            ring.append(i)
+        self.assertEqual(list(ring), [2, 3, 4])
+        self.assertEqual((ring[0], ring[-1], len(ring)), (2, 4, 3))
+        with self.assertRaises(IndexError):
+            ring[3]
+        RingBuffer(0).append(1)
+
+
+class TestNLUCache(unittest.TestCase):
+    """Test the shared NLU result cache."""
+    
+    def test_lru_eviction(self):
+        """Test LRU eviction and statistics."""
+        cache = NLUCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 1, 1))
+    
+    def test_shared_across_sessions(self):
+        """Test that analyses are reused across bots and dropped on pattern changes."""
+        first = ConversationalAIBot("test_cache_a")
+        second = ConversationalAIBot("test_cache_b")
+        message = "Hello, nice to meet the cache test"
+        first._analyze_message(message)
+        hits = first.nlu_cache.get_stats()['hits']
+        analysis = second._analyze_message(message)
+        self.assertEqual(second.nlu_cache.get_stats()['hits'], hits + 1)
+        self.assertEqual(analysis['intent'], 'greeting')
+        
+        second.intent_recognizer.add_intent('cache_test', ['cache test'], [], 1.0)
+        self.assertEqual(second._analyze_message(message)['intent'], 'cache_test')
 
 
 class TestChatbot(unittest.TestCase):
@@ -133,8 +1416,26 @@ def run_tests():
     
     # Add test classes
     suite.addTests(loader.loadTestsFromTestCase(TestIntentRecognizer))
+    suite.addTests(loader.loadTestsFromTestCase(TestIntentClassifier))
     suite.addTests(loader.loadTestsFromTestCase(TestEntityExtractor))
+    suite.addTests(loader.loadTestsFromTestCase(TestAnalyzedMessage))
+    suite.addTests(loader.loadTestsFromTestCase(TestGazetteer))
+    suite.addTests(loader.loadTestsFromTestCase(TestMicroBatcher))
+    suite.addTests(loader.loadTestsFromTestCase(TestRegexGuard))
+    suite.addTests(loader.loadTestsFromTestCase(TestSentimentAnalyzer))
+    suite.addTests(loader.loadTestsFromTestCase(TestLanguageSupport))
+    suite.addTests(loader.loadTestsFromTestCase(TestLanguagePipelines))
+    suite.addTests(loader.loadTestsFromTestCase(TestHistoryStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestMultiProcessHistory))
+    suite.addTests(loader.loadTestsFromTestCase(TestSQLiteHistoryStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestHistoryPagination))
+    suite.addTests(loader.loadTestsFromTestCase(TestHistorySegment))
+    suite.addTests(loader.loadTestsFromTestCase(TestHistoryArchive))
+    suite.addTests(loader.loadTestsFromTestCase(TestHistoryIndex))
+    suite.addTests(loader.loadTestsFromTestCase(TestRetention))
+    suite.addTests(loader.loadTestsFromTestCase(TestContextStore))
     suite.addTests(loader.loadTestsFromTestCase(TestContextManager))
+    suite.addTests(loader.loadTestsFromTestCase(TestNLUCache))
     suite.addTests(loader.loadTestsFromTestCase(TestChatbot))
     
     runner = unittest.TextTestRunner(verbosity=2)